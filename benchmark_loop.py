@@ -0,0 +1,96 @@
+import time
+import asyncio
+import argparse
+
+# Compares how fast the default event loop and uvloop dispatch the kind of
+# work the bot does: many short tasks, call_soon callbacks and queue handoffs.
+
+
+async def task_switches(tasks, switches):
+    async def worker():
+        for _ in range(switches):
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[worker() for _ in range(tasks)])
+    return tasks * switches
+
+
+async def callbacks(count):
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    remaining = [count]
+
+    def callback():
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            done.set_result(None)
+
+    for _ in range(count):
+        loop.call_soon(callback)
+    await done
+    return count
+
+
+async def queue_handoffs(count):
+    queue = asyncio.Queue(maxsize=100)
+
+    async def producer():
+        for i in range(count):
+            await queue.put(i)
+
+    async def consumer():
+        for _ in range(count):
+            await queue.get()
+
+    await asyncio.gather(producer(), consumer())
+    return count
+
+
+def run_case(new_loop, coro_factory, repeat):
+    best = None
+    for _ in range(repeat):
+        loop = new_loop()
+        try:
+            started = time.perf_counter()
+            operations = loop.run_until_complete(coro_factory())
+            elapsed = time.perf_counter() - started
+        finally:
+            loop.close()
+        rate = operations / elapsed
+        best = rate if best is None else max(best, rate)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event loop dispatch throughput")
+    parser.add_argument("--scale", type=int, default=100000, help="operations per case")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best is reported")
+    args = parser.parse_args()
+
+    loops = {'asyncio': asyncio.new_event_loop}
+    try:
+        import uvloop
+        loops['uvloop'] = uvloop.new_event_loop
+    except ImportError:
+        print("uvloop isn't installed, only the default loop is measured")
+
+    cases = {
+        'task switches': lambda: task_switches(100, args.scale // 100),
+        'call_soon callbacks': lambda: callbacks(args.scale),
+        'queue handoffs': lambda: queue_handoffs(args.scale),
+    }
+
+    results = {name: {} for name in cases}
+    for case, factory in cases.items():
+        for loop_name, new_loop in loops.items():
+            results[case][loop_name] = run_case(new_loop, factory, args.repeat)
+
+    for case, rates in results.items():
+        line = ", ".join(f"{loop_name} {rate:,.0f}/s" for loop_name, rate in rates.items())
+        if len(rates) > 1:
+            line += f" ({rates['uvloop'] / rates['asyncio']:.2f}x)"
+        print(f"{case}: {line}")
+
+
+if __name__ == "__main__":
+    main()
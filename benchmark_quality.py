@@ -0,0 +1,87 @@
+import os
+import time
+import resource
+import argparse
+import tempfile
+import subprocess
+
+from spotify_bot.config import Config
+from spotify_bot.quality import parse_tiers
+
+# Measures the CPU a call costs at each audio quality tier. Every call is an
+# ffmpeg process decoding a track to raw PCM the way py-tgcalls does for a
+# stream, a batch of them runs at once and the CPU time of the finished
+# processes is divided by the audio they produced.
+
+
+def make_input(directory, seconds):
+    """A test track to decode, an MP3 like the ones the downloader caches"""
+    path = os.path.join(directory, "input.mp3")
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f"sine=frequency=440:duration={seconds}",
+         '-ac', '2', '-ar', '44100', '-b:a', '192k', path],
+        check=True
+    )
+    return path
+
+
+def duration(path):
+    probe = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+        check=True, capture_output=True, text=True
+    )
+    return float(probe.stdout.strip())
+
+
+def child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_tier(input_file, rate, channels, calls):
+    """
+    Decode the input in a batch of concurrent pipelines
+
+    Returns:
+        tuple: CPU seconds and wall seconds the batch took
+    """
+    command = ['ffmpeg', '-v', 'error', '-i', input_file, '-f', 's16le', '-ac', str(channels), '-ar', str(rate), 'pipe:1']
+    cpu_before = child_cpu()
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        for _ in range(calls)
+    ]
+    for process in processes:
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode()[-200:]}")
+    return child_cpu() - cpu_before, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU per concurrent call at each audio quality tier")
+    parser.add_argument("--calls", type=int, default=8, help="concurrent pipelines per tier")
+    parser.add_argument("--seconds", type=int, default=120, help="length of the generated test track")
+    parser.add_argument("--input", help="audio file to decode instead of a generated track")
+    parser.add_argument("--tiers", default=Config.QUALITY_TIERS, help="tiers like QUALITY_TIERS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.input:
+            input_file, seconds = args.input, duration(args.input)
+        else:
+            input_file, seconds = make_input(directory, args.seconds), args.seconds
+
+        for rate, channels in parse_tiers(args.tiers):
+            cpu, wall = run_tier(input_file, rate, channels, args.calls)
+            # A call streams in real time, so CPU seconds per second of audio is the cores it keeps busy
+            cores = cpu / (args.calls * seconds)
+            print(
+                f"{rate} Hz/{channels}ch: {cpu:.2f}s CPU for {args.calls} calls in {wall:.2f}s, "
+                f"{cores:.4f} CPU cores per call, ~{int((os.cpu_count() or 1) / cores) if cores else 0} calls per box"
+            )
+
+
+if __name__ == "__main__":
+    main()
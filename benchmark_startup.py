@@ -0,0 +1,70 @@
+import time
+import asyncio
+import argparse
+import importlib
+
+# Breaks a cold start of the bot into its phases: importing the bot module,
+# the first import of each library the bot loads lazily, building MusicBot
+# (clients, caches, sqlite stores) and start() up to the point the bot is
+# ready for updates. Run it in a fresh process, later runs of a phase in the
+# same process hit the import cache. start() connects to Telegram, so that
+# phase needs the bot's credentials and is skipped with --no-start.
+
+LAZY_MODULES = ('get_yt_dlp', 'get_videos_search')
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+async def start_until_ready(bot, timeout):
+    """Run start() until it reports its startup timings, then stop the bot"""
+    started = time.perf_counter()
+    task = asyncio.create_task(bot.start())
+    try:
+        while getattr(bot, 'startup_timings', None) is None:
+            if task.done():
+                # start() failed before the bot was ready
+                task.result()
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"The bot wasn't ready after {timeout}s")
+            await asyncio.sleep(0.01)
+        return time.perf_counter() - started
+    finally:
+        bot.request_stop()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the bot by phase")
+    parser.add_argument("--no-start", action="store_true", help="skip start(), it connects to Telegram")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the bot to be ready")
+    args = parser.parse_args()
+
+    phases = {}
+    bot_module, phases['import spotify_bot.bot'] = timed(importlib.import_module, 'spotify_bot.bot')
+    helpers = importlib.import_module('spotify_bot.helpers')
+    for name in LAZY_MODULES:
+        _, phases[f"first {name}()"] = timed(getattr(helpers, name))
+
+    bot_module.install_event_loop()
+    bot, phases['MusicBot()'] = timed(bot_module.MusicBot)
+
+    if not args.no_start:
+        loop = asyncio.get_event_loop()
+        phases['start() to ready'] = loop.run_until_complete(start_until_ready(bot, args.timeout))
+
+    for name, seconds in phases.items():
+        print(f"{name}: {seconds * 1000:,.0f} ms")
+    print(f"total: {sum(phases.values()) * 1000:,.0f} ms")
+
+    timings = getattr(bot, 'startup_timings', None)
+    if timings:
+        # start() warms the lazy imports itself, here they were already loaded
+        print(f"start() breakdown: clients {timings['clients'] * 1000:,.0f} ms, ready {timings['ready'] * 1000:,.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
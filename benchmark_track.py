@@ -0,0 +1,62 @@
+import argparse
+import tracemalloc
+
+from spotify_bot.track import Track
+
+# Measures the memory a queued track costs as the loose dict tracks used to
+# be and as a Track, with the same few videos queued over and over the way
+# popular songs end up in many chats.
+
+
+def video(index, videos):
+    video_id = f"vid{index % videos:08d}"
+    # Built fresh every time like a search result, so nothing is shared by accident
+    return {
+        'video_id': video_id,
+        'title': f"Artist {index % videos} - Song title number {index % videos} (Official Video)",
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'duration': f"{3 + index % 4}:{index % 60:02d}",
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+        'channel': f"Artist {index % videos} Official",
+    }
+
+
+def as_dict(index, videos):
+    track = video(index, videos)
+    # Keys a seek used to attach to the metadata
+    track.update({'audio_file': None, 'original_audio': None, 'file_hash': None})
+    return track
+
+
+def as_track(index, videos):
+    return Track(**video(index, videos))
+
+
+def measure(factory, count, videos):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    queue = [factory(index, videos) for index in range(count)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del queue
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per queued track")
+    parser.add_argument("--tracks", type=int, default=20000, help="tracks queued")
+    parser.add_argument("--videos", type=int, default=200, help="distinct videos among them")
+    args = parser.parse_args()
+
+    results = {
+        'dict': measure(as_dict, args.tracks, args.videos),
+        'Track': measure(as_track, args.tracks, args.videos),
+    }
+    for name, size in results.items():
+        print(f"{name}: {size:,.0f} bytes per queued track")
+    print(f"Track uses {results['Track'] / results['dict']:.0%} of the dict")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,10 @@ import time
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 # Import and run the bot
-from spotify_bot.bot import MusicBot
+from spotify_bot.bot import MusicBot, install_event_loop
 
 if __name__ == "__main__":
     print("Starting Music Bot...")
+    install_event_loop()
     bot = MusicBot()
     bot.run() 
\ No newline at end of file
@@ -0,0 +1,154 @@
+import time
+import asyncio
+from collections import deque
+
+from spotify_bot.config import Config
+
+
+class CallAdmission:
+    """
+    Caps the number of voice calls joined at once.
+
+    Chats past the cap wait in a FIFO and are handed a slot as soon as one is
+    released, a released slot goes straight to the first waiter so a newly
+    arriving chat can't take it first. Before waiting, reclaim is asked to
+    free a slot held by an idle or paused call.
+    """
+
+    def __init__(self, max_calls=None, timeout=None):
+        self.max_calls = max_calls if max_calls is not None else Config.MAX_ACTIVE_CALLS
+        self.timeout = timeout if timeout is not None else Config.ADMISSION_TIMEOUT
+        self.admitted = set()
+        self.waiting = deque()  # entries: {'chat_id', 'future', 'notify', 'since'}
+        self.stats = {'immediate': 0, 'queued': 0, 'timed_out': 0, 'cancelled': 0, 'reclaimed': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+
+    @property
+    def full(self):
+        return bool(self.max_calls) and len(self.admitted) >= self.max_calls
+
+    def available(self, chat_id):
+        """Whether acquire would admit a chat right away, without reclaiming or waiting"""
+        return chat_id in self.admitted or (not self.full and not self.waiting)
+
+    def position(self, chat_id):
+        """1-indexed place of a chat in the line, None if it isn't waiting"""
+        for index, entry in enumerate(self.waiting):
+            if entry['chat_id'] == chat_id:
+                return index + 1
+        return None
+
+    async def acquire(self, chat_id, notify=None, reclaim=None):
+        """
+        Wait for a call slot for a chat
+
+        Args:
+            notify: Called with the chat's place in line whenever it changes
+            reclaim: Async callable freeing a slot held by an idle or paused call, returns whether it did
+
+        Returns:
+            bool: Whether the chat got a slot, False on timeout or cancel
+        """
+        if chat_id in self.admitted:
+            return True
+        if not self.full and not self.waiting:
+            self.admitted.add(chat_id)
+            self.stats['immediate'] += 1
+            return True
+
+        if reclaim and not self.waiting and await reclaim():
+            self.stats['reclaimed'] += 1
+            if not self.full and not self.waiting:
+                self.admitted.add(chat_id)
+                self.stats['immediate'] += 1
+                return True
+
+        existing = self.position(chat_id)
+        if existing:
+            entry = self.waiting[existing - 1]
+        else:
+            entry = {
+                'chat_id': chat_id,
+                'future': asyncio.get_running_loop().create_future(),
+                'notify': notify,
+                'since': time.monotonic(),
+            }
+            self.waiting.append(entry)
+            self.stats['queued'] += 1
+            if notify:
+                notify(len(self.waiting))
+
+        # asyncio.wait, unlike wait_for, never swallows a cancel that arrives with the slot
+        try:
+            await asyncio.wait([entry['future']], timeout=self.timeout or None)
+        except asyncio.CancelledError:
+            # The waiting task is gone, its place or a slot it was just handed can't stay taken
+            if entry in self.waiting:
+                self.waiting.remove(entry)
+                self.stats['cancelled'] += 1
+                self._notify_positions()
+            elif entry['future'].done() and entry['future'].result():
+                self.release(chat_id)
+            raise
+
+        if entry['future'].done():
+            admitted = entry['future'].result()
+        else:
+            admitted = False
+            if entry in self.waiting:
+                self.waiting.remove(entry)
+                self.stats['timed_out'] += 1
+                self._notify_positions()
+
+        if admitted:
+            waited = time.monotonic() - entry['since']
+            self.stats['total_wait'] += waited
+            self.stats['max_wait'] = max(self.stats['max_wait'], waited)
+        return admitted
+
+    def occupy(self, chat_id):
+        """Count a call that was joined without acquire, e.g. found still joined, even past the cap"""
+        self.admitted.add(chat_id)
+
+    def release(self, chat_id):
+        """Free the slot of a chat that left its call and hand it to the next waiter"""
+        if chat_id not in self.admitted:
+            return
+        self.admitted.discard(chat_id)
+        while self.waiting and not self.full:
+            entry = self.waiting.popleft()
+            if entry['future'].done():
+                continue
+            self.admitted.add(entry['chat_id'])
+            entry['future'].set_result(True)
+        self._notify_positions()
+
+    def cancel(self, chat_id):
+        """Take a chat out of the line, its acquire returns False"""
+        position = self.position(chat_id)
+        if not position:
+            return
+        entry = self.waiting[position - 1]
+        self.waiting.remove(entry)
+        if not entry['future'].done():
+            entry['future'].set_result(False)
+        self.stats['cancelled'] += 1
+        self._notify_positions()
+
+    def _notify_positions(self):
+        for index, entry in enumerate(self.waiting):
+            if entry['notify']:
+                entry['notify'](index + 1)
+
+    def report(self):
+        served = self.stats['queued'] - self.stats['timed_out'] - self.stats['cancelled'] - len(self.waiting)
+        return {
+            'max_calls': self.max_calls,
+            'active': len(self.admitted),
+            'waiting': len(self.waiting),
+            'immediate': self.stats['immediate'],
+            'queued': self.stats['queued'],
+            'timed_out': self.stats['timed_out'],
+            'reclaimed': self.stats['reclaimed'],
+            'avg_wait': self.stats['total_wait'] / served if served > 0 else 0.0,
+            'max_wait': self.stats['max_wait'],
+        }
@@ -0,0 +1,147 @@
+import os
+import json
+import asyncio
+import numpy as np
+
+from spotify_bot.config import Config
+from spotify_bot.scheduler import background_command
+
+# Audio is decoded to mono 16-bit PCM at a low rate, plenty for loudness and silence
+ANALYSIS_RATE = 22050
+# Silence is detected on 50 ms frames, loudness on 400 ms blocks of 8 frames
+FRAME_SECONDS = 0.05
+BLOCK_FRAMES = 8
+BLOCK_HOP = 2
+
+
+def analysis_path(audio_file):
+    """Path of the analysis stored next to a cached audio file"""
+    base, _ = os.path.splitext(audio_file)
+    return f"{base}.json"
+
+
+def load_analysis(audio_file):
+    """
+    Read the stored analysis of a cached audio file
+
+    Returns:
+        dict: The analysis, or None if the file hasn't been analyzed yet
+    """
+    path = analysis_path(audio_file)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading analysis {path}: {str(e)}")
+        return None
+
+
+async def decode_pcm(audio_file):
+    """Decode an audio file to raw mono PCM with ffmpeg"""
+    process = await asyncio.create_subprocess_exec(
+        *background_command([
+            'ffmpeg',
+            '-v', 'error',
+            '-i', audio_file,
+            '-f', 's16le',
+            '-ac', '1',
+            '-ar', str(ANALYSIS_RATE),
+            'pipe:1',
+        ]),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    stdout, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed to decode {audio_file}: {stderr.decode()[-200:]}")
+
+    return stdout
+
+
+def measure_pcm(pcm):
+    """
+    Measure duration, loudness and silence bounds of decoded PCM
+
+    Loudness uses the gating of ITU-R BS.1770 (400 ms blocks, absolute gate at
+    -70 LUFS, relative gate 10 LU below) without the K-weighting filter.
+
+    Args:
+        pcm: Raw mono s16le PCM at ANALYSIS_RATE
+
+    Returns:
+        dict: duration, loudness, gain, trim_start and trim_end in seconds/dB
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    duration = len(samples) / ANALYSIS_RATE
+
+    frame_size = int(ANALYSIS_RATE * FRAME_SECONDS)
+    frame_count = len(samples) // frame_size
+    if frame_count < BLOCK_FRAMES:
+        return {'duration': round(duration, 2), 'loudness': None, 'gain': 0.0, 'trim_start': 0.0, 'trim_end': round(duration, 2)}
+
+    # Mean power of every frame
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+    power = np.mean(frames * frames, axis=1)
+
+    # Mean power of overlapping 400 ms blocks from the running sum of frame powers
+    cumulative = np.concatenate(([0.0], np.cumsum(power, dtype=np.float64)))
+    starts = np.arange(0, frame_count - BLOCK_FRAMES + 1, BLOCK_HOP)
+    block_power = (cumulative[starts + BLOCK_FRAMES] - cumulative[starts]) / BLOCK_FRAMES
+    block_loudness = -0.691 + 10 * np.log10(block_power + 1e-12)
+
+    gated = block_loudness > -70
+    loudness = None
+    if gated.any():
+        relative_gate = -0.691 + 10 * np.log10(np.mean(block_power[gated])) - 10
+        gated &= block_loudness > relative_gate
+        loudness = float(-0.691 + 10 * np.log10(np.mean(block_power[gated])))
+
+    gain = 0.0
+    if loudness is not None:
+        gain = float(np.clip(Config.TARGET_LOUDNESS - loudness, -Config.MAX_GAIN_DB, Config.MAX_GAIN_DB))
+
+    # Leading and trailing silence, short gaps aren't worth trimming
+    trim_start, trim_end = 0.0, duration
+    audible = np.nonzero(10 * np.log10(power + 1e-12) > Config.SILENCE_THRESHOLD_DB)[0]
+    if audible.size:
+        first = float(audible[0] * FRAME_SECONDS)
+        last = float((audible[-1] + 1) * FRAME_SECONDS)
+        if first >= Config.MIN_TRIM_SECONDS:
+            trim_start = first
+        if duration - last >= Config.MIN_TRIM_SECONDS:
+            trim_end = last
+
+    return {
+        'duration': round(duration, 2),
+        'loudness': round(loudness, 2) if loudness is not None else None,
+        'gain': round(gain, 2),
+        'trim_start': round(trim_start, 2),
+        'trim_end': round(trim_end, 2),
+    }
+
+
+async def analyze_audio(audio_file):
+    """
+    Analyze a cached audio file once and store the result next to it
+
+    Returns:
+        dict: The analysis, see measure_pcm
+    """
+    analysis = load_analysis(audio_file)
+    if analysis is not None:
+        return analysis
+
+    pcm = await decode_pcm(audio_file)
+    loop = asyncio.get_running_loop()
+    analysis = await loop.run_in_executor(None, measure_pcm, pcm)
+
+    with open(analysis_path(audio_file), "w") as f:
+        json.dump(analysis, f)
+
+    print(f"Analyzed {audio_file}: {analysis}")
+    return analysis
@@ -1,27 +1,55 @@
-from youtubesearchpython.__future__ import VideosSearch
+import time
+_import_started = time.perf_counter()
+
 import os
 import re
-import time
 import asyncio
+import signal
 import hashlib
 import logging
 import tempfile
 import subprocess
-import yt_dlp
+from aiohttp import web
 from typing import Dict, List, Optional, Union, Any
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from pyrogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent, InputMediaPhoto
 from pytgcalls import PyTgCalls
 from pytgcalls.types import AudioPiped
 from pytgcalls.types.input_stream.quality import HighQualityAudio
 from pytgcalls.types import AudioParameters
+from pytgcalls.types.input_stream import InputStream, InputAudioStream
+from pytgcalls.exceptions import GroupCallNotFound
 
 # Import Config instead of using dotenv
 from spotify_bot.config import Config, Txt
+from spotify_bot.cache import AudioCache, url_hash, hash_from_filename
+from spotify_bot.analysis import analyze_audio, load_analysis
+from spotify_bot.session import SessionStore
+from spotify_bot.track_index import TrackIndex
+from spotify_bot.quality import QualityController
+from spotify_bot.scheduler import MediaScheduler, JobTicket, NOW_PLAYING, SEEK, BACKGROUND
+from spotify_bot.downloader import download_segmented, convert_to_mp3, DownloadError, backoff_delay
+from spotify_bot.resolver import MediaUrlCache, SearchCache, video_id_from_url
+from spotify_bot.spotify import SpotifyClient, SpotifyMap, SpotifyMatcher, parse_spotify_url
+from spotify_bot.broadcast import PcmFanout
+from spotify_bot import introspection
+from spotify_bot.lag import LagMonitor
+from spotify_bot.ratelimit import RateLimiter, COMMAND_CLASSES, SCOPES
+from spotify_bot.admission import CallAdmission
+from spotify_bot.track import Track
+
+try:
+    from spotify_bot.card import CardRenderer
+except ImportError:
+    # Pillow is optional, without it the plain thumbnail is sent
+    CardRenderer = None
 
 # Import our helpers and callbacks
 from spotify_bot.callbacks import register_callbacks
 from spotify_bot.helpers import download_thumbnail, format_duration, create_music_caption, get_music_control_keyboard
+from spotify_bot.helpers import get_yt_dlp, get_videos_search, warm_imports, parse_duration
+from spotify_bot.staging import decode_head, continue_decode, remove_raw_file
 try:
     # Try relative imports if the above fails
     from .callbacks import register_callbacks
@@ -29,6 +57,28 @@ try:
 except ImportError:
     pass
 
+# Time spent importing this module and its eager dependencies
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+def install_event_loop():
+    """
+    Use uvloop for the event loop when it's enabled and installed
+
+    The clients bind to the event loop when they're created, so this has to
+    run before MusicBot is instantiated.
+    """
+    if not Config.USE_UVLOOP:
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        print("uvloop isn't installed, using the default event loop")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    print("Using the uvloop event loop")
+    return True
+
 class MusicBot:
     def __init__(self):
         self.app = Client(
@@ -60,6 +110,91 @@ class MusicBot:
         self.download_dir = "downloads"
         os.makedirs(self.download_dir, exist_ok=True)
 
+        # Reference-counted cache of downloaded audio shared by all chats
+        self.audio_cache = AudioCache(self.download_dir)
+        # Analysis of cached audio (exact duration, gain, silence) by track hash
+        self.audio_analysis = {}
+        self.analysis_tasks = {}
+
+        # Local full-text index of resolved tracks, answers repeat queries offline
+        self.track_index = TrackIndex(Config.TRACK_INDEX_FILE)
+
+        # Media jobs run by priority within global CPU and bandwidth budgets
+        self.media_scheduler = MediaScheduler({
+            'cpu': Config.MEDIA_CPU_JOBS,
+            'net': Config.MEDIA_NET_JOBS,
+        })
+        self.active_downloads = {}
+        self.download_tickets = {}  # URL -> JobTicket of its active download
+        self.download_waiters = {}
+
+        # Next presses waiting to be applied as one skip
+        self.pending_skips = {}
+        self.skip_tasks = {}
+
+        # Quality tier of new streams, lowered under CPU pressure
+        self.quality = QualityController()
+
+        # Raw PCM heads of the next queued tracks, and the staged tracks now playing
+        self.staged_tracks = {}
+        self.staged_playing = {}
+        self.staging_chats = set()
+        # Stream end to next stream gap, by whether the next track was staged
+        self.transition_stats = {}
+
+        # Playback positions, used by the control messages, seeking and snapshots
+        self.playback_start_times = {}
+        self.paused_positions = {}
+
+        # Broadcasts by source chat and the source each listening chat is tuned in to
+        self.broadcasts = {}
+        self.broadcast_subscriptions = {}
+
+        # Calls kept open on silence after the queue ran out, and how the holds ended
+        self.idle_holds = {}
+        self.idle_hold_stats = {}
+
+        # Dropped calls being rejoined, calls being left on purpose and recovery times
+        self.recovering_calls = set()
+        self.leaving_calls = set()
+        self.recovery_stats = {'recovered': 0, 'failed': 0, 'total': 0.0, 'max': 0.0}
+
+        # Now-playing cards and when each chat's card was last re-rendered
+        self.card_renderer = CardRenderer() if CardRenderer and Config.NOW_PLAYING_CARD else None
+        self.card_refresh_times = {}
+
+        # Token buckets per user and chat for each command class
+        self.rate_limiter = RateLimiter()
+
+        # Cap on joined calls with a FIFO of chats waiting for one, and since when calls are paused
+        self.call_admission = CallAdmission()
+        self.paused_since = {}
+        # Chats waiting in line, each with the task that waits and what it runs once admitted
+        self.admission_waits = {}
+
+        # Set by SIGTERM/SIGINT, commands are turned away while shutting down
+        self.stop_event = None
+        self.shutting_down = False
+        self.debug_runner = None
+
+        # Scheduling delay of the event loop and the stacks of calls that blocked it
+        self.lag_monitor = LagMonitor()
+
+        # Resolved direct media URLs by video ID, shared by every chat
+        self.media_urls = MediaUrlCache()
+        # Inline search results by query, and the debounce task of every user's latest inline query
+        self.search_cache = SearchCache()
+        self.inline_queries = {}
+
+        # Spotify links are matched to YouTube videos, matches are kept next to the track index
+        self.spotify = SpotifyClient()
+        self.spotify_matcher = SpotifyMatcher(SpotifyMap(Config.TRACK_INDEX_FILE), self.search_videos)
+
+        # Snapshots of per-chat playback state that survive a restart
+        self.session_store = SessionStore(Config.SESSION_FILE)
+        self.session_restored = False
+        self.snapshot_pending = False
+
         # Create thumbnails directory if it doesn't exist
         os.makedirs("thumbnails", exist_ok=True)
 
@@ -81,6 +216,17 @@ class MusicBot:
         self.register_callbacks()
 
     def register_handlers(self):
+        @self.app.on_message(group=-1)
+        async def command_gate(client: Client, message: Message):
+            # Runs before every command handler
+            is_command = bool(message.text and message.text.startswith("/"))
+            if self.shutting_down:
+                if is_command:
+                    await message.reply("The bot is restarting, please try again in a moment.")
+                message.stop_propagation()
+            if is_command and not self.allow_command(message):
+                message.stop_propagation()
+
         @self.app.on_message(filters.command("start"))
         async def start_command(client: Client, message: Message):
             await self.start_command(client, message)
@@ -117,10 +263,439 @@ class MusicBot:
         async def seek_command(client: Client, message: Message):
             await self.seek_command(client, message)
 
+        @self.app.on_message(filters.command("broadcast"))
+        async def broadcast_command(client: Client, message: Message):
+            await self.broadcast_command(client, message)
+
+        @self.app.on_message(filters.command("subscribe"))
+        async def subscribe_command(client: Client, message: Message):
+            await self.subscribe_command(client, message)
+
+        @self.app.on_message(filters.command("unsubscribe"))
+        async def unsubscribe_command(client: Client, message: Message):
+            await self.unsubscribe_command(client, message)
+
+        @self.app.on_inline_query()
+        async def inline_search(client: Client, inline_query: InlineQuery):
+            await self.inline_search(client, inline_query)
+
+        @self.app.on_message(filters.command("debug") & filters.user(Config.ADMIN_IDS))
+        async def debug_command(client: Client, message: Message):
+            await self.debug_command(client, message)
+
+        @self.app.on_message(filters.command("ratelimit") & filters.user(Config.ADMIN_IDS))
+        async def ratelimit_command(client: Client, message: Message):
+            await self.ratelimit_command(client, message)
+
+    def allow_command(self, message: Message):
+        """
+        Check a command against the rate limits before its handler runs
+
+        Rejected commands are dropped without any work, the user is told to
+        slow down at most once per wait so a flood doesn't turn into replies.
+        """
+        command = message.text.split(None, 1)[0][1:].split("@", 1)[0].lower()
+        command_class = COMMAND_CLASSES.get(command)
+        if not command_class:
+            return True
+
+        user_id = message.from_user.id if message.from_user else None
+        scope, wait = self.rate_limiter.check(command_class, user_id, message.chat.id)
+        if not scope:
+            return True
+
+        print(f"Rate limited /{command} from user {user_id} in chat {message.chat.id} ({scope} limit)")
+        if self.rate_limiter.should_notify(user_id or message.chat.id, command_class, wait):
+            reason = "this chat is" if scope == 'chat' else "you're"
+            asyncio.create_task(message.reply(f"Slow down, {reason} sending /{command} too often. Try again in {max(int(wait), 1)}s."))
+        return False
+
     async def process_play_request(self, message: Message, query: str, wait_message: Message = None):
         """Process a play request from a user"""
         chat_id = message.chat.id
 
+        if not await self.ensure_assistant(message, wait_message):
+            return
+
+        self.init_chat(chat_id)
+
+        try:
+            video_info = await self.resolve_track(query)
+        except Exception as e:
+            if wait_message:
+                try:
+                    await wait_message.delete()
+                except Exception as e:
+                    print(f"Error deleting wait message: {str(e)}")
+            await message.reply(f"Error processing YouTube URL: {str(e)}")
+            return
+
+        if not video_info:
+            if wait_message:
+                try:
+                    await wait_message.delete()
+                except Exception as e:
+                    print(f"Error deleting wait message: {str(e)}")
+            await message.reply("No results found for your query.")
+            return
+
+        # Download thumbnail
+        thumbnail_path = await download_thumbnail(video_info['video_id'])
+
+        # If no track is currently playing, play this one
+        if not self.current_track[chat_id]:
+            await self.play_now(message, video_info, wait_message)
+        else:
+            # Add to queue
+            position = len(self.queue[chat_id]) + 1  # Position in queue (1-indexed)
+            self.queue[chat_id].append(video_info)
+            self.audio_cache.acquire(video_info['url'])
+            self.request_snapshot()
+
+            # Create caption
+            caption = create_music_caption(video_info)
+
+            # Delete wait message if it exists
+            if wait_message:
+                try:
+                    await wait_message.delete()
+                except Exception as e:
+                    print(f"Error deleting wait message: {str(e)}")
+
+            # Send message with thumbnail
+            if thumbnail_path:
+                await message.reply_photo(
+                    photo=thumbnail_path,
+                    caption=f"{caption}\n\nAdded to queue at position {position}."
+                )
+            else:
+                await message.reply_text(
+                    f"{caption}\n\nAdded to queue at position {position}."
+                )
+
+            await self.update_queue_display(chat_id)
+
+    async def process_bulk_play(self, message: Message, queries: List[str], wait_message: Message = None):
+        """
+        Process a /play with several queries
+
+        The queries are resolved concurrently, at most BULK_RESOLVE_CONCURRENCY
+        at a time, and enqueued in the order they were given with a single
+        summary reply. Downloads of the first BULK_PREFETCH tracks start as soon
+        as each of them is resolved.
+        """
+        chat_id = message.chat.id
+
+        if not await self.ensure_assistant(message, wait_message):
+            return
+
+        self.init_chat(chat_id)
+
+        truncated = len(queries) > Config.BULK_PLAY_MAX
+        queries = queries[:Config.BULK_PLAY_MAX]
+        semaphore = asyncio.Semaphore(Config.BULK_RESOLVE_CONCURRENCY)
+        starts_playback = not self.current_track[chat_id]
+        prefetched = []
+
+        async def resolve(index, query):
+            async with semaphore:
+                try:
+                    video_info = await self.resolve_track(query)
+                except Exception as e:
+                    print(f"Error resolving '{query}': {str(e)}")
+                    return None
+            if video_info and index < Config.BULK_PREFETCH:
+                # The first track starts playing right away if nothing is playing
+                priority = NOW_PLAYING if index == 0 and starts_playback else BACKGROUND
+                self.start_prefetch(video_info, priority, prefetched)
+            return video_info
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[resolve(index, query) for index, query in enumerate(queries)])
+        print(f"Resolved {len(queries)} queries for chat {chat_id} in {time.perf_counter() - started:.1f}s")
+
+        tracks = [video_info for video_info in results if video_info]
+        missing = [query for query, video_info in zip(queries, results) if not video_info]
+        note = f"At most {Config.BULK_PLAY_MAX} tracks are added at once." if truncated else None
+        await self.enqueue_tracks(message, tracks, missing, wait_message, note, prefetched=prefetched)
+
+    async def enqueue_tracks(self, message: Message, tracks, missing=None, wait_message: Message = None, note=None, prefetched=None):
+        """
+        Queue resolved tracks in order with a single summary reply
+
+        The first track starts playing if nothing is playing in the chat.
+
+        Args:
+            tracks: Track information dictionaries
+            missing: Queries or titles that couldn't be resolved, listed in the summary
+            note: Extra line for the summary
+            prefetched: URLs whose prefetch cache references the queue takes over, the rest are released
+        """
+        prefetched = prefetched if prefetched is not None else []
+        try:
+            await self._enqueue_tracks(message, tracks, missing, wait_message, note, prefetched)
+        finally:
+            # References of prefetches that didn't end up queued, play_now holds its own for the first track
+            for url in prefetched:
+                self.audio_cache.release(url)
+            prefetched.clear()
+
+    async def _enqueue_tracks(self, message, tracks, missing, wait_message, note, prefetched):
+        chat_id = message.chat.id
+
+        if not tracks:
+            if wait_message:
+                try:
+                    await wait_message.delete()
+                except Exception as e:
+                    print(f"Error deleting wait message: {str(e)}")
+            await message.reply("No results found for your queries.")
+            return
+
+        # Enqueue in the given order before anything slow happens
+        first_position = len(self.queue[chat_id]) + 1
+        play_first = not self.current_track[chat_id]
+        queued = tracks[1:] if play_first else tracks
+        for video_info in queued:
+            self.queue[chat_id].append(video_info)
+            if video_info['url'] in prefetched:
+                prefetched.remove(video_info['url'])
+            else:
+                self.audio_cache.acquire(video_info['url'])
+        self.request_snapshot()
+
+        summary = []
+        if play_first:
+            summary.append(f"▶️ Playing: {tracks[0]['title']}")
+        if queued:
+            summary.append(f"➕ Added {len(queued)} track(s) to the queue:")
+            for position, video_info in enumerate(queued[:20], first_position):
+                summary.append(f"{position}. {video_info.title} ({video_info.duration_text})")
+            if len(queued) > 20:
+                summary.append(f"... and {len(queued) - 20} more")
+        if missing:
+            summary.append("\n❌ No results for: " + "; ".join(missing[:20]))
+        if note:
+            summary.append(f"\n{note}")
+
+        if play_first:
+            await self.play_now(message, tracks[0], wait_message)
+        elif wait_message:
+            try:
+                await wait_message.delete()
+            except Exception as e:
+                print(f"Error deleting wait message: {str(e)}")
+
+        await message.reply("\n".join(summary))
+        await self.update_queue_display(chat_id)
+
+    async def process_spotify_play(self, message: Message, kind, spotify_id, wait_message: Message = None):
+        """Play a Spotify track, or queue the tracks of a Spotify album or playlist"""
+        chat_id = message.chat.id
+
+        async def fail(text):
+            if wait_message:
+                try:
+                    await wait_message.delete()
+                except Exception as e:
+                    print(f"Error deleting wait message: {str(e)}")
+            await message.reply(text)
+
+        if not self.spotify.configured:
+            await fail("Spotify links aren't supported on this bot, please send the song name instead.")
+            return
+
+        try:
+            spotify_tracks = await self.spotify.tracks(kind, spotify_id)
+        except Exception as e:
+            print(f"Error fetching Spotify {kind} {spotify_id}: {str(e)}")
+            await fail(f"Error reading the Spotify {kind}: {str(e)}")
+            return
+
+        if not spotify_tracks:
+            await fail(f"The Spotify {kind} has no playable tracks.")
+            return
+
+        if wait_message and len(spotify_tracks) > 1:
+            try:
+                await wait_message.edit_text(f"🔍 Matching {len(spotify_tracks)} tracks... Please wait.")
+            except Exception as e:
+                print(f"Error updating wait message: {str(e)}")
+
+        started = time.perf_counter()
+        matches = await self.spotify_matcher.match_many(spotify_tracks)
+        print(f"Matched {sum(1 for match in matches if match)}/{len(spotify_tracks)} Spotify tracks in {time.perf_counter() - started:.1f}s")
+
+        if kind == 'track':
+            if not matches[0]:
+                await fail("Couldn't find this track on YouTube.")
+                return
+            # Same path as a pasted YouTube link
+            await self.process_play_request(message, f"https://www.youtube.com/watch?v={matches[0]['video_id']}", wait_message)
+            return
+
+        if not await self.ensure_assistant(message, wait_message):
+            return
+        self.init_chat(chat_id)
+
+        tracks = []
+        missing = []
+        for spotify_track, match in zip(spotify_tracks, matches):
+            if not match:
+                missing.append(f"{', '.join(spotify_track['artists'])} - {spotify_track['title']}")
+                continue
+            video_info = Track(
+                video_id=match['video_id'],
+                title=match['title'],
+                url=f"https://www.youtube.com/watch?v={match['video_id']}",
+                duration=match['duration'],
+                thumbnail=f"https://i.ytimg.com/vi/{match['video_id']}/hqdefault.jpg",
+            )
+            tracks.append(video_info)
+            try:
+                self.track_index.record(video_info.video_id, video_info.title, duration=video_info.duration_text)
+            except Exception as e:
+                print(f"Error updating track index: {str(e)}")
+
+        prefetched = []
+        for index, video_info in enumerate(tracks[:Config.BULK_PREFETCH]):
+            priority = NOW_PLAYING if index == 0 and not self.current_track[chat_id] else BACKGROUND
+            self.start_prefetch(video_info, priority, prefetched)
+
+        await self.enqueue_tracks(message, tracks, missing, wait_message, prefetched=prefetched)
+
+    async def search_videos(self, query):
+        """YouTube search backend of the Spotify matcher, durations in seconds"""
+        search = get_videos_search()(query, limit=Config.SPOTIFY_CANDIDATES)
+        response = await search.next()
+        return [
+            {
+                'video_id': result['id'],
+                'title': result['title'],
+                'channel': (result.get('channel') or {}).get('name'),
+                'duration': parse_duration(result.get('duration')),
+            }
+            for result in response.get('result', [])
+        ]
+
+    async def inline_search(self, client: Client, inline_query: InlineQuery):
+        """
+        Answer an inline query with candidate tracks
+
+        Every result sends "/play <video URL>", so the chosen video is played
+        exactly instead of searched again. Users type query by query, only the
+        latest query of a user is answered after INLINE_DEBOUNCE seconds. The
+        wait happens in a task, the handler returns right away so keystrokes
+        don't hold Pyrogram's update workers. Results come from the local
+        index and cached searches first.
+        """
+        user_id = inline_query.from_user.id
+        previous = self.inline_queries.get(user_id)
+        if previous and not previous.done():
+            previous.cancel()
+        self.inline_queries[user_id] = asyncio.create_task(self.answer_inline_query(inline_query))
+
+    async def answer_inline_query(self, inline_query: InlineQuery):
+        """Search and answer an inline query once it has been the user's latest for INLINE_DEBOUNCE seconds"""
+        user_id = inline_query.from_user.id
+        await asyncio.sleep(Config.INLINE_DEBOUNCE)
+        # Past the debounce the search isn't cancelled by newer queries anymore
+        if self.inline_queries.get(user_id) is asyncio.current_task():
+            del self.inline_queries[user_id]
+
+        # Over the limit the query is left unanswered, Telegram just shows no results
+        scope, _ = self.rate_limiter.check('inline', user_id, None)
+        if scope:
+            return
+
+        query = inline_query.query.strip()
+        try:
+            candidates = await self.search_candidates(query)
+        except Exception as e:
+            print(f"Error searching for inline query '{query}': {str(e)}")
+            candidates = []
+
+        results = [
+            InlineQueryResultArticle(
+                title=candidate['title'],
+                description=" · ".join(part for part in (candidate['duration'], candidate['channel']) if part),
+                thumb_url=f"https://i.ytimg.com/vi/{candidate['video_id']}/mqdefault.jpg",
+                input_message_content=InputTextMessageContent(
+                    f"/play https://www.youtube.com/watch?v={candidate['video_id']}"
+                ),
+                id=candidate['video_id'],
+            )
+            for candidate in candidates
+        ]
+
+        try:
+            await inline_query.answer(results, cache_time=Config.INLINE_CACHE_TIME if query else 60)
+        except Exception as e:
+            print(f"Error answering inline query: {str(e)}")
+
+    async def search_candidates(self, query):
+        """
+        Candidate tracks for a query: local index matches first, then search results
+
+        Returns:
+            list: Dictionaries with video_id, title, duration and channel
+        """
+        limit = Config.INLINE_RESULTS
+        if not query:
+            return [
+                {'video_id': row['video_id'], 'title': row['title'], 'duration': row['duration'], 'channel': row['channel']}
+                for row in self.track_index.popular(limit)
+            ]
+
+        candidates = [
+            {'video_id': match['video_id'], 'title': match['title'], 'duration': match['duration'], 'channel': match['channel']}
+            for match in self.track_index.search(query, limit=limit)
+        ]
+
+        # A remote search only when the index doesn't fill the list
+        if len(candidates) < limit:
+            searched = self.search_cache.get(query)
+            if searched is None:
+                search = get_videos_search()(query, limit=limit)
+                response = await search.next()
+                searched = [
+                    {
+                        'video_id': result['id'],
+                        'title': result['title'],
+                        'duration': result.get('duration') or "Live",
+                        'channel': (result.get('channel') or {}).get('name'),
+                    }
+                    for result in response.get('result', [])
+                ]
+                self.search_cache.put(query, searched)
+
+            seen = {candidate['video_id'] for candidate in candidates}
+            candidates += [result for result in searched if result['video_id'] not in seen]
+
+        return candidates[:limit]
+
+    def start_prefetch(self, track_info, priority, prefetched):
+        """Start a prefetch holding a cache reference on the track, its URL is added to prefetched for enqueue_tracks"""
+        self.audio_cache.acquire(track_info['url'])
+        prefetched.append(track_info['url'])
+        asyncio.create_task(self.prefetch(track_info, priority))
+
+    async def prefetch(self, track_info, priority=BACKGROUND):
+        """Download a track ahead of time, errors are left to the real play"""
+        try:
+            await self.download_audio(track_info['url'], priority=priority)
+        except Exception as e:
+            print(f"Error prefetching {track_info['title']}: {str(e)}")
+
+    async def ensure_assistant(self, message: Message, wait_message: Message = None):
+        """
+        Make sure the assistant account is a member of the chat
+
+        Returns:
+            bool: Whether the assistant is in the chat
+        """
+        chat_id = message.chat.id
+
         # First check if the assistant user is in the group
         try:
             assistant_member = await self.user.get_chat_member(chat_id, self.user.me.id)
@@ -141,8 +716,10 @@ class MusicBot:
                 await message.reply("❌ Failed to add assistant to the group. Please add it manually or make me admin to invite users.")
                 if wait_message:
                     await wait_message.delete()
-                return
+                return False
+        return True
 
+    def init_chat(self, chat_id):
         # Initialize chat-specific structures if they don't exist
         if chat_id not in self.queue:
             self.queue[chat_id] = []
@@ -151,6 +728,16 @@ class MusicBot:
         if chat_id not in self.is_playing:
             self.is_playing[chat_id] = False
 
+    async def resolve_track(self, query):
+        """
+        Resolve a search query or YouTube URL to a track
+
+        Returns:
+            Track: The resolved track, or None if the search found nothing
+
+        Raises:
+            Exception: If a YouTube URL couldn't be resolved
+        """
         # Check if the query is a YouTube URL
         youtube_regex = r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]+)'
         match = re.match(youtube_regex, query)
@@ -158,157 +745,162 @@ class MusicBot:
         if match:
             # Direct YouTube URL
             video_id = match.group(1)
-            try:
-                with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                    video_info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-
-                # Format video information
-                result = {
-                    'title': video_info['title'],
-                    'link': f"https://www.youtube.com/watch?v={video_id}",
-                    'duration': format_duration(video_info.get('duration', 0)),
-                    'thumbnails': video_info.get('thumbnails', [{'url': None}]),
-                    'id': video_id
-                }
-            except Exception as e:
-                if wait_message:
-                    try:
-                        await wait_message.delete()
-                    except Exception as e:
-                        print(f"Error deleting wait message: {str(e)}")
-                await message.reply(f"Error processing YouTube URL: {str(e)}")
-                return
+            video_info = await self.resolve_media(f"https://www.youtube.com/watch?v={video_id}")
+
+            # Format video information
+            result = {
+                'title': video_info['title'],
+                'link': f"https://www.youtube.com/watch?v={video_id}",
+                'duration': format_duration(int(video_info.get('duration', 0))),
+                'thumbnails': video_info.get('thumbnails', [{'url': None}]),
+                'id': video_id,
+                'channel': {'name': video_info.get('uploader')}
+            }
         else:
-            # Search for videos
-            search = VideosSearch(query, limit=1)
-            results = await search.next()
+            # Repeat queries are answered from the local index without a network search
+            local_match = self.track_index.lookup(query)
+            if local_match:
+                print(f"Resolved '{query}' from the local index ({local_match['confidence']:.2f} confidence)")
+                results = {"result": [{
+                    'title': local_match['title'],
+                    'link': f"https://www.youtube.com/watch?v={local_match['video_id']}",
+                    'duration': local_match['duration'],
+                    'thumbnails': [{'url': f"https://i.ytimg.com/vi/{local_match['video_id']}/hqdefault.jpg"}],
+                    'id': local_match['video_id'],
+                    'channel': {'name': local_match['channel']}
+                }]}
+            else:
+                # Search for videos
+                search = get_videos_search()(query, limit=1)
+                results = await search.next()
 
             if not results["result"]:
-                if wait_message:
-                    try:
-                        await wait_message.delete()
-                    except Exception as e:
-                        print(f"Error deleting wait message: {str(e)}")
-                await message.reply("No results found for your query.")
-                return
+                return None
 
             # Get the first result
             result = results["result"][0]
 
         # Extract video information
-        video_info = {
-            'title': result['title'],
-            'url': result['link'] if match else result['link'],
-            'duration': result['duration'] if not match else format_duration(int(video_info.get('duration', 0))),
-            'thumbnail': result['thumbnails'][0]['url'] if not match else video_info['thumbnails'][0]['url'],
-            'video_id': result['id'] if not match else video_id
-        }
+        video_info = Track(
+            video_id=result['id'],
+            title=result['title'],
+            url=result['link'],
+            duration=result['duration'],
+            thumbnail=result['thumbnails'][0]['url'],
+            channel=(result.get('channel') or {}).get('name')
+        )
 
-        # Download thumbnail
-        thumbnail_path = await download_thumbnail(video_info['video_id'])
+        # Remember the resolved track for future queries
+        try:
+            self.track_index.record(
+                video_info.video_id,
+                video_info.title,
+                video_info.channel,
+                result['duration']
+            )
+        except Exception as e:
+            print(f"Error updating track index: {str(e)}")
 
-        # Create caption
-        caption = create_music_caption(video_info)
+        return video_info
 
-        # If no track is currently playing, play this one
-        if not self.current_track[chat_id]:
-            self.current_track[chat_id] = video_info
+    async def play_now(self, message: Message, video_info, wait_message: Message = None):
+        """
+        Make a track the current track of a chat and start streaming it
 
-            # Download the audio file
-            try:
-                # Update wait message
-                if wait_message:
-                    try:
-                        await wait_message.edit_text(f"⬇️ Downloading audio for: {video_info['title']}")
-                    except Exception as e:
-                        print(f"Error updating wait message: {str(e)}")
+        Returns:
+            bool: Whether the track was downloaded and handed to the call
+        """
+        chat_id = message.chat.id
+        self.current_track[chat_id] = video_info
+        self.audio_cache.acquire(video_info['url'])
 
-                audio_file = await self.download_audio(video_info['url'])
-                print(f"Downloaded audio file: {audio_file}")
-            except Exception as e:
-                print(f"Error downloading audio: {str(e)}")
-                if wait_message:
-                    try:
-                        await wait_message.delete()
-                    except Exception as e:
-                        print(f"Error deleting wait message: {str(e)}")
-                await message.reply(f"Error downloading audio: {str(e)}")
-                return
+        # Claim a held call before downloading, the hold expiring meanwhile would stop this track
+        held = chat_id in self.idle_holds
+        self.end_idle_hold(chat_id, 'reused')
 
-            # Delete wait message if it exists
+        # Download the audio file
+        try:
+            # Update wait message
+            if wait_message:
+                try:
+                    await wait_message.edit_text(f"⬇️ Downloading audio for: {video_info['title']}")
+                except Exception as e:
+                    print(f"Error updating wait message: {str(e)}")
+
+            audio_file = await self.download_audio(video_info['url'])
+            print(f"Downloaded audio file: {audio_file}")
+        except Exception as e:
+            print(f"Error downloading audio: {str(e)}")
             if wait_message:
                 try:
                     await wait_message.delete()
                 except Exception as e:
                     print(f"Error deleting wait message: {str(e)}")
+            await message.reply(f"Error downloading audio: {str(e)}")
+            if held and self.current_track.get(chat_id) is video_info:
+                # Nothing to play after all, hold the call again
+                await self.release_track(video_info)
+                self.current_track[chat_id] = None
+                self.hold_idle_call(chat_id)
+            return False
 
-            # Create a control message
-            await self.create_control_message(chat_id, message)
+        # Delete wait message if it exists
+        if wait_message:
+            try:
+                await wait_message.delete()
+            except Exception as e:
+                print(f"Error deleting wait message: {str(e)}")
 
-            # Start streaming
-            await self.start_streaming(chat_id, audio_file, message)
+        # Create a control message
+        await self.create_control_message(chat_id, message)
 
-            # Register callbacks if not already registered
-            self.register_callbacks()
-        else:
-            # Add to queue
-            position = len(self.queue[chat_id]) + 1  # Position in queue (1-indexed)
-            self.queue[chat_id].append(video_info)
+        # Start streaming
+        await self.start_streaming(chat_id, audio_file, message)
 
-            # Create caption
-            caption = create_music_caption(video_info)
+        self.request_snapshot()
+        return True
 
-            # Delete wait message if it exists
-            if wait_message:
-                try:
-                    await wait_message.delete()
-                except Exception as e:
-                    print(f"Error deleting wait message: {str(e)}")
+    async def update_queue_display(self, chat_id):
+        """Show the current queue on the control message"""
+        # Update the control message keyboard if it exists
+        if chat_id in self.control_messages:
+            try:
+                # Get the current keyboard and update it
+                has_queue = chat_id in self.queue and len(self.queue[chat_id]) > 0
+                is_playing = chat_id in self.is_playing and self.is_playing[chat_id]
+                keyboard = get_music_control_keyboard(is_playing=is_playing, has_queue=has_queue)
 
-            # Send message with thumbnail
-            if thumbnail_path:
-                await message.reply_photo(
-                    photo=thumbnail_path,
-                    caption=f"{caption}\n\nAdded to queue at position {position}."
-                )
-            else:
-                await message.reply_text(
-                    f"{caption}\n\nAdded to queue at position {position}."
-                )
+                # Update the caption with queue information
+                if chat_id in self.current_track and self.current_track[chat_id]:
+                    updated_caption = create_music_caption(
+                        self.current_track[chat_id],
+                        queue=self.queue[chat_id]
+                    )
 
-            # Update the control message keyboard if it exists
-            if chat_id in self.control_messages:
-                try:
-                    # Get the current keyboard and update it
-                    has_queue = chat_id in self.queue and len(self.queue[chat_id]) > 0
-                    is_playing = chat_id in self.is_playing and self.is_playing[chat_id]
-                    keyboard = get_music_control_keyboard(is_playing=is_playing, has_queue=has_queue)
-
-                    # Update the caption with queue information
-                    if chat_id in self.current_track and self.current_track[chat_id]:
-                        updated_caption = create_music_caption(
-                            self.current_track[chat_id],
-                            queue=self.queue[chat_id]
-                        )
+                    # Edit the message to update both caption and keyboard
+                    await self.control_messages[chat_id].edit_caption(
+                        caption=updated_caption,
+                        reply_markup=keyboard
+                    )
+                else:
+                    # Just update the keyboard if we can't update the caption
+                    await self.control_messages[chat_id].edit_reply_markup(
+                        reply_markup=keyboard
+                    )
+            except Exception as e:
+                print(f"Error updating control message: {str(e)}")
 
-                        # Edit the message to update both caption and keyboard
-                        await self.control_messages[chat_id].edit_caption(
-                            caption=updated_caption,
-                            reply_markup=keyboard
-                        )
-                    else:
-                        # Just update the keyboard if we can't update the caption
-                        await self.control_messages[chat_id].edit_reply_markup(
-                            reply_markup=keyboard
-                        )
-                except Exception as e:
-                    print(f"Error updating control message: {str(e)}")
+    async def download_audio(self, track_info, priority=NOW_PLAYING) -> str:
+        """
+        Download audio from a YouTube video
 
-    async def download_audio(self, track_info) -> str:
-        """Download audio from a YouTube video"""
+        Args:
+            track_info: Track information dictionary or URL
+            priority: Scheduler class of the download, NOW_PLAYING when a user is waiting on it
+        """
         try:
             # Handle both URL strings and track_info dictionaries
-            url = track_info['url'] if isinstance(track_info, dict) else track_info
+            url = track_info if isinstance(track_info, str) else track_info['url']
 
             # Create a unique filename based on the URL
             filename = f"audio_{hashlib.md5(url.encode()).hexdigest()}.mp3"
@@ -317,6 +909,7 @@ class MusicBot:
             # Check if the file already exists
             if os.path.exists(output_file):
                 print(f"Audio file already exists: {output_file}")
+                self.schedule_analysis(output_file)
                 return output_file
 
             # Check if file with double extension exists (fix for previous downloads)
@@ -336,27 +929,42 @@ class MusicBot:
             # Ensure download directory exists
             os.makedirs(self.download_dir, exist_ok=True)
 
-            # Define options for youtube-dl
-            ydl_opts = {
-                'format': 'bestaudio/best',
-                'outtmpl': output_file,  # No extension here, it will be added by the postprocessor
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-                'quiet': True,
-                'no_warnings': True,
-            }
+            # Share the download with any other chat already fetching this track
+            download = self.active_downloads.get(url)
+            if download is None:
+                ticket = JobTicket(priority)
+                download = asyncio.ensure_future(self._run_download(url, output_file, ticket))
+                self.active_downloads[url] = download
+                self.download_tickets[url] = ticket
+                def forget(_):
+                    self.active_downloads.pop(url, None)
+                    self.download_tickets.pop(url, None)
+                download.add_done_callback(forget)
+            else:
+                # A prefetch someone is now waiting on runs at the waiter's priority
+                self.media_scheduler.boost(self.download_tickets[url], priority)
 
-            # Download the audio
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                print(f"Downloading audio from: {url}")
-                ydl.download([url])
+            self.download_waiters[url] = self.download_waiters.get(url, 0) + 1
+            try:
+                await asyncio.shield(download)
+            except asyncio.CancelledError:
+                # Nobody else is waiting for the file, e.g. a superseded skip target
+                if self.download_waiters.get(url) == 1 and not download.done():
+                    print(f"Cancelling download nobody is waiting for: {url}")
+                    download.cancel()
+                raise
+            finally:
+                remaining = self.download_waiters.pop(url, 1) - 1
+                if remaining:
+                    self.download_waiters[url] = remaining
+
+            # Make room for the new file if the cache is over its budget
+            await self.evict_cache()
 
             # Check if the file was created
             if os.path.exists(output_file):
                 print(f"Downloaded audio file: {output_file}")
+                self.schedule_analysis(output_file)
                 return output_file
 
             # Check if file with double extension was created
@@ -378,11 +986,118 @@ class MusicBot:
             print(f"Error downloading audio: {str(e)}")
             raise
 
-    async def start_streaming(self, chat_id, audio_file, message=None):
-        """Start streaming audio in a voice chat"""
+    async def _run_download(self, url, output_file, ticket):
+        """
+        Download a track as scheduled jobs
+
+        Direct HTTP formats are fetched in concurrent, resumable byte-range
+        segments and converted to mp3. Anything else goes through yt-dlp.
+        The ticket carries the priority class, it can be raised meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        source_file = f"{output_file}.source"
+
+        async with self.media_scheduler.job(ticket, 'net'):
+            media = None
+            try:
+                media = await self.resolve_media(url)
+            except Exception as e:
+                print(f"Error extracting audio format: {str(e)}")
+
+            segmented = False
+            if media and media.get('protocol') in ('http', 'https') and media.get('url'):
+                try:
+                    print(f"Downloading audio in segments from: {url}")
+                    await download_segmented(
+                        media['url'],
+                        source_file,
+                        headers=media.get('http_headers'),
+                        size=media.get('filesize')
+                    )
+                    segmented = True
+                except DownloadError as e:
+                    print(f"Segmented download failed, falling back to yt-dlp: {str(e)}")
+                    # The URL may have been revoked before its signed expiry
+                    self.media_urls.invalidate(video_id_from_url(url))
+
+            if not segmented:
+                await loop.run_in_executor(None, self._ytdl_download, url, output_file)
+                return
+
+        # Convert outside the download slot
+        async with self.media_scheduler.job(ticket, 'cpu'):
+            await convert_to_mp3(source_file, output_file, background=ticket.priority == BACKGROUND)
+        os.remove(source_file)
+
+    async def resolve_media(self, url):
+        """
+        Direct media URL and metadata of the best audio format of a video
+
+        Reuses a still valid resolution of the same video from any chat instead
+        of running the yt-dlp extraction again.
+        """
+        video_id = video_id_from_url(url)
+        if video_id:
+            media = self.media_urls.get(video_id)
+            if media:
+                print(f"Reusing resolved media URL for {video_id}")
+                return media
+
+        loop = asyncio.get_running_loop()
+        media = await loop.run_in_executor(None, self._extract_audio_format, url)
+        self.media_urls.put(video_id, media)
+        return media
+
+    def _extract_audio_format(self, url):
+        """Resolve the direct URL and metadata of the best audio format"""
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'quiet': True,
+            'no_warnings': True,
+        }
+        with get_yt_dlp().YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    def _ytdl_download(self, url, output_file):
+        """Download and convert a track with yt-dlp, blocking"""
+        # Define options for youtube-dl
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': output_file,  # No extension here, it will be added by the postprocessor
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+            'quiet': True,
+            'no_warnings': True,
+        }
+
+        # Download the audio
+        with get_yt_dlp().YoutubeDL(ydl_opts) as ydl:
+            print(f"Downloading audio from: {url}")
+            ydl.download([url])
+
+    async def start_streaming(self, chat_id, audio_file, message=None, offset=0, wait_in_background=True):
+        """
+        Start streaming audio in a voice chat
+
+        Args:
+            chat_id: Chat ID
+            audio_file: File to stream
+            message: Message to reply to with status and controls
+            offset: Position in the track audio_file starts at, for seeked files
+            wait_in_background: Wait for a call slot in a task of the chat's instead of in this call
+
+        Returns:
+            bool: Whether the audio is streaming, or the chat is waiting in line to stream it
+        """
         try:
             print(f"Starting streaming in chat {chat_id}")
 
+            # A held call is still joined, the stream is changed instead of joining again
+            self.end_idle_hold(chat_id, 'reused')
+
             # Check if we have a current track
             if chat_id not in self.current_track or not self.current_track[chat_id]:
                 print(f"No current track for chat {chat_id}")
@@ -431,12 +1146,7 @@ class MusicBot:
 
                 try:
                     # Create an AudioPiped object with AudioParameters
-                    audio_stream = AudioPiped(
-                        audio_file,
-                        AudioParameters(
-                            bitrate=48000,
-                        ),
-                    )
+                    audio_stream = self.build_audio_stream(audio_file, self.current_track[chat_id], offset=offset)
 
                     # Try to change the stream using the call manager
                     await self.call_manager.change_stream(
@@ -446,6 +1156,7 @@ class MusicBot:
                     print(f"Successfully changed stream with call_manager for chat {chat_id}")
                     # Mark the call as active
                     self.active_calls[chat_id] = True
+                    self.call_admission.occupy(chat_id)
                     self.is_playing[chat_id] = True
 
                     # Delete the status message
@@ -492,30 +1203,64 @@ class MusicBot:
                         except Exception as e:
                             print(f"Error deleting status message: {str(e)}")
 
-            # Try to join a new group call
-            try:
-                # Send a message that we're joining a voice chat
-                if message:
-                    status_msg = await message.reply("🎵 Joining voice chat...")
+            # Past MAX_ACTIVE_CALLS the chat waits in line for a slot. Update handlers don't wait,
+            # Pyrogram has only a few workers and the updates that free slots would queue behind them
+            if wait_in_background and not self.call_admission.available(chat_id):
+                self.wait_for_call(chat_id, message, lambda: self.join_call(chat_id, audio_file, message, offset))
+                return True
+            if not await self.admit_call(chat_id, message):
+                return False
+            return await self.join_call(chat_id, audio_file, message, offset)
+        except Exception as e:
+            print(f"Error in start_streaming: {str(e)}")
+            if message:
+                await message.reply(f"Error starting stream: {str(e)}")
+            return False
 
-                print(f"Joining new group call in chat {chat_id}")
+    async def join_call(self, chat_id, audio_file, message=None, offset=0):
+        """Join the voice chat of a chat that holds a call slot and stream audio_file"""
+        try:
+            # Send a message that we're joining a voice chat
+            if message:
+                status_msg = await message.reply("🎵 Joining voice chat...")
 
-                # Create an AudioPiped object with AudioParameters
-                audio_stream = AudioPiped(
-                    audio_file,
-                    AudioParameters(
-                        bitrate=48000,
-                    ),
-                )
+            print(f"Joining new group call in chat {chat_id}")
 
-                self.group_calls[chat_id] = await self.call_manager.join_group_call(
-                    chat_id,
-                    audio_stream
-                )
-                print(f"Successfully joined group call in chat {chat_id}")
-                # Mark the call as active
+            # Create an AudioPiped object with AudioParameters
+            audio_stream = self.build_audio_stream(audio_file, self.current_track[chat_id], offset=offset)
+
+            self.group_calls[chat_id] = await self.call_manager.join_group_call(
+                chat_id,
+                audio_stream
+            )
+            print(f"Successfully joined group call in chat {chat_id}")
+            # Mark the call as active
+            self.active_calls[chat_id] = True
+            self.is_playing[chat_id] = True
+
+            # Delete the status message
+            if message and 'status_msg' in locals():
+                try:
+                    await status_msg.delete()
+                except Exception as e:
+                    print(f"Error deleting status message: {str(e)}")
+
+            # Create a control message if message is provided
+            if message and chat_id in self.current_track and self.current_track[chat_id]:
+                # Create a new control message
+                await self.create_control_message(chat_id, message)
+
+                # Start periodic updates
+                await self.start_periodic_updates(chat_id)
+
+            return True
+        except Exception as e:
+            print(f"Error joining group call: {str(e)}")
+            # If we get "Already joined into group call" error, mark the call as active anyway
+            if "Already joined into group call" in str(e):
                 self.active_calls[chat_id] = True
                 self.is_playing[chat_id] = True
+                print(f"Already in group call for chat {chat_id}, marking as active")
 
                 # Delete the status message
                 if message and 'status_msg' in locals():
@@ -524,76 +1269,274 @@ class MusicBot:
                     except Exception as e:
                         print(f"Error deleting status message: {str(e)}")
 
-                # Create a control message if message is provided
-                if message and chat_id in self.current_track and self.current_track[chat_id]:
-                    # Create a new control message
-                    await self.create_control_message(chat_id, message)
+                # Try to change the stream using the call manager directly
+                try:
+                    # Create an AudioPiped object with AudioParameters
+                    audio_stream = self.build_audio_stream(audio_file, self.current_track[chat_id], offset=offset)
 
-                    # Start periodic updates
-                    await self.start_periodic_updates(chat_id)
+                    await self.call_manager.change_stream(
+                        chat_id,
+                        audio_stream
+                    )
+                    print(f"Successfully changed stream using call_manager.change_stream after 'Already joined' error")
 
-                return True
-            except Exception as e:
-                print(f"Error joining group call: {str(e)}")
-                # If we get "Already joined into group call" error, mark the call as active anyway
-                if "Already joined into group call" in str(e):
-                    self.active_calls[chat_id] = True
-                    self.is_playing[chat_id] = True
-                    print(f"Already in group call for chat {chat_id}, marking as active")
+                    # Create a control message if message is provided
+                    if message and chat_id in self.current_track and self.current_track[chat_id]:
+                        # Create a new control message
+                        await self.create_control_message(chat_id, message)
 
-                    # Delete the status message
-                    if message and 'status_msg' in locals():
-                        try:
-                            await status_msg.delete()
-                        except Exception as e:
-                            print(f"Error deleting status message: {str(e)}")
+                    return True
+                except Exception as e2:
+                    print(f"Error changing stream with call_manager after 'Already joined' error: {str(e2)}")
+                    if message:
+                        await message.reply(f"Error changing stream: {str(e2)}")
+                    return False
+            else:
+                self.call_admission.release(chat_id)
 
-                    # Try to change the stream using the call manager directly
+                # Delete the status message
+                if message and 'status_msg' in locals():
                     try:
-                        # Create an AudioPiped object with AudioParameters
-                        audio_stream = AudioPiped(
-                            audio_file,
-                            AudioParameters(
-                                bitrate=48000,
-                            ),
-                        )
+                        await status_msg.delete()
+                    except Exception as e:
+                        print(f"Error deleting status message: {str(e)}")
 
-                        await self.call_manager.change_stream(
-                            chat_id,
-                            audio_stream
-                        )
-                        print(f"Successfully changed stream using call_manager.change_stream after 'Already joined' error")
+                if message:
+                    await message.reply(f"Error joining voice chat: {str(e)}")
+                return False
 
-                        # Create a control message if message is provided
-                        if message and chat_id in self.current_track and self.current_track[chat_id]:
-                            # Create a new control message
-                            await self.create_control_message(chat_id, message)
+    def schedule_analysis(self, audio_file):
+        """Analyze a file that entered the cache in the background, once"""
+        file_hash = hash_from_filename(os.path.basename(audio_file))
+        if file_hash in self.audio_analysis or file_hash in self.analysis_tasks:
+            return
+        self.analysis_tasks[file_hash] = asyncio.create_task(self._analyze(file_hash, audio_file))
 
-                        return True
-                    except Exception as e2:
-                        print(f"Error changing stream with call_manager after 'Already joined' error: {str(e2)}")
-                        if message:
-                            await message.reply(f"Error changing stream: {str(e2)}")
-                        return False
-                else:
-                    # Delete the status message
-                    if message and 'status_msg' in locals():
-                        try:
-                            await status_msg.delete()
-                        except Exception as e:
-                            print(f"Error deleting status message: {str(e)}")
+    async def _analyze(self, file_hash, audio_file):
+        try:
+            async with self.media_scheduler.job(BACKGROUND, 'cpu'):
+                self.audio_analysis[file_hash] = await analyze_audio(audio_file)
+        except Exception as e:
+            print(f"Error analyzing audio: {str(e)}")
+        finally:
+            self.analysis_tasks.pop(file_hash, None)
 
-                    if message:
-                        await message.reply(f"Error joining voice chat: {str(e)}")
-                    return False
+    def get_analysis(self, track_url):
+        """
+        Stored analysis of a track's cached audio
+
+        Returns:
+            dict: The analysis, or None if it isn't available yet
+        """
+        file_hash = url_hash(track_url)
+        if file_hash not in self.audio_analysis:
+            analysis = load_analysis(os.path.join(self.download_dir, f"audio_{file_hash}.mp3"))
+            if analysis is None:
+                return None
+            self.audio_analysis[file_hash] = analysis
+        return self.audio_analysis[file_hash]
+
+    def intro_skip(self, track_info):
+        """Seconds of leading silence skipped when a track plays from the start"""
+        analysis = self.get_analysis(track_info['url']) if track_info else None
+        return analysis['trim_start'] if analysis else 0
+
+    def build_audio_stream(self, audio_file, track_info=None, offset=0):
+        """
+        Create the input stream for a track, applying its stored gain and silence trim
+
+        Args:
+            audio_file: File to stream
+            track_info: Track being streamed, used to find its analysis
+            offset: Position in the track audio_file starts at, for seeked files
+        """
+        ffmpeg_parameters = []
+        analysis = self.get_analysis(track_info['url']) if track_info else None
+        if analysis:
+            start = analysis['trim_start'] - offset
+            end = analysis['trim_end'] - offset
+            if start > 0:
+                ffmpeg_parameters += ['-ss', f"{start:.2f}"]
+            if analysis['trim_end'] < analysis['duration'] and end > max(start, 0):
+                ffmpeg_parameters += ['-to', f"{end:.2f}"]
+            if analysis['gain']:
+                ffmpeg_parameters += ['-atmid', '-af', f"volume={analysis['gain']:.2f}dB"]
+
+        return AudioPiped(
+            audio_file,
+            self.audio_parameters(),
+            additional_ffmpeg_parameters=' '.join(ffmpeg_parameters),
+        )
+
+    def audio_parameters(self):
+        """Audio format of a new stream, from the quality tier the current load allows"""
+        active_calls = sum(1 for active in self.active_calls.values() if active)
+        rate, channels = self.quality.select(active_calls)
+        return AudioParameters(
+            bitrate=rate,
+            channels=channels,
+        )
+
+    async def _quality_loop(self):
+        """Sample the CPU load for the quality tiers and log the CPU used per call"""
+        samples = 0
+        while True:
+            await asyncio.sleep(Config.QUALITY_SAMPLE_INTERVAL)
+            try:
+                active_calls = sum(1 for active in self.active_calls.values() if active)
+                self.quality.sample(active_calls)
+                samples += 1
+                # Log the per-tier figures every few minutes
+                if samples % 20 == 0:
+                    for (rate, channels), cores in self.quality.stats().items():
+                        print(f"Quality tier {rate} Hz/{channels}ch: {cores:.3f} CPU cores per call")
+            except Exception as e:
+                print(f"Error sampling CPU load: {str(e)}")
+
+    def track_duration(self, track_info):
+        """Duration of a track in seconds, exact when its audio has been analyzed"""
+        analysis = self.get_analysis(track_info['url'])
+        if analysis:
+            return int(analysis['duration'])
+        return track_info.duration
+
+    async def maybe_stage_next(self, chat_id):
+        """Decode the head of the next queued track when the current one is about to end"""
+        if not Config.PCM_STAGING or not self.queue.get(chat_id) or chat_id in self.staging_chats:
+            return
+
+        next_track = self.queue[chat_id][0]
+        staged = self.staged_tracks.get(chat_id)
+        if staged and staged['url'] == next_track['url']:
+            return
+
+        # Only stage during the last part of the current track
+        duration = self.track_duration(self.current_track[chat_id])
+        if duration is None or duration - self.get_position(chat_id) > Config.STAGING_LEAD_SECONDS:
+            return
+
+        self.staging_chats.add(chat_id)
+        try:
+            # The queue changed since the last staging
+            if staged:
+                self.discard_staged(self.staged_tracks.pop(chat_id))
+
+            audio_file = await self.download_audio(next_track['url'], priority=BACKGROUND)
+
+            # Apply the stored analysis while decoding, like build_audio_stream does
+            analysis = self.get_analysis(next_track['url'])
+            start, end, gain = 0, None, 0
+            if analysis:
+                start = analysis['trim_start']
+                if analysis['trim_end'] < analysis['duration']:
+                    end = analysis['trim_end']
+                gain = analysis['gain']
+
+            parameters = self.audio_parameters()
+            raw_file = os.path.join(self.download_dir, f"staged_{url_hash(next_track['url'])}_{abs(chat_id)}.raw")
+
+            started = time.perf_counter()
+            async with self.media_scheduler.job(BACKGROUND, 'cpu'):
+                decoded = await decode_head(audio_file, raw_file, Config.STAGING_HEAD_SECONDS,
+                                            parameters.bitrate, parameters.channels, start, end, gain)
+            if not decoded:
+                return
+
+            self.staged_tracks[chat_id] = {
+                'url': next_track['url'],
+                'audio_file': audio_file,
+                'raw_file': raw_file,
+                'start': start,
+                'end': end,
+                'gain': gain,
+                'parameters': parameters,
+                'task': None,
+            }
+            print(f"Staged {next_track['title']} for chat {chat_id} in {(time.perf_counter() - started) * 1000:.0f} ms")
         except Exception as e:
-            print(f"Error in start_streaming: {str(e)}")
-            if message:
-                await message.reply(f"Error starting stream: {str(e)}")
-            return False
+            print(f"Error staging next track: {str(e)}")
+        finally:
+            self.staging_chats.discard(chat_id)
+
+    def take_staged_stream(self, chat_id, track_info):
+        """
+        Build the stream of a track from its staged head if it was staged
+
+        The rest of the track is decoded into the same raw file while the head plays.
+
+        Returns:
+            InputStream: The raw stream, or None if the track wasn't staged
+        """
+        staged = self.staged_tracks.pop(chat_id, None)
+        if not staged:
+            return None
+        if staged['url'] != track_info['url'] or not os.path.exists(staged['raw_file']):
+            self.discard_staged(staged)
+            return None
+
+        # The raw audio was decoded at the tier chosen when it was staged
+        parameters = staged['parameters']
+        staged['task'] = asyncio.create_task(continue_decode(
+            staged['audio_file'],
+            staged['raw_file'],
+            parameters.bitrate,
+            parameters.channels,
+            start=staged['start'] + Config.STAGING_HEAD_SECONDS,
+            end=staged['end'],
+            gain=staged['gain']
+        ))
+        self.staged_playing[chat_id] = staged
+
+        return InputStream(
+            InputAudioStream(
+                staged['raw_file'],
+                parameters,
+            ),
+        )
+
+    def discard_staged(self, staged):
+        """Stop the decoder of a staged track and delete its raw file"""
+        if not staged:
+            return
+        if staged['task'] and not staged['task'].done():
+            staged['task'].cancel()
+        remove_raw_file(staged['raw_file'])
+
+    def record_transition(self, chat_id, ended_at, staged):
+        """Record the gap between a stream ending and the next one being handed to the call"""
+        gap = time.perf_counter() - ended_at
+        kind = 'staged' if staged else 'decoded'
+        stats = self.transition_stats.setdefault(kind, {'count': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['total'] += gap
+        stats['max'] = max(stats['max'], gap)
+        print(
+            f"Transition gap in chat {chat_id}: {gap * 1000:.0f} ms ({kind}, "
+            f"average {stats['total'] / stats['count'] * 1000:.0f} ms over {stats['count']})"
+        )
+
+    async def release_track(self, track_info):
+        """Drop the cache reference held by a track and evict what is no longer needed"""
+        if not track_info or not track_info.get('url'):
+            return
+
+        remaining = self.audio_cache.release(track_info['url'])
+        print(f"Released cache reference for {track_info['url']} ({remaining} remaining)")
+        await self.evict_cache()
+
+    async def evict_cache(self):
+        """Delete the files of cache entries picked by the eviction policy"""
+        for file_hash in self.audio_cache.evict():
+            self.audio_analysis.pop(file_hash, None)
+            await self.cleanup_audio_file(os.path.join(self.download_dir, f"audio_{file_hash}.mp3"))
 
     async def cleanup_audio_file(self, audio_file: str):
-        """Delete an audio file, its thumbnail, and any related seeked files if they exist"""
+        """
+        Delete an audio file, its thumbnail, and any related seeked files if they exist
+
+        Only the cache eviction should call this, files of referenced tracks may be
+        in use by other chats.
+        """
         try:
             if not audio_file:
                 return
@@ -659,21 +1602,30 @@ class MusicBot:
         try:
             print(f"Attempting to stop streaming in chat {chat_id}")
 
-            # Get the current track info
-            current_track = self.current_track.get(chat_id)
-            if current_track:
-                # Clean up using the audio file
-                audio_file = current_track.get('audio_file')
-                if audio_file:
-                    await self.cleanup_audio_file(audio_file)
+            self.cancel_pending_skip(chat_id)
+            self.detach_listener(chat_id)
+            self.end_idle_hold(chat_id, 'stopped')
+            self.cancel_call_wait(chat_id)
+            self.paused_since.pop(chat_id, None)
+
+            # Drop staged audio of this chat
+            self.discard_staged(self.staged_tracks.pop(chat_id, None))
+            self.discard_staged(self.staged_playing.pop(chat_id, None))
+
+            # Release the cache references of the current track and the queue
+            await self.release_track(self.current_track.get(chat_id))
+            for track in self.queue.get(chat_id, []):
+                await self.release_track(track)
 
             # Original stop_streaming logic
             if chat_id in self.group_calls and self.group_calls[chat_id]:
+                self.leaving_calls.add(chat_id)
                 try:
                     await self.call_manager.leave_group_call(chat_id)
                     self.group_calls[chat_id] = None
                 except Exception as e:
                     print(f"Error leaving group call: {str(e)}")
+            self.call_admission.release(chat_id)
 
             # Clear all track-related data
             self.current_track[chat_id] = None
@@ -684,10 +1636,13 @@ class MusicBot:
             if hasattr(self, 'playback_start_times') and chat_id in self.playback_start_times:
                 del self.playback_start_times[chat_id]
 
+            self.request_snapshot()
             print(f"Successfully cleaned up resources for chat {chat_id}")
 
         except Exception as e:
             print(f"Error in stop_streaming: {str(e)}")
+        finally:
+            self.leaving_calls.discard(chat_id)
 
     async def handle_track_finish(self, message: Message):
         """Handle when a track finishes playing"""
@@ -705,7 +1660,7 @@ class MusicBot:
         if self.repeat_mode.get(chat_id, False) and not self.repeat_used.get(chat_id, True):
             print(f"Repeating track once for chat {chat_id}")
             if chat_id in self.current_track and self.current_track[chat_id]:
-                current_track = self.current_track[chat_id].copy()  # Make a copy to be safe
+                current_track = self.current_track[chat_id]
 
                 # Mark repeat as used
                 self.repeat_used[chat_id] = True
@@ -730,12 +1685,16 @@ class MusicBot:
             await self.skip_track(message)
         else:
             print(f"No more tracks in queue for chat {chat_id}")
+            await self.release_track(self.current_track.get(chat_id))
             self.current_track[chat_id] = None
             self.is_playing[chat_id] = False
 
-            await self.stop_streaming(chat_id, message)
+            held = self.hold_idle_call(chat_id)
+            if not held:
+                await self.stop_streaming(chat_id, message)
 
             # Delete the control message if it exists
+            self.card_refresh_times.pop(chat_id, None)
             if chat_id in self.control_messages:
                 try:
                     await self.control_messages[chat_id].delete()
@@ -743,27 +1702,338 @@ class MusicBot:
                 except Exception as e:
                     print(f"Error deleting control message: {str(e)}")
 
-            await message.reply("Queue finished. Left the voice chat.")
+            if held:
+                await message.reply(f"Queue finished. Staying in the voice chat for {Config.IDLE_HOLD_SECONDS}s in case you play something else.")
+            else:
+                await message.reply("Queue finished. Left the voice chat.")
+
+    async def handle_call_drop(self, chat_id, reason):
+        """
+        React to the assistant no longer being in a chat's call
+
+        The call state is cleared so nothing treats the call as active, a chat
+        that was playing gets its call rejoined at the position it dropped at.
+        """
+        if self.shutting_down or chat_id in self.leaving_calls or chat_id in self.recovering_calls:
+            return
+
+        print(f"Call dropped in chat {chat_id}: {reason}")
+        self.active_calls[chat_id] = False
+        self.group_calls[chat_id] = None
+        self.end_idle_hold(chat_id, 'stopped')
+
+        # Listening chats are fed again when the broadcast restarts its decode
+        source = self.broadcast_subscriptions.get(chat_id)
+        if source is not None:
+            self.broadcasts[source]['joined'].discard(chat_id)
+            self.call_admission.release(chat_id)
+            return
+
+        if self.current_track.get(chat_id):
+            # The slot stays taken while rejoining, stop_streaming frees it if recovery gives up
+            await self.recover_call(chat_id)
+        else:
+            # Nothing to rejoin, e.g. the voice chat was closed during an idle hold
+            self.call_admission.release(chat_id)
+
+    async def recover_call(self, chat_id):
+        """Rejoin a dropped call with backoff and resume the current track where it dropped"""
+        track = self.current_track.get(chat_id)
+        if not track or chat_id in self.recovering_calls:
+            return
+
+        self.recovering_calls.add(chat_id)
+        dropped_at = time.monotonic()
+        position = int(self.get_position(chat_id))
+        paused = not self.is_playing.get(chat_id, False)
+        self.discard_staged(self.staged_playing.pop(chat_id, None))
+
+        try:
+            for attempt in range(1, Config.CALL_RECOVERY_ATTEMPTS + 1):
+                if self.current_track.get(chat_id) is not track or self.shutting_down:
+                    # Stopped or skipped meanwhile
+                    return
+                try:
+                    audio_file = await self.download_audio(track['url'])
+                    if position > 0:
+                        seeked_audio_file = await self.create_seeked_file(track['url'], position, priority=NOW_PLAYING)
+                        if seeked_audio_file:
+                            audio_file = seeked_audio_file
+                        else:
+                            position = 0
+
+                    audio_stream = self.build_audio_stream(audio_file, track, offset=position)
+                    try:
+                        self.group_calls[chat_id] = await self.call_manager.join_group_call(chat_id, audio_stream)
+                    except Exception as e:
+                        if "Already joined" not in str(e):
+                            raise
+                        await self.call_manager.change_stream(chat_id, audio_stream)
+
+                    self.active_calls[chat_id] = True
+                    self.is_playing[chat_id] = True
+                    self.paused_positions.pop(chat_id, None)
+                    self.playback_start_times[chat_id] = time.time() - position
+                    if paused:
+                        await self.pause_stream(chat_id)
+
+                    recovered = time.monotonic() - dropped_at
+                    self.recovery_stats['recovered'] += 1
+                    self.recovery_stats['total'] += recovered
+                    self.recovery_stats['max'] = max(self.recovery_stats['max'], recovered)
+                    print(f"Recovered the call in chat {chat_id} at {position}s in {recovered:.1f}s (attempt {attempt})")
+                    await self.app.send_message(chat_id, f"🔌 Reconnected to the voice chat, resuming {track['title']}.")
+                    return
+                except Exception as e:
+                    delay = backoff_delay(attempt) * 4
+                    print(f"Rejoining the call in chat {chat_id} failed (attempt {attempt}): {str(e)}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+            self.recovery_stats['failed'] += 1
+            print(f"Giving up on the call in chat {chat_id}")
+            await self.stop_streaming(chat_id)
+            if chat_id in self.control_messages:
+                try:
+                    await self.control_messages.pop(chat_id).delete()
+                except Exception as e:
+                    print(f"Error deleting control message: {str(e)}")
+            await self.app.send_message(chat_id, "Lost the voice chat and couldn't rejoin it, playback stopped.")
+        finally:
+            self.recovering_calls.discard(chat_id)
+
+    async def _call_watchdog(self):
+        """Check the calls believed to be active against the call manager"""
+        while not self.shutting_down:
+            await asyncio.sleep(Config.CALL_WATCHDOG_INTERVAL)
+            for chat_id, active in list(self.active_calls.items()):
+                if not active or chat_id in self.recovering_calls or chat_id in self.leaving_calls:
+                    continue
+                try:
+                    await self.call_manager.get_call(chat_id)
+                except GroupCallNotFound:
+                    await self.handle_call_drop(chat_id, "not found by the watchdog")
+                except Exception as e:
+                    print(f"Error checking the call in chat {chat_id}: {str(e)}")
+
+    def hold_idle_call(self, chat_id):
+        """
+        Stay in the call of a chat whose queue ran out for IDLE_HOLD_SECONDS
+
+        A /play during the hold changes the stream of the joined call instead
+        of joining again, the call is left when the hold expires.
+
+        Returns:
+            bool: Whether the call is held, False when holding is disabled
+        """
+        if Config.IDLE_HOLD_SECONDS <= 0 or not self.active_calls.get(chat_id):
+            return False
+        # Chats waiting for a call slot get this one instead
+        if self.call_admission.waiting:
+            return False
+
+        self.end_idle_hold(chat_id, 'replaced')
+        self.discard_staged(self.staged_tracks.pop(chat_id, None))
+        self.discard_staged(self.staged_playing.pop(chat_id, None))
+        if chat_id in self.playback_start_times:
+            del self.playback_start_times[chat_id]
+        self.request_snapshot()
+
+        self.idle_holds[chat_id] = {
+            'since': time.monotonic(),
+            'task': asyncio.create_task(self._idle_hold_timer(chat_id)),
+        }
+        print(f"Holding the call in chat {chat_id} for {Config.IDLE_HOLD_SECONDS}s")
+        return True
+
+    def end_idle_hold(self, chat_id, outcome):
+        """
+        End the idle hold of a chat if it has one
+
+        Args:
+            outcome: 'reused' when something is played, 'expired' or 'stopped' otherwise
+        """
+        hold = self.idle_holds.pop(chat_id, None)
+        if not hold:
+            return
+        if not hold['task'].done() and hold['task'] is not asyncio.current_task():
+            hold['task'].cancel()
+
+        held = time.monotonic() - hold['since']
+        stats = self.idle_hold_stats.setdefault(outcome, {'count': 0, 'total': 0.0})
+        stats['count'] += 1
+        stats['total'] += held
+        print(f"Idle hold in chat {chat_id} ended after {held:.1f}s ({outcome})")
+
+    async def _idle_hold_timer(self, chat_id):
+        await asyncio.sleep(Config.IDLE_HOLD_SECONDS)
+        self.end_idle_hold(chat_id, 'expired')
+        await self.stop_streaming(chat_id)
+
+    async def admit_call(self, chat_id, message=None):
+        """
+        Get a call slot for a chat, waiting in line while all MAX_ACTIVE_CALLS are taken
+
+        The chat is told its place in line and the message is edited as the
+        line moves. Returns whether the chat got a slot.
+        """
+        admission = self.call_admission
+        if admission.available(chat_id):
+            return await admission.acquire(chat_id)
+
+        status_msg = None
+        if message:
+            status_msg = await message.reply("⏳ All voice chat slots are busy, finding a free one...")
+
+        def notify(position):
+            if status_msg:
+                text = (f"⏳ All {admission.max_calls} voice chat slots are busy, this chat is "
+                        f"#{position} in line. Playback starts as soon as a slot frees up.")
+                asyncio.create_task(self.edit_status(status_msg, text))
+
+        try:
+            admitted = await admission.acquire(chat_id, notify=notify, reclaim=self.reclaim_call)
+        finally:
+            if status_msg:
+                try:
+                    await status_msg.delete()
+                except Exception as e:
+                    print(f"Error deleting status message: {str(e)}")
+        if not admitted and message and chat_id in self.current_track and self.current_track[chat_id]:
+            await message.reply("Couldn't get a voice chat slot in time, please try again later.")
+        return admitted
+
+    def wait_for_call(self, chat_id, message, then):
+        """
+        Wait for a call slot in a task owned by the chat, then run then()
+
+        The caller returns right away. A chat that is already waiting keeps its
+        place in line, only what runs once it's admitted is replaced.
+        stop_streaming cancels the wait.
+        """
+        pending = self.admission_waits.get(chat_id)
+        if pending and not pending['task'].done():
+            pending['then'] = then
+            return
+        pending = self.admission_waits[chat_id] = {'then': then, 'task': None}
+        pending['task'] = asyncio.create_task(self._wait_for_call(chat_id, message, pending))
+
+    async def _wait_for_call(self, chat_id, message, pending):
+        try:
+            if await self.admit_call(chat_id, message):
+                await pending['then']()
+        except Exception as e:
+            print(f"Error starting the call in chat {chat_id} after waiting: {str(e)}")
+            self.call_admission.release(chat_id)
+        finally:
+            if self.admission_waits.get(chat_id) is pending:
+                del self.admission_waits[chat_id]
+
+    def cancel_call_wait(self, chat_id):
+        """Stop a chat's wait for a call slot, its place in line is given up"""
+        pending = self.admission_waits.pop(chat_id, None)
+        if pending and not pending['task'].done() and pending['task'] is not asyncio.current_task():
+            pending['task'].cancel()
+        self.call_admission.cancel(chat_id)
+
+    async def edit_status(self, status_msg, text):
+        try:
+            await status_msg.edit_text(text)
+        except Exception as e:
+            print(f"Error updating status message: {str(e)}")
+
+    async def reclaim_call(self):
+        """
+        Leave a call that isn't playing anything to free its slot
+
+        Idle held calls go first, oldest hold first, then calls paused for
+        longer than ADMISSION_PAUSED_GRACE, longest paused first.
+
+        Returns:
+            bool: Whether a call was left
+        """
+        if self.idle_holds:
+            chat_id = min(self.idle_holds, key=lambda held: self.idle_holds[held]['since'])
+            print(f"Reclaiming the idle call in chat {chat_id}")
+            self.end_idle_hold(chat_id, 'reclaimed')
+            await self.stop_streaming(chat_id)
+            return True
+
+        now = time.monotonic()
+        paused = [
+            chat_id for chat_id, since in self.paused_since.items()
+            if now - since >= Config.ADMISSION_PAUSED_GRACE and chat_id in self.call_admission.admitted
+        ]
+        if not paused:
+            return False
+
+        chat_id = min(paused, key=lambda paused_chat: self.paused_since[paused_chat])
+        print(f"Reclaiming the paused call in chat {chat_id}")
+        await self.stop_streaming(chat_id)
+        if chat_id in self.control_messages:
+            try:
+                await self.control_messages.pop(chat_id).delete()
+            except Exception as e:
+                print(f"Error deleting control message: {str(e)}")
+        try:
+            await self.app.send_message(chat_id, "⏹️ Left the voice chat after a long pause to make room for another chat. Use /play to start again.")
+        except Exception as e:
+            print(f"Error notifying chat {chat_id}: {str(e)}")
+        return True
 
     async def start(self):
         print("Bot is starting...")
-        # Clean up any files with double extensions
-        self.cleanup_double_extensions()
-        await self.app.start()
-        await self.user.start()
-        await self.call_manager.start()
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        self.lag_monitor.start()
+
+        self.stop_event = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(signum, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                # No loop signal handlers on this platform, Ctrl+C raises KeyboardInterrupt in run()
+                pass
+
+        # Warm the lazily imported libraries and do filesystem housekeeping off the critical path
+        loop.run_in_executor(None, warm_imports)
+        asyncio.create_task(self.housekeeping())
+
+        # The bot client doesn't depend on the assistant, bring them up concurrently
+        await asyncio.gather(self.app.start(), self.start_assistant())
+        clients_ready = time.perf_counter()
+
+        # The assistant was removed from a call, or the voice chat ended under it
+        @self.call_manager.on_kicked()
+        async def kicked_handler(_, chat_id: int):
+            await self.handle_call_drop(chat_id, "kicked")
+
+        @self.call_manager.on_left()
+        async def left_handler(_, chat_id: int):
+            await self.handle_call_drop(chat_id, "left")
+
+        @self.call_manager.on_closed_voice_chat()
+        async def closed_voice_chat_handler(_, chat_id: int):
+            await self.handle_call_drop(chat_id, "voice chat closed")
 
         # Set up stream end handler
         @self.call_manager.on_stream_end()
         async def stream_end_handler(_, update):
             chat_id = update.chat_id
+            ended_at = time.perf_counter()
             print(f"Stream ended in chat {chat_id}")
 
+            # Listening chats follow their broadcast, not a queue of their own
+            if chat_id in self.broadcast_subscriptions:
+                return
+
+            # The raw file of a finished staged track isn't needed anymore
+            self.discard_staged(self.staged_playing.pop(chat_id, None))
+
             # Check repeat mode first
             if self.repeat_mode.get(chat_id, False) and not self.repeat_used.get(chat_id, True):
                 print(f"Repeat mode active for chat {chat_id}, repeating track")
                 if chat_id in self.current_track and self.current_track[chat_id]:
-                    current_track = self.current_track[chat_id].copy()
+                    current_track = self.current_track[chat_id]
 
                     # Mark repeat as used
                     self.repeat_used[chat_id] = True
@@ -774,12 +2044,7 @@ class MusicBot:
                         print(f"Downloaded audio file for repeat: {audio_file}")
 
                         # Create audio stream
-                        audio_stream = AudioPiped(
-                            audio_file,
-                            AudioParameters(
-                                bitrate=48000,
-                            ),
-                        )
+                        audio_stream = self.build_audio_stream(audio_file, current_track)
 
                         # Change the stream to repeat
                         await self.call_manager.change_stream(
@@ -792,7 +2057,8 @@ class MusicBot:
                         self.is_playing[chat_id] = True
                         if not hasattr(self, 'playback_start_times'):
                             self.playback_start_times = {}
-                        self.playback_start_times[chat_id] = time.time()
+                        self.playback_start_times[chat_id] = time.time() - self.intro_skip(current_track)
+                        self.request_snapshot()
 
                         # Create a new control message
                         if chat_id in self.control_messages:
@@ -809,15 +2075,8 @@ class MusicBot:
                         print(f"Error repeating track: {str(e)}")
                         # If repeat fails, continue with normal end handling
 
-            # Get the current audio file path before moving to next track
-            current_audio = None
-            if chat_id in self.current_track and self.current_track[chat_id]:
-                try:
-                    url = self.current_track[chat_id]['url']
-                    filename = f"audio_{hashlib.md5(url.encode()).hexdigest()}.mp3"
-                    current_audio = os.path.join(self.download_dir, filename)
-                except Exception as e:
-                    print(f"Error getting current audio file path: {str(e)}")
+            # Get the finished track before moving to next track
+            finished_track = self.current_track.get(chat_id)
 
             # Reset repeat states since we're moving to next track
             self.repeat_mode[chat_id] = False
@@ -827,26 +2086,25 @@ class MusicBot:
             if chat_id in self.queue and self.queue[chat_id]:
                 print(f"Playing next track from queue in chat {chat_id}")
 
-                # Delete the current audio file before playing next track
-                if current_audio:
-                    await self.cleanup_audio_file(current_audio)
+                # Release the finished track, other chats may still be using its file
+                await self.release_track(finished_track)
 
                 # Get the next track from the queue
                 next_track = self.queue[chat_id].pop(0)
                 self.current_track[chat_id] = next_track
 
                 try:
-                    # Download the audio file
-                    audio_file = await self.download_audio(next_track['url'])
-                    print(f"Downloaded audio file: {audio_file}")
-
-                    # Create audio stream
-                    audio_stream = AudioPiped(
-                        audio_file,
-                        AudioParameters(
-                            bitrate=48000,
-                        ),
-                    )
+                    # Start from the pre-decoded head if the next track was staged
+                    audio_stream = self.take_staged_stream(chat_id, next_track)
+                    staged = audio_stream is not None
+
+                    if not staged:
+                        # Download the audio file
+                        audio_file = await self.download_audio(next_track['url'])
+                        print(f"Downloaded audio file: {audio_file}")
+
+                        # Create audio stream
+                        audio_stream = self.build_audio_stream(audio_file, next_track)
 
                     # Try to change the stream
                     await self.call_manager.change_stream(
@@ -854,12 +2112,14 @@ class MusicBot:
                         audio_stream
                     )
                     print(f"Successfully changed stream to next track in chat {chat_id}")
+                    self.record_transition(chat_id, ended_at, staged)
 
                     # Update playback status
                     self.is_playing[chat_id] = True
                     if not hasattr(self, 'playback_start_times'):
                         self.playback_start_times = {}
-                    self.playback_start_times[chat_id] = time.time()
+                    self.playback_start_times[chat_id] = time.time() - self.intro_skip(next_track)
+                    self.request_snapshot()
 
                     # Create a new control message
                     if chat_id in self.control_messages:
@@ -879,22 +2139,25 @@ class MusicBot:
 
                 except Exception as e:
                     print(f"Error playing next track: {str(e)}")
+                    self.discard_staged(self.staged_playing.pop(chat_id, None))
                     await self.app.send_message(
                         chat_id,
                         f"Error playing next track: {str(e)}"
                     )
             else:
                 print(f"No more tracks in queue for chat {chat_id}")
-                # Delete the current audio file since playback is finished
-                if current_audio:
-                    await self.cleanup_audio_file(current_audio)
+                # Release the finished track since playback is finished
+                await self.release_track(finished_track)
 
                 # Clean up resources
                 self.current_track[chat_id] = None
                 self.is_playing[chat_id] = False
-                await self.stop_streaming(chat_id, None)
+                held = self.hold_idle_call(chat_id)
+                if not held:
+                    await self.stop_streaming(chat_id, None)
 
                 # Delete the control message if it exists
+                self.card_refresh_times.pop(chat_id, None)
                 if chat_id in self.control_messages:
                     try:
                         await self.control_messages[chat_id].delete()
@@ -903,10 +2166,261 @@ class MusicBot:
                         print(f"Error deleting control message: {str(e)}")
 
                 # Send message about queue completion
-                await self.app.send_message(chat_id, "Queue finished. Left the voice chat.")
+                if held:
+                    await self.app.send_message(
+                        chat_id,
+                        f"Queue finished. Staying in the voice chat for {Config.IDLE_HOLD_SECONDS}s in case you play something else."
+                    )
+                else:
+                    await self.app.send_message(chat_id, "Queue finished. Left the voice chat.")
+
+        ready = time.perf_counter()
+        self.startup_timings = {
+            'imports': IMPORT_SECONDS,
+            'clients': clients_ready - started,
+            'ready': ready - started,
+        }
+        print(
+            f"Startup timings: imports {IMPORT_SECONDS * 1000:.0f} ms, "
+            f"clients {(clients_ready - started) * 1000:.0f} ms, "
+            f"time to ready {(ready - started) * 1000:.0f} ms"
+        )
+
+        # Measure the load that picks the audio quality of new streams
+        asyncio.create_task(self._quality_loop())
+
+        # Bring back the chats that were playing before the restart
+        asyncio.create_task(self.restore_sessions())
+        # Catch dropped calls no update was received for
+        asyncio.create_task(self._call_watchdog())
+
+        if Config.DEBUG_PORT:
+            await self.start_debug_server()
 
         print("Bot is running...")
-        await asyncio.sleep(999999)  # Keep the bot running
+        await self.stop_event.wait()
+        await self.shutdown()
+
+    def request_stop(self):
+        """Begin a graceful shutdown, called from the signal handlers"""
+        if self.stop_event and not self.stop_event.is_set():
+            print("Stop requested")
+            self.stop_event.set()
+
+    async def shutdown(self):
+        """
+        Stop the bot gracefully
+
+        Commands are turned away first. In-flight downloads and analyses get
+        SHUTDOWN_TIMEOUT seconds to finish, the rest are cancelled: segmented
+        downloads keep their parts on disk and resume on the next start. The
+        playback state is snapshotted before leaving the calls so the chats
+        resume after a restart, then the clients are stopped.
+        """
+        if self.shutting_down:
+            return
+        self.shutting_down = True
+        started = time.perf_counter()
+        print("Shutting down...")
+
+        for chat_id in list(self.skip_tasks):
+            self.cancel_pending_skip(chat_id)
+        for chat_id in list(self.idle_holds):
+            self.end_idle_hold(chat_id, 'stopped')
+
+        pending = [task for task in list(self.active_downloads.values()) + list(self.analysis_tasks.values()) if not task.done()]
+        if pending:
+            print(f"Waiting up to {Config.SHUTDOWN_TIMEOUT}s for {len(pending)} media job(s)")
+            _, unfinished = await asyncio.wait(pending, timeout=Config.SHUTDOWN_TIMEOUT)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            if unfinished:
+                print(f"Cancelled {len(unfinished)} unfinished media job(s)")
+
+        # Don't overwrite the stored sessions before they were restored
+        if self.session_restored:
+            await self.save_session()
+
+        for source in list(self.broadcasts):
+            await self.stop_broadcast(source)
+        for chat_id in list(self.staged_tracks):
+            self.discard_staged(self.staged_tracks.pop(chat_id))
+        for chat_id in list(self.staged_playing):
+            self.discard_staged(self.staged_playing.pop(chat_id))
+
+        for chat_id in list(self.group_calls):
+            if self.group_calls[chat_id] or self.active_calls.get(chat_id):
+                try:
+                    await self.call_manager.leave_group_call(chat_id)
+                except Exception as e:
+                    print(f"Error leaving group call in chat {chat_id}: {str(e)}")
+                self.group_calls[chat_id] = None
+                self.active_calls[chat_id] = False
+
+        if self.debug_runner:
+            await self.debug_runner.cleanup()
+        self.lag_monitor.stop()
+
+        for client in (self.user, self.app):
+            try:
+                await client.stop()
+            except Exception as e:
+                print(f"Error stopping client: {str(e)}")
+
+        print(f"Shut down in {time.perf_counter() - started:.1f}s")
+
+    async def start_assistant(self):
+        """Start the assistant user client and the call manager that runs on it"""
+        await self.user.start()
+        await self.call_manager.start()
+
+    async def housekeeping(self):
+        """Filesystem housekeeping that doesn't need to finish before the bot is ready"""
+        loop = asyncio.get_running_loop()
+        try:
+            # Clean up any files with double extensions
+            await loop.run_in_executor(None, self.cleanup_double_extensions)
+            # Pick up audio left over from a previous run so it can be reused or evicted
+            await loop.run_in_executor(None, self.cleanup_staged_files)
+            found = await loop.run_in_executor(None, self.audio_cache.find_files)
+            self.audio_cache.add_idle(found)
+            print(f"Found {len(found)} cached tracks from a previous run")
+        except Exception as e:
+            print(f"Error during housekeeping: {str(e)}")
+
+    def get_position(self, chat_id):
+        """Current playback position of a chat in seconds"""
+        if not self.is_playing.get(chat_id, False) and chat_id in self.paused_positions:
+            return self.paused_positions[chat_id]
+        if chat_id in self.playback_start_times:
+            return int(time.time() - self.playback_start_times[chat_id])
+        return 0
+
+    def snapshot_state(self):
+        """Collect the playback state of every chat that has a current track"""
+        chats = {}
+        for chat_id, track in self.current_track.items():
+            if not track:
+                continue
+            chats[chat_id] = {
+                # Copies, the snapshot is written from a worker thread
+                'current_track': track.to_dict(),
+                'queue': [queued.to_dict() for queued in self.queue.get(chat_id, [])],
+                'position': self.get_position(chat_id),
+                'paused': not self.is_playing.get(chat_id, False),
+                'repeat_mode': self.repeat_mode.get(chat_id, False),
+            }
+        return chats
+
+    async def save_session(self):
+        """Write a snapshot of the playback state to the session store"""
+        try:
+            chats = self.snapshot_state()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.session_store.save, chats)
+        except Exception as e:
+            print(f"Error saving session snapshot: {str(e)}")
+
+    def request_snapshot(self):
+        """Schedule a snapshot after a playback change, bursts of changes are written once"""
+        if not self.session_restored or self.snapshot_pending:
+            return
+        self.snapshot_pending = True
+        asyncio.create_task(self._delayed_snapshot())
+
+    async def _delayed_snapshot(self):
+        await asyncio.sleep(1)
+        self.snapshot_pending = False
+        await self.save_session()
+
+    async def _snapshot_loop(self):
+        """Save a snapshot periodically so positions stay fresh"""
+        while True:
+            await asyncio.sleep(Config.SNAPSHOT_INTERVAL)
+            await self.save_session()
+
+    async def restore_sessions(self):
+        """Restore the chats that were playing when the bot stopped"""
+        try:
+            loop = asyncio.get_running_loop()
+            sessions = await loop.run_in_executor(None, self.session_store.load)
+
+            # Set up every chat and take its cache references first, so nothing
+            # the restored chats need is evicted while they are rejoining
+            restored = []
+            for chat_id, state in sessions.items():
+                track = state.get('current_track')
+                if not track:
+                    continue
+                track = Track.from_dict(track)
+                self.current_track[chat_id] = track
+                self.queue[chat_id] = [Track.from_dict(queued) for queued in state.get('queue', [])]
+                self.is_playing[chat_id] = False
+                self.repeat_mode[chat_id] = state.get('repeat_mode', False)
+                self.repeat_used[chat_id] = False
+                self.audio_cache.acquire(track['url'])
+                for queued in self.queue[chat_id]:
+                    self.audio_cache.acquire(queued['url'])
+                restored.append((chat_id, state))
+
+            if restored:
+                print(f"Restoring playback in {len(restored)} chats")
+
+            # Stagger the rejoins so a restart doesn't hit the API all at once
+            for index, (chat_id, state) in enumerate(restored):
+                if index:
+                    await asyncio.sleep(Config.RESTORE_STAGGER)
+                await self.restore_chat(chat_id, int(state.get('position', 0)), state.get('paused', False))
+        except Exception as e:
+            print(f"Error restoring sessions: {str(e)}")
+        finally:
+            self.session_restored = True
+            await self.save_session()
+            asyncio.create_task(self._snapshot_loop())
+
+    async def restore_chat(self, chat_id, position, paused=False):
+        """Rejoin the voice chat of a restored chat and resume at the saved position"""
+        track = self.current_track[chat_id]
+        try:
+            # Reuses the cached file when it is still on disk
+            audio_file = await self.download_audio(track['url'])
+
+            if position > 0:
+                seeked_audio_file = await self.create_seeked_file(track['url'], position, priority=NOW_PLAYING)
+                if seeked_audio_file:
+                    audio_file = seeked_audio_file
+                    track.set_cached_audio(seeked_audio_file)
+                else:
+                    position = 0
+
+            notice = await self.app.send_message(
+                chat_id,
+                f"♻️ Restoring playback of {track['title']} after a restart..."
+            )
+
+            if not await self.start_streaming(chat_id, audio_file, offset=position, wait_in_background=False):
+                raise Exception("could not join the voice chat")
+
+            await self.create_control_message(chat_id, notice)
+            await self.start_periodic_updates(chat_id)
+            self.playback_start_times[chat_id] = time.time() - position
+
+            if paused:
+                await self.pause_stream(chat_id)
+
+            print(f"Restored playback in chat {chat_id} at {position}s")
+        except Exception as e:
+            print(f"Error restoring chat {chat_id}: {str(e)}")
+            await self.stop_streaming(chat_id)
+
+    def cleanup_staged_files(self):
+        """Delete raw PCM left over from staging in a previous run"""
+        if not os.path.exists(self.download_dir):
+            return
+        for file in os.listdir(self.download_dir):
+            if file.startswith(('staged_', 'broadcast_')):
+                remove_raw_file(os.path.join(self.download_dir, file))
 
     def cleanup_double_extensions(self):
         """Clean up any files with double extensions in the downloads directory"""
@@ -934,7 +2448,12 @@ class MusicBot:
             print(f"Error during cleanup: {str(e)}")
 
     def run(self):
-        asyncio.get_event_loop().run_until_complete(self.start())
+        """Run the bot until it's stopped by SIGTERM or SIGINT"""
+        loop = asyncio.get_event_loop()
+        try:
+            loop.run_until_complete(self.start())
+        except KeyboardInterrupt:
+            loop.run_until_complete(self.shutdown())
 
     async def is_group_call_active(self, chat_id):
         """Check if a group call is active for the given chat_id"""
@@ -1008,6 +2527,7 @@ class MusicBot:
 
             # Update status
             self.is_playing[chat_id] = False
+            self.paused_since.setdefault(chat_id, time.monotonic())
 
             # Store the elapsed time when paused
             if hasattr(self, 'playback_start_times') and chat_id in self.playback_start_times:
@@ -1016,6 +2536,7 @@ class MusicBot:
                 self.paused_positions[chat_id] = int(time.time() - self.playback_start_times[chat_id])
                 print(f"Stored paused position for chat {chat_id}: {self.paused_positions[chat_id]} seconds")
 
+            self.request_snapshot()
             print(f"Successfully paused stream in chat {chat_id}")
             return True
         except Exception as e:
@@ -1061,6 +2582,7 @@ class MusicBot:
 
             # Update status
             self.is_playing[chat_id] = True
+            self.paused_since.pop(chat_id, None)
 
             # Adjust the start time to account for the paused duration
             if hasattr(self, 'paused_positions') and chat_id in self.paused_positions:
@@ -1072,6 +2594,7 @@ class MusicBot:
                 # Start periodic updates again
                 await self.start_periodic_updates(chat_id)
 
+            self.request_snapshot()
             print(f"Successfully resumed stream in chat {chat_id}")
             return True
         except Exception as e:
@@ -1087,20 +2610,8 @@ class MusicBot:
         await self.skip_track(message)
 
     def register_callbacks(self):
-        """Register callback handlers for inline buttons"""
-        try:
-            # Try to use the already imported register_callbacks function
-            from spotify_bot.callbacks import register_callbacks
-            register_callbacks(self)
-        except Exception as e:
-            print(f"Error registering callbacks: {str(e)}")
-            # If that fails, try to import it again
-            try:
-                from spotify_bot.callbacks import register_callbacks as reg_cb
-                reg_cb(self)
-            except ImportError:
-                from .callbacks import register_callbacks as reg_cb
-                reg_cb(self)
+        """Register the callback router for inline buttons, only ever registered once"""
+        register_callbacks(self)
 
     async def update_control_message(self, chat_id, force_update=False):
         """Update the control message with current track info and controls"""
@@ -1148,14 +2659,56 @@ class MusicBot:
 
         try:
             # Update existing message if it exists
-            if chat_id in self.control_messages:
-                await self.control_messages[chat_id].edit_text(
-                    caption,
+            control_message = self.control_messages.get(chat_id)
+            if not control_message:
+                return
+            if not control_message.photo:
+                await control_message.edit_text(caption, reply_markup=keyboard)
+                return
+
+            # The card is swapped in place at most every CARD_REFRESH_SECONDS, the caption in between
+            card = None
+            if current_time - self.card_refresh_times.get(chat_id, 0) >= Config.CARD_REFRESH_SECONDS:
+                card = await self.render_card(chat_id, current_seconds)
+            if card:
+                await control_message.edit_media(
+                    InputMediaPhoto(card, caption=caption),
                     reply_markup=keyboard
                 )
+            else:
+                await control_message.edit_caption(caption, reply_markup=keyboard)
         except Exception as e:
             print(f"Error updating control message: {str(e)}")
 
+    async def render_card(self, chat_id, position=None):
+        """
+        Render the now-playing card of a chat off the event loop
+
+        Returns:
+            str: Path of the card, None when cards are off or rendering failed
+        """
+        track = self.current_track.get(chat_id)
+        if not self.card_renderer or not track:
+            return None
+
+        thumbnail_path = await download_thumbnail(track['video_id'])
+        if not thumbnail_path:
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            card = await loop.run_in_executor(
+                None, self.card_renderer.render,
+                f"card_{chat_id}", track['video_id'], thumbnail_path,
+                track.get('title', "Unknown"), track.get('channel'),
+                position or 0, track.duration
+            )
+        except Exception as e:
+            print(f"Error rendering now-playing card: {str(e)}")
+            return None
+        self.card_refresh_times[chat_id] = time.time()
+        return card
+
     async def create_control_message(self, chat_id, message):
 
         try:
@@ -1193,6 +2746,11 @@ class MusicBot:
                 has_queue=has_queue
             )
 
+            # The now-playing card replaces the thumbnail where cards are on
+            card = await self.render_card(chat_id, current_seconds) if thumbnail_path else None
+            if card:
+                thumbnail_path = card
+
             # Send message with thumbnail and controls
             if thumbnail_path:
                 control_message = await message.reply_photo(
@@ -1225,7 +2783,7 @@ class MusicBot:
         # Store the start time
         if not hasattr(self, 'playback_start_times'):
             self.playback_start_times = {}
-        self.playback_start_times[chat_id] = time.time()
+        self.playback_start_times[chat_id] = time.time() - self.intro_skip(self.current_track.get(chat_id))
 
         # Initialize last update time
         if not hasattr(self, 'last_update_times'):
@@ -1262,6 +2820,9 @@ class MusicBot:
                         # Update the last update time
                         self.last_update_times[chat_id] = current_time
 
+                # Decode the head of the next track ahead of the transition
+                await self.maybe_stage_next(chat_id)
+
                 # Wait for a shorter interval to check conditions more frequently
                 await asyncio.sleep(5)
 
@@ -1279,11 +2840,26 @@ class MusicBot:
         # Get the query from the message
         query = " ".join(message.command[1:])
 
+        # Several queries separated by newlines or semicolons are queued together
+        queries = [part.strip() for part in re.split(r"[\n;]", message.text.split(None, 1)[1]) if part.strip()]
+
+        if message.chat.id in self.broadcast_subscriptions:
+            await message.reply("This chat is tuned in to a broadcast, use /unsubscribe first.")
+            return
+
         # Send a wait message
         wait_message = await message.reply("🔍 Searching and processing your request... Please wait.")
 
+        spotify_link = parse_spotify_url(query)
+        if spotify_link and len(queries) == 1:
+            await self.process_spotify_play(message, *spotify_link, wait_message)
+            return
+
         # Process the play request
-        await self.process_play_request(message, query, wait_message)
+        if len(queries) > 1:
+            await self.process_bulk_play(message, queries, wait_message)
+        else:
+            await self.process_play_request(message, query, wait_message)
 
     async def pause_command(self, client: Client, message: Message):
         """Pause the currently playing music"""
@@ -1355,8 +2931,8 @@ class MusicBot:
             await message.reply("No songs in the queue to skip to.")
             return
 
-        # Call the skip_track method
-        await self.skip_track(message)
+        # Rapid skips are collected into one
+        self.request_skip(message)
 
     async def stop_command(self, client: Client, message: Message):
         """Stop the music and leave the voice chat"""
@@ -1403,13 +2979,358 @@ class MusicBot:
         if chat_id in self.queue and self.queue[chat_id]:
             queue_text += "**Up Next:**\n"
             for i, track in enumerate(self.queue[chat_id], 1):
-                queue_text += f"{i}. {track['title']} ({track['duration']})\n"
+                queue_text += f"{i}. {track.title} ({track.duration_text})\n"
         else:
             queue_text += "**No tracks in queue.**"
 
         # Send the queue message
         await message.reply(queue_text)
 
+    async def broadcast_command(self, client: Client, message: Message):
+        """Let other chats tune in to this chat's playback, or stop doing so"""
+        chat_id = message.chat.id
+
+        if chat_id in self.broadcasts:
+            await self.stop_broadcast(chat_id)
+            await message.reply("📻 Broadcast stopped, listening chats were disconnected.")
+            return
+
+        if chat_id in self.broadcast_subscriptions:
+            await message.reply("This chat is tuned in to a broadcast, use /unsubscribe first.")
+            return
+
+        self.broadcasts[chat_id] = {
+            'fanout': None,
+            'subscribers': set(),
+            'joined': set(),
+            'generation': 0,
+            'task': asyncio.create_task(self._broadcast_loop(chat_id)),
+        }
+        await message.reply(f"📻 Broadcasting this chat's playback. Other chats can tune in with /subscribe {chat_id}")
+
+    async def subscribe_command(self, client: Client, message: Message):
+        """Tune this chat's voice chat in to a broadcast"""
+        chat_id = message.chat.id
+
+        if len(message.command) < 2:
+            await message.reply("Please provide the chat ID of the broadcast, e.g. /subscribe -1001234567890")
+            return
+        try:
+            source = int(message.command[1])
+        except ValueError:
+            await message.reply("Please provide a valid chat ID.")
+            return
+
+        state = self.broadcasts.get(source)
+        if source == chat_id or state is None:
+            await message.reply("There is no broadcast in that chat.")
+            return
+        if chat_id in self.broadcasts or self.current_track.get(chat_id):
+            await message.reply("Stop the music playing in this chat before tuning in to a broadcast.")
+            return
+
+        previous = self.broadcast_subscriptions.get(chat_id)
+        if previous is not None and previous != source:
+            self.detach_listener(chat_id)
+
+        async def tune_in():
+            current = self.broadcasts.get(source)
+            if current is None:
+                self.call_admission.release(chat_id)
+                await message.reply("The broadcast ended while this chat was waiting.")
+                return
+
+            self.broadcast_subscriptions[chat_id] = source
+            current['subscribers'].add(chat_id)
+            if current['fanout'] and not current['fanout'].finished:
+                await self.attach_listener(source, chat_id)
+            await message.reply("📻 Tuned in to the broadcast.")
+
+        # Listening takes a call slot like playing does, waiting for one happens outside the handler
+        if chat_id not in state['joined'] and not self.call_admission.available(chat_id):
+            self.wait_for_call(chat_id, message, tune_in)
+            return
+        if chat_id not in state['joined'] and not await self.admit_call(chat_id, message):
+            return
+        await tune_in()
+
+    async def unsubscribe_command(self, client: Client, message: Message):
+        """Stop listening to a broadcast and leave the voice chat"""
+        chat_id = message.chat.id
+
+        if chat_id not in self.broadcast_subscriptions:
+            await message.reply("This chat isn't tuned in to a broadcast.")
+            return
+
+        self.detach_listener(chat_id)
+        await self.leave_listener_call(chat_id)
+        await message.reply("📻 Stopped listening to the broadcast.")
+
+    async def attach_listener(self, source, chat_id):
+        """Point a listening chat's call at the current output of a broadcast"""
+        state = self.broadcasts[source]
+        fanout = state['fanout']
+        raw_file = fanout.add_subscriber(chat_id)
+        stream = InputStream(
+            InputAudioStream(
+                raw_file,
+                fanout.parameters,
+            ),
+        )
+
+        try:
+            if chat_id in state['joined']:
+                await self.call_manager.change_stream(chat_id, stream)
+            else:
+                self.group_calls[chat_id] = await self.call_manager.join_group_call(chat_id, stream)
+                state['joined'].add(chat_id)
+                self.call_admission.occupy(chat_id)
+            self.active_calls[chat_id] = True
+        except Exception as e:
+            print(f"Error feeding broadcast to chat {chat_id}: {str(e)}")
+            fanout.remove_subscriber(chat_id)
+
+    def detach_listener(self, chat_id):
+        """Stop feeding a listening chat, its call is left by the caller"""
+        source = self.broadcast_subscriptions.pop(chat_id, None)
+        state = self.broadcasts.get(source)
+        if not state:
+            return
+        state['subscribers'].discard(chat_id)
+        state['joined'].discard(chat_id)
+        if state['fanout']:
+            state['fanout'].remove_subscriber(chat_id)
+
+    async def leave_listener_call(self, chat_id):
+        try:
+            await self.call_manager.leave_group_call(chat_id)
+        except Exception as e:
+            print(f"Error leaving group call: {str(e)}")
+        self.group_calls[chat_id] = None
+        self.active_calls[chat_id] = False
+        self.call_admission.release(chat_id)
+
+    async def stop_broadcast(self, source):
+        """Stop a broadcast and disconnect its listening chats"""
+        state = self.broadcasts.pop(source, None)
+        if not state:
+            return
+        state['task'].cancel()
+        if state['fanout']:
+            state['fanout'].stop()
+        for chat_id in list(state['subscribers']):
+            self.broadcast_subscriptions.pop(chat_id, None)
+            await self.leave_listener_call(chat_id)
+
+    async def _broadcast_loop(self, source):
+        """Keep the shared decode of a broadcast in step with the source chat's playback"""
+        while source in self.broadcasts:
+            try:
+                await self.sync_broadcast(source)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error syncing broadcast of chat {source}: {str(e)}")
+            await asyncio.sleep(Config.BROADCAST_SYNC_INTERVAL)
+
+    async def sync_broadcast(self, source):
+        """
+        Follow track changes, seeks and pauses of the source chat
+
+        The shared decode restarts on a new track or when it drifted more than
+        BROADCAST_DRIFT seconds from the source, pauses are passed on to the
+        listening calls.
+        """
+        state = self.broadcasts[source]
+        fanout = state['fanout']
+        track = self.current_track.get(source)
+
+        if not track or not self.active_calls.get(source):
+            if fanout:
+                fanout.stop()
+                state['fanout'] = None
+            return
+
+        playing = self.is_playing.get(source, False)
+        position = self.get_position(source)
+
+        if fanout and fanout.url == track['url'] and abs(fanout.position - position) <= Config.BROADCAST_DRIFT:
+            if playing == fanout.paused:
+                if playing:
+                    fanout.resume()
+                else:
+                    fanout.pause()
+                for chat_id in list(fanout.subscribers):
+                    try:
+                        if playing:
+                            await self.call_manager.resume_stream(chat_id)
+                        else:
+                            await self.call_manager.pause_stream(chat_id)
+                    except Exception as e:
+                        print(f"Error passing pause state to chat {chat_id}: {str(e)}")
+            return
+
+        if not playing:
+            # Restart when the source resumes
+            return
+
+        audio_file = await self.download_audio(track['url'])
+
+        # Apply the stored analysis while decoding, like build_audio_stream does
+        analysis = self.get_analysis(track['url'])
+        start, end, gain = position, None, 0
+        if analysis:
+            start = max(position, analysis['trim_start'])
+            if analysis['trim_end'] < analysis['duration']:
+                end = analysis['trim_end']
+            gain = analysis['gain']
+
+        state['generation'] += 1
+        new_fanout = PcmFanout(
+            track['url'],
+            audio_file,
+            self.audio_parameters(),
+            os.path.join(self.download_dir, f"broadcast_{abs(source)}_{state['generation']}"),
+            start, end, gain
+        )
+        new_fanout.run()
+        await new_fanout.wait_ready()
+
+        state['fanout'] = new_fanout
+        for chat_id in list(state['subscribers']):
+            await self.attach_listener(source, chat_id)
+        if fanout:
+            fanout.stop()
+
+        print(f"Broadcast of chat {source} at {track['title']} ({start:.0f}s) feeding {len(new_fanout.subscribers)} chat(s)")
+
+    async def collect_debug_report(self, diff=False):
+        """
+        Memory, task and state report for operators
+
+        Args:
+            diff: Include the allocation growth since the previous diff
+        """
+        report = {
+            'rss': introspection.rss_bytes(),
+            'open_fds': introspection.open_fds(),
+            'ffmpeg': introspection.child_processes("ffmpeg"),
+            'tasks': introspection.task_summary(),
+            'state': {
+                'queued tracks': sum(len(queue) for queue in self.queue.values()),
+                'queues': len(self.queue),
+                'current tracks': sum(1 for track in self.current_track.values() if track),
+                'control messages': len(self.control_messages),
+                'group calls': sum(1 for call in self.group_calls.values() if call),
+                'playback times': len(self.playback_start_times),
+                'paused positions': len(self.paused_positions),
+                'cache references': len(self.audio_cache.refs),
+                'analysis entries': len(self.audio_analysis),
+                'analysis tasks': len(self.analysis_tasks),
+                'active downloads': len(self.active_downloads),
+                'resolved media URLs': len(self.media_urls.entries),
+                'staged tracks': len(self.staged_tracks) + len(self.staged_playing),
+                'pending skips': len(self.skip_tasks),
+                'broadcasts': len(self.broadcasts),
+                'broadcast listeners': len(self.broadcast_subscriptions),
+                'idle holds': len(self.idle_holds),
+                'recovering calls': len(self.recovering_calls),
+            },
+            'call_recovery': {
+                'recovered': self.recovery_stats['recovered'],
+                'failed': self.recovery_stats['failed'],
+                'avg_seconds': self.recovery_stats['total'] / self.recovery_stats['recovered'] if self.recovery_stats['recovered'] else 0.0,
+                'max_seconds': self.recovery_stats['max'],
+            },
+            'idle_holds': {
+                outcome: {'count': stats['count'], 'avg_seconds': stats['total'] / stats['count']}
+                for outcome, stats in self.idle_hold_stats.items()
+            },
+            'scheduler': self.media_scheduler.stats(),
+            'lag': self.lag_monitor.stats(),
+            'cards': self.card_renderer.render_stats() if self.card_renderer else None,
+            'rate_limits': self.rate_limiter.stats(),
+            'admission': self.call_admission.report(),
+            'tracing': introspection.is_tracing(),
+        }
+
+        # Snapshots walk every traced block, keep them off the event loop
+        loop = asyncio.get_running_loop()
+        report['allocations'] = await loop.run_in_executor(None, introspection.top_allocations)
+        if diff:
+            report['diff'] = await loop.run_in_executor(None, introspection.snapshot_diff)
+        return report
+
+    async def debug_command(self, client: Client, message: Message):
+        """Runtime introspection for admins: /debug [trace on|off] [diff]"""
+        args = [arg.lower() for arg in message.command[1:]]
+
+        if args[:1] == ["trace"] and len(args) > 1:
+            if args[1] == "on":
+                introspection.start_tracing()
+            elif args[1] == "off":
+                introspection.stop_tracing()
+            await message.reply(f"Tracemalloc is {'on' if introspection.is_tracing() else 'off'}.")
+            return
+
+        report = await self.collect_debug_report(diff="diff" in args)
+        text = introspection.format_report(report)
+        # Telegram messages are limited to 4096 characters
+        await message.reply(f"```\n{text[:4000]}\n```")
+
+    async def ratelimit_command(self, client: Client, message: Message):
+        """Show or change rate limits for admins: /ratelimit [user|chat] [class] [burst] [seconds]"""
+        args = [arg.lower() for arg in message.command[1:]]
+
+        if args:
+            if len(args) != 4 or args[0] not in SCOPES:
+                await message.reply(
+                    "Usage: /ratelimit [user|chat] [class] [burst] [seconds]\n"
+                    "A burst of 0 removes the limit."
+                )
+                return
+            try:
+                self.rate_limiter.set_limit(args[0], args[1], int(args[2]), float(args[3]))
+            except ValueError as e:
+                await message.reply(f"Invalid limit: {str(e)}")
+                return
+
+        stats = self.rate_limiter.stats()
+        lines = []
+        for scope, limits in stats['limits'].items():
+            lines.append(f"Per {scope}:")
+            for command_class, (burst, period) in sorted(limits.items()):
+                lines.append(f"  {command_class}: {burst} per {period:g}s")
+        lines.append("Rejected: " + (", ".join(f"{name} {count}" for name, count in stats['rejected'].items()) or "none"))
+        await message.reply("\n".join(lines))
+
+    async def start_debug_server(self):
+        """
+        Serve the debug report on localhost
+
+        GET /debug returns the report as JSON, ?diff=1 adds the allocation growth,
+        ?trace=on|off switches tracing and ?format=text returns the text report.
+        """
+        async def debug_handler(request):
+            trace = request.query.get('trace')
+            if trace == "on":
+                introspection.start_tracing()
+            elif trace == "off":
+                introspection.stop_tracing()
+
+            report = await self.collect_debug_report(diff=request.query.get('diff') == "1")
+            if request.query.get('format') == "text":
+                return web.Response(text=introspection.format_report(report))
+            return web.json_response(report)
+
+        app = web.Application()
+        app.router.add_get('/debug', debug_handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', Config.DEBUG_PORT).start()
+        self.debug_runner = runner
+        print(f"Debug endpoint listening on http://127.0.0.1:{Config.DEBUG_PORT}/debug")
+
     async def start_command(self, client: Client, message: Message):
         await message.reply(
             Txt.START_TXT,
@@ -1425,14 +3346,66 @@ class MusicBot:
             )
         )
 
-    async def skip_track(self, message: Message):
-        """Skip to the next track in the queue"""
+    def request_skip(self, message: Message):
+        """
+        Ask for a skip to the next track, coalescing rapid requests
+
+        Requests less than SKIP_DEBOUNCE seconds apart are applied as one skip
+        over all of them, so only the final target is downloaded and streamed.
+        A skip still downloading its target when a new request comes in is
+        cancelled, the new skip continues from that target.
+
+        Returns:
+            int: Number of tracks the pending skip moves forward
+        """
+        chat_id = message.chat.id
+        # Pressing Next more often than there are queued tracks lands on the last one
+        count = min(self.pending_skips.get(chat_id, 0) + 1, max(len(self.queue.get(chat_id, [])), 1))
+        self.pending_skips[chat_id] = count
+
+        task = self.skip_tasks.get(chat_id)
+        if task and not task.done():
+            task.cancel()
+        self.skip_tasks[chat_id] = asyncio.create_task(self._debounced_skip(message))
+        return count
+
+    async def _debounced_skip(self, message: Message):
+        chat_id = message.chat.id
+        await asyncio.sleep(Config.SKIP_DEBOUNCE)
+
+        count = self.pending_skips.pop(chat_id, 1)
+        try:
+            await self.skip_track(message, count)
+        except asyncio.CancelledError:
+            print(f"Skip in chat {chat_id} superseded by a newer skip")
+            raise
+        except Exception as e:
+            print(f"Error skipping track: {str(e)}")
+
+    def cancel_pending_skip(self, chat_id):
+        """Drop skips that haven't been applied yet, unless called from the skip itself"""
+        self.pending_skips.pop(chat_id, None)
+        task = self.skip_tasks.pop(chat_id, None)
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    async def skip_track(self, message: Message, count=1):
+        """
+        Skip forward in the queue
+
+        Args:
+            message: Message to reply to
+            count: Number of tracks to skip, the tracks before the target are dropped
+        """
         chat_id = message.chat.id
 
-        print(f"Skipping track in chat {chat_id}")
+        print(f"Skipping {count} track(s) in chat {chat_id}")
 
         # Send a wait message
-        wait_message = await message.reply("➲ Skipping to next track... Please wait.")
+        if count > 1:
+            wait_message = await message.reply(f"➲ Skipping {count} tracks... Please wait.")
+        else:
+            wait_message = await message.reply("➲ Skipping to next track... Please wait.")
 
         # Check if there's an active group call
         is_active = await self.is_group_call_active(chat_id)
@@ -1470,10 +3443,20 @@ class MusicBot:
                 await message.reply("No songs in the queue to skip to.")
                 return
 
+        # Drop the tracks before the target, skipping past the end lands on the last one
+        count = min(count, len(self.queue[chat_id]))
+        skipped = self.queue[chat_id][:count - 1]
+        del self.queue[chat_id][:count - 1]
+
         # Get the next track from the queue
         next_track = self.queue[chat_id].pop(0)
         print(f"Next track: {next_track}")
 
+        # Release the skipped tracks, the queue reference moves to the new current track
+        await self.release_track(self.current_track.get(chat_id))
+        for track in skipped:
+            await self.release_track(track)
+
         # Update the current track
         self.current_track[chat_id] = next_track
 
@@ -1489,12 +3472,7 @@ class MusicBot:
             print(f"Downloaded audio file: {audio_file}")
 
             # Create audio stream
-            audio_stream = AudioPiped(
-                audio_file,
-                AudioParameters(
-                    bitrate=48000,
-                ),
-            )
+            audio_stream = self.build_audio_stream(audio_file, next_track)
 
             # Change the stream
             await self.call_manager.change_stream(
@@ -1507,7 +3485,8 @@ class MusicBot:
             self.is_playing[chat_id] = True
             if not hasattr(self, 'playback_start_times'):
                 self.playback_start_times = {}
-            self.playback_start_times[chat_id] = time.time()
+            self.playback_start_times[chat_id] = time.time() - self.intro_skip(next_track)
+            self.request_snapshot()
 
             # Delete the old control message and create a new one
             if chat_id in self.control_messages:
@@ -1525,7 +3504,17 @@ class MusicBot:
             except Exception as e:
                 print(f"Error deleting wait message: {str(e)}")
 
-            await message.reply(f"Skipped to: {next_track['title']}")
+            if count > 1:
+                await message.reply(f"Skipped {count} tracks to: {next_track['title']}")
+            else:
+                await message.reply(f"Skipped to: {next_track['title']}")
+        except asyncio.CancelledError:
+            # A newer skip takes over from this target
+            try:
+                await wait_message.delete()
+            except Exception as e:
+                print(f"Error deleting wait message: {str(e)}")
+            raise
         except Exception as e:
             print(f"Error changing stream: {str(e)}")
             await wait_message.edit_text(f"Error skipping track: {str(e)}")
@@ -1558,6 +3547,62 @@ class MusicBot:
         else:
             await message.reply("Failed to refresh control message.")
 
+    async def create_seeked_file(self, track_url, seek_seconds, priority=SEEK):
+        """
+        Cut the cached audio of a track at a position with ffmpeg
+
+        Args:
+            track_url: URL of the track, its audio must already be downloaded
+            seek_seconds: Position to start the new file at
+            priority: Scheduler class of the ffmpeg job
+
+        Returns:
+            str: Path of the seeked file, or None if it couldn't be created
+        """
+        # Create a hash for the original file
+        url_hash = hashlib.md5(track_url.encode()).hexdigest()
+        original_audio_file = os.path.join(self.download_dir, f"audio_{url_hash}.mp3")
+
+        # Create seeked filename that includes the original hash
+        seeked_audio_file = os.path.join(self.download_dir, f"seeked_{url_hash}_{seek_seconds}.mp3")
+
+        # Check if the seeked file already exists
+        if os.path.exists(seeked_audio_file):
+            print(f"Seeked audio file already exists: {seeked_audio_file}")
+            return seeked_audio_file
+
+        # Create the ffmpeg command to seek to the desired position
+        ffmpeg_cmd = [
+            'ffmpeg',
+            '-y',  # Overwrite output file if it exists
+            '-ss', str(seek_seconds),  # Seek position
+            '-i', original_audio_file,  # Input file
+            '-acodec', 'copy',  # Copy audio codec without re-encoding
+            seeked_audio_file  # Output file
+        ]
+
+        # Run the ffmpeg command
+        async with self.media_scheduler.job(priority, 'cpu'):
+            process = await asyncio.create_subprocess_exec(
+                *ffmpeg_cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+
+            stdout, stderr = await process.communicate()
+
+        if process.returncode != 0:
+            print(f"Error seeking with ffmpeg: {stderr.decode()}")
+            return None
+
+        # Check if the seeked file exists
+        if not os.path.exists(seeked_audio_file):
+            print(f"Seeked audio file does not exist: {seeked_audio_file}")
+            return None
+
+        print(f"Successfully created seeked audio file: {seeked_audio_file}")
+        return seeked_audio_file
+
     async def seek_command(self, client: Client, message: Message):
         """Seek to a specific position in the current track"""
         chat_id = message.chat.id
@@ -1581,18 +3626,8 @@ class MusicBot:
             # Parse the seek offset (how many seconds to seek forward)
             seek_offset = int(message.command[1])
 
-            # Get the total duration
-            total_seconds = None
-            if 'duration' in self.current_track[chat_id] and self.current_track[chat_id]['duration']:
-                duration_str = self.current_track[chat_id]['duration']
-                if isinstance(duration_str, str) and ":" in duration_str:
-                    parts = duration_str.split(":")
-                    if len(parts) == 2:
-                        total_seconds = int(parts[0]) * 60 + int(parts[1])
-                    elif len(parts) == 3:
-                        total_seconds = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-                elif isinstance(duration_str, (int, float)):
-                    total_seconds = int(duration_str)
+            # Get the total duration, exact when the cached audio has been analyzed
+            total_seconds = self.track_duration(self.current_track[chat_id])
 
             if total_seconds is None:
                 await message.reply("Cannot determine track duration")
@@ -1621,105 +3656,42 @@ class MusicBot:
 
             # Create a hash for the original file
             url_hash = hashlib.md5(track_url.encode()).hexdigest()
-
-            # Download the original audio file
             original_audio_file = os.path.join(self.download_dir, f"audio_{url_hash}.mp3")
 
-            # Create seeked filename that includes the original hash
-            seeked_filename = f"seeked_{url_hash}_{seek_seconds}.mp3"
-            seeked_audio_file = os.path.join(self.download_dir, seeked_filename)
-
-            # Check if the seeked file already exists
-            if os.path.exists(seeked_audio_file):
-                print(f"Seeked audio file already exists: {seeked_audio_file}")
-            else:
-                # Use ffmpeg to seek to the desired position
-                import subprocess
-
-                # Create the ffmpeg command to seek to the desired position
-                ffmpeg_cmd = [
-                    'ffmpeg',
-                    '-y',  # Overwrite output file if it exists
-                    '-ss', str(seek_seconds),  # Seek position
-                    '-i', original_audio_file,  # Input file
-                    '-acodec', 'copy',  # Copy audio codec without re-encoding
-                    seeked_audio_file  # Output file
-                ]
-
-                # Run the ffmpeg command
-                process = await asyncio.create_subprocess_exec(
-                    *ffmpeg_cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-
-                stdout, stderr = await process.communicate()
-
-                if process.returncode != 0:
-                    print(f"Error seeking with ffmpeg: {stderr.decode()}")
-                    await wait_message.edit_text(f"Error seeking: ffmpeg process failed")
-                    return
-
-                print(f"Successfully created seeked audio file: {seeked_audio_file}")
-
-            # Check if the seeked file exists
-            if not os.path.exists(seeked_audio_file):
-                print(f"Seeked audio file does not exist: {seeked_audio_file}")
-                await wait_message.edit_text(f"Error seeking: seeked file not created")
+            # Cut the cached audio at the new position
+            seeked_audio_file = await self.create_seeked_file(track_url, seek_seconds)
+            if not seeked_audio_file:
+                await wait_message.edit_text(f"Error seeking: ffmpeg process failed")
                 return
 
             # Update the current track info with both files and the hash
-            self.current_track[chat_id].update({
-                'audio_file': seeked_audio_file,
-                'original_audio': original_audio_file,
-                'file_hash': url_hash
-            })
+            self.current_track[chat_id].set_cached_audio(seeked_audio_file, original_audio_file, url_hash)
 
-            # Now restart the stream
+            # Now switch the stream of the joined call, leaving and rejoining would look like a dropped call
+            self.leaving_calls.add(chat_id)
             try:
-                # First, make sure we leave any existing group call
-                try:
-                    # Try to leave the group call using the call manager
-                    await self.call_manager.leave_group_call(chat_id)
-                    print(f"Successfully left group call for seeking in chat {chat_id}")
-                except Exception as e:
-                    print(f"Error leaving group call with call_manager: {str(e)}")
-
-                # Wait a moment before rejoining
-                await asyncio.sleep(2)
-
                 # Create an AudioPiped object with AudioParameters
-                audio_stream = AudioPiped(
-                    seeked_audio_file,
-                    AudioParameters(
-                        bitrate=48000,
-                    ),
-                )
+                audio_stream = self.build_audio_stream(seeked_audio_file, self.current_track[chat_id], offset=seek_seconds)
 
-                # Join the group call again
                 try:
-                    self.group_calls[chat_id] = await self.call_manager.join_group_call(
+                    await self.call_manager.change_stream(
                         chat_id,
                         audio_stream
                     )
-                    print(f"Successfully rejoined group call for seeking in chat {chat_id}")
+                    print(f"Successfully changed stream for seeking in chat {chat_id}")
                 except Exception as e:
-                    if "Already joined into group call" in str(e):
-                        print(f"Already in group call, trying to change stream instead")
-                        # If we're already in the group call, try to change the stream
-                        try:
-                            await self.call_manager.change_stream(
-                                chat_id,
-                                audio_stream
-                            )
-                            print(f"Successfully changed stream for seeking in chat {chat_id}")
-                        except Exception as e2:
-                            print(f"Error changing stream: {str(e2)}")
-                            await wait_message.edit_text(f"Error seeking: {str(e2)}")
-                            return
-                    else:
-                        print(f"Error rejoining group call: {str(e)}")
-                        await wait_message.edit_text(f"Error seeking: {str(e)}")
+                    # Not in the call anymore, join it with the seeked stream
+                    print(f"Error changing stream for seeking: {str(e)}, joining the call instead")
+                    try:
+                        self.group_calls[chat_id] = await self.call_manager.join_group_call(
+                            chat_id,
+                            audio_stream
+                        )
+                        self.active_calls[chat_id] = True
+                        print(f"Successfully rejoined group call for seeking in chat {chat_id}")
+                    except Exception as e2:
+                        print(f"Error rejoining group call: {str(e2)}")
+                        await wait_message.edit_text(f"Error seeking: {str(e2)}")
                         return
 
                 # Update the playback start time to account for the seek position
@@ -1727,6 +3699,7 @@ class MusicBot:
                     self.playback_start_times = {}
                 # Set the start time to now minus the seek position
                 self.playback_start_times[chat_id] = time.time() - seek_seconds
+                self.request_snapshot()
 
                 # Force an update of the control message
                 if hasattr(self, 'last_update_times'):
@@ -1746,16 +3719,14 @@ class MusicBot:
                 print(f"Error changing stream for seeking: {str(e)}")
                 await wait_message.edit_text(f"Error seeking: {str(e)}")
                 return
+            finally:
+                self.leaving_calls.discard(chat_id)
         except Exception as e:
             print(f"Error in seek command: {str(e)}")
             await message.reply(f"Error seeking: {str(e)}")
 
-            # After successful seeking, clean up the original audio file
-            original_audio_file = await self.download_audio(track_url)
-            await self.cleanup_audio_file(original_audio_file)
-
             # Update the current track's audio file to the seeked one
-            self.current_track[chat_id]['audio_file'] = seeked_audio_file
+            self.current_track[chat_id].set_cached_audio(seeked_audio_file)
 
             # Update wait message
             await wait_message.edit_text(f"☍ Seeked to position {seek_seconds}s")
@@ -0,0 +1,158 @@
+import time
+import asyncio
+
+from spotify_bot.config import Config
+from spotify_bot.staging import decode_parameters, pcm_parameters, remove_raw_file
+
+# Size of the chunks read from the decoder
+CHUNK_SIZE = 64 * 1024
+
+
+class PcmFanout:
+    """
+    One decode of a track fanned out to the raw PCM files of many calls.
+
+    The decoder output is paced to real time plus BROADCAST_LEAD_SECONDS of
+    lead and every chunk is appended to the file of each subscribed chat, so a
+    listener costs a file write instead of its own decoder. A chat subscribing
+    while the track plays gets a file starting at the live point, copied from
+    the recent output kept in memory.
+    """
+
+    def __init__(self, url, audio_file, parameters, file_prefix, start=0, end=None, gain=0, lead=None):
+        self.url = url
+        self.audio_file = audio_file
+        self.parameters = parameters  # AudioParameters of the raw output
+        self.file_prefix = file_prefix
+        self.start = start
+        self.end = end
+        self.gain = gain
+
+        self.frame_size = parameters.channels * 2  # s16le
+        self.bytes_per_second = parameters.bitrate * self.frame_size
+        lead = lead if lead is not None else Config.BROADCAST_LEAD_SECONDS
+        self.lead_bytes = int(lead * self.bytes_per_second)
+
+        self.subscribers = {}  # chat ID -> (raw file, open file)
+        self.written = 0
+        self.recent = bytearray()  # the last output, for chats joining late
+        self.recent_start = 0  # byte offset of recent[0] in the output
+
+        self.started_at = None
+        self.paused_at = None
+        self.paused_total = 0.0
+        self.ready = asyncio.Event()
+        self.finished = False
+        self.task = None
+
+    def played_bytes(self):
+        """Bytes of output the calls have played by now"""
+        if self.started_at is None:
+            return 0
+        now = self.paused_at if self.paused_at is not None else time.monotonic()
+        played = int((now - self.started_at - self.paused_total) * self.bytes_per_second)
+        return min(played, self.written) // self.frame_size * self.frame_size
+
+    @property
+    def position(self):
+        """Position in the track at the live point"""
+        return self.start + self.played_bytes() / self.bytes_per_second
+
+    @property
+    def paused(self):
+        return self.paused_at is not None
+
+    def run(self):
+        self.task = asyncio.create_task(self._pump())
+
+    async def wait_ready(self):
+        """Wait until the lead is decoded, so a new reader doesn't start on an empty file"""
+        await self.ready.wait()
+
+    async def _pump(self):
+        before_input, after_input = decode_parameters(self.start, self.end, self.gain)
+        process = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-v', 'error',
+            *before_input,
+            '-i', self.audio_file,
+            *after_input,
+            *pcm_parameters(self.parameters.bitrate, self.parameters.channels),
+            'pipe:1',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+
+        self.started_at = time.monotonic()
+        try:
+            while True:
+                # Stay at most the lead ahead of what the calls have played
+                while self.paused or self.written - self.played_bytes() >= self.lead_bytes:
+                    self.ready.set()
+                    await asyncio.sleep(0.05)
+
+                chunk = await process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self._write(chunk)
+            await process.wait()
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        finally:
+            self.finished = True
+            self.ready.set()
+
+    def _write(self, chunk):
+        for chat_id, (raw_file, f) in list(self.subscribers.items()):
+            try:
+                f.write(chunk)
+                f.flush()
+            except OSError as e:
+                print(f"Error writing broadcast audio for chat {chat_id}: {str(e)}")
+                self.remove_subscriber(chat_id)
+
+        self.written += len(chunk)
+        self.recent += chunk
+        overflow = len(self.recent) - 2 * self.lead_bytes
+        if overflow > 0:
+            del self.recent[:overflow]
+            self.recent_start += overflow
+
+    def add_subscriber(self, chat_id):
+        """
+        Start feeding a chat
+
+        Returns:
+            str: Raw PCM file for the chat's call, starting at the live point
+        """
+        self.remove_subscriber(chat_id)
+        raw_file = f"{self.file_prefix}_{abs(chat_id)}.raw"
+        f = open(raw_file, "wb")
+        live = max(self.played_bytes(), self.recent_start)
+        f.write(self.recent[live - self.recent_start:])
+        f.flush()
+        self.subscribers[chat_id] = (raw_file, f)
+        return raw_file
+
+    def remove_subscriber(self, chat_id):
+        entry = self.subscribers.pop(chat_id, None)
+        if entry:
+            raw_file, f = entry
+            f.close()
+            remove_raw_file(raw_file)
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.monotonic()
+
+    def resume(self):
+        if self.paused_at is not None:
+            self.paused_total += time.monotonic() - self.paused_at
+            self.paused_at = None
+
+    def stop(self):
+        """Stop decoding and delete the files of every subscriber"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        for chat_id in list(self.subscribers):
+            self.remove_subscriber(chat_id)
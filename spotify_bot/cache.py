@@ -0,0 +1,133 @@
+import os
+import time
+import hashlib
+
+from spotify_bot.config import Config
+
+# Prefixes of files in the download directory that belong to a cached track
+CACHE_PREFIXES = ('audio_', 'seeked_')
+
+
+def url_hash(url):
+    """Return the hash used to name the cached files of a track URL"""
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+def hash_from_filename(filename):
+    """Extract the track hash from a cached file name, or None if it isn't one"""
+    for prefix in CACHE_PREFIXES:
+        if filename.startswith(prefix):
+            # Formats: audio_<hash>.mp3, seeked_<hash>_<position>.mp3
+            file_hash = filename[len(prefix):len(prefix) + 32]
+            if len(file_hash) == 32:
+                return file_hash
+    return None
+
+
+class AudioCache:
+    """
+    Reference-counted cache of downloaded audio files.
+
+    Anything that needs a track's files on disk (the current track of a chat,
+    queue entries, prefetches) holds a reference on the track URL. Files are
+    never deleted while referenced. When the count drops to zero the entry
+    becomes idle and is only removed by evict(), once it has been idle longer
+    than the TTL or the cache is over its size budget (oldest idle first).
+    """
+
+    def __init__(self, download_dir, max_bytes=None, idle_ttl=None):
+        self.download_dir = download_dir
+        self.max_bytes = max_bytes if max_bytes is not None else Config.CACHE_MAX_MB * 1024 * 1024
+        self.idle_ttl = idle_ttl if idle_ttl is not None else Config.CACHE_IDLE_TTL
+        self.refs = {}  # track hash -> reference count
+        self.idle_since = {}  # track hash -> time its reference count reached zero
+
+    def acquire(self, url):
+        """Take a reference on a track, returns its hash"""
+        file_hash = url_hash(url)
+        self.refs[file_hash] = self.refs.get(file_hash, 0) + 1
+        self.idle_since.pop(file_hash, None)
+        return file_hash
+
+    def release(self, url):
+        """Drop a reference on a track, returns the remaining count"""
+        file_hash = url_hash(url)
+        count = self.refs.get(file_hash, 0) - 1
+        if count > 0:
+            self.refs[file_hash] = count
+            return count
+
+        self.refs.pop(file_hash, None)
+        self.idle_since[file_hash] = time.time()
+        return 0
+
+    def is_referenced(self, file_hash):
+        return self.refs.get(file_hash, 0) > 0
+
+    def find_files(self):
+        """
+        List the cached tracks on disk with their modification time
+
+        Only touches the filesystem, so it can run in a worker thread.
+        """
+        found = {}
+        try:
+            files = os.listdir(self.download_dir)
+        except FileNotFoundError:
+            return found
+
+        for file in files:
+            file_hash = hash_from_filename(file)
+            if not file_hash:
+                continue
+            try:
+                found[file_hash] = max(found.get(file_hash, 0), os.path.getmtime(os.path.join(self.download_dir, file)))
+            except OSError:
+                continue
+        return found
+
+    def add_idle(self, found):
+        """Register files left on disk by a previous run as idle entries"""
+        for file_hash, mtime in found.items():
+            if self.is_referenced(file_hash) or file_hash in self.idle_since:
+                continue
+            self.idle_since[file_hash] = mtime
+
+    def evict(self):
+        """
+        Pick the idle entries that should be deleted now
+
+        Returns:
+            list: Hashes of the evicted tracks, the caller deletes their files
+        """
+        now = time.time()
+
+        # Size of every cached track on disk
+        sizes = {}
+        try:
+            files = os.listdir(self.download_dir)
+        except FileNotFoundError:
+            files = []
+        for file in files:
+            file_hash = hash_from_filename(file)
+            if not file_hash:
+                continue
+            try:
+                sizes[file_hash] = sizes.get(file_hash, 0) + os.path.getsize(os.path.join(self.download_dir, file))
+            except OSError:
+                continue
+        total = sum(sizes.values())
+
+        evicted = []
+        # Oldest idle entries first
+        for file_hash, since in sorted(self.idle_since.items(), key=lambda item: item[1]):
+            if self.is_referenced(file_hash):
+                continue
+            if now - since >= self.idle_ttl or total > self.max_bytes:
+                evicted.append(file_hash)
+                total -= sizes.get(file_hash, 0)
+
+        for file_hash in evicted:
+            del self.idle_since[file_hash]
+
+        return evicted
@@ -1,192 +1,203 @@
 from pyrogram import Client, filters
-from pyrogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
-import time
-import asyncio
-import os
-import hashlib
-from pytgcalls.types import AudioPiped
-from pytgcalls.types.input_stream.quality import HighQualityAudio
-from pytgcalls.types import AudioParameters
-from spotify_bot.helpers import format_duration
-from .helpers import format_duration
-
-# Define callback data prefixes
-PAUSE_CB = "pause"
-RESUME_CB = "resume"
-STOP_CB = "stop"
-CLOSE_CB = "close"
-NEXT_CB = "next"
-PLAYPAUSE_CB = "playpause"
-REPEAT_CB = "repeat"
-
-def get_music_control_keyboard(is_playing=True, has_queue=False, is_repeating=False):
-    keyboard = [
-        [
-            InlineKeyboardButton("⏸️ Pause" if is_playing else "▶️ Resume", callback_data=PLAYPAUSE_CB),
-            InlineKeyboardButton("⏭️ Next", callback_data=NEXT_CB),
-            InlineKeyboardButton("🔂 Repeat" if is_repeating else "1️⃣", callback_data=REPEAT_CB)
-        ],
-        [
-            InlineKeyboardButton("⏹️ Stop", callback_data=STOP_CB)
-        ]
-    ]
-
-    return InlineKeyboardMarkup(keyboard)
+from pyrogram.types import CallbackQuery
+from spotify_bot.helpers import get_music_control_keyboard
+from spotify_bot.helpers import CALLBACK_VERSION, STOP_CB, CLOSE_CB, NEXT_CB, PLAYPAUSE_CB, REPEAT_CB
 
-def register_callbacks(bot):
-    """
-    Register callback query handlers for the bot
-    """
-    # Add the repeat callback handler
-    @bot.app.on_callback_query(filters.regex(f"^{REPEAT_CB}"))
-    async def repeat_callback(client, callback_query: CallbackQuery):
-        """Handle repeat button callback"""
-        chat_id = callback_query.message.chat.id
-        
-        # Initialize repeat states if not exists
-        if chat_id not in bot.repeat_mode:
-            bot.repeat_mode[chat_id] = False
-        if chat_id not in bot.repeat_used:
-            bot.repeat_used[chat_id] = False
-        
-        # Toggle the repeat mode
-        current_repeat = bot.repeat_mode[chat_id]
-        if current_repeat:
-            # If already repeating, disable it
-            bot.repeat_mode[chat_id] = False
-            bot.repeat_used[chat_id] = False
-            await callback_query.answer("Repeat mode disabled")
-        else:
-            # Enable repeat and mark as not used
-            bot.repeat_mode[chat_id] = True
-            bot.repeat_used[chat_id] = False
-            await callback_query.answer("Will repeat current track once")
-        
-        # Force update the control message to reflect new state
-        await bot.update_control_message(chat_id, force_update=True)
-
-    
-    @bot.app.on_callback_query(filters.regex(f"^{PLAYPAUSE_CB}"))
-    async def playpause_callback(client, callback_query: CallbackQuery):
-        """Handle play/pause button callback"""
-        chat_id = callback_query.message.chat.id
-        
-        # Get the bot instance
-        bot_instance = bot
-        
-        # Check if there's an active group call
-        is_active = await bot_instance.is_group_call_active(chat_id)
-        is_playing = bot_instance.is_playing.get(chat_id, False)
-        
-        if is_active or bot_instance.active_calls.get(chat_id, False):
-            if is_playing:
-                # Call the pause method
-                await bot_instance.pause_stream(chat_id)
-                await callback_query.answer("Music paused")
-            else:
-                # Call the resume method
-                await bot_instance.resume_stream(chat_id)
-                await callback_query.answer("Music resumed")
-            
-            # Update the keyboard (seek buttons removed)
-            has_queue = chat_id in bot_instance.queue and len(bot_instance.queue[chat_id]) > 0
-            new_keyboard = get_music_control_keyboard(is_playing=not is_playing, has_queue=has_queue)
-            
-            try:
-                await callback_query.message.edit_reply_markup(new_keyboard)
-            except Exception as e:
-                print(f"Error updating keyboard: {str(e)}")
+async def repeat_callback(bot, callback_query: CallbackQuery):
+    """Handle repeat button callback"""
+    chat_id = callback_query.message.chat.id
+
+    # Initialize repeat states if not exists
+    if chat_id not in bot.repeat_mode:
+        bot.repeat_mode[chat_id] = False
+    if chat_id not in bot.repeat_used:
+        bot.repeat_used[chat_id] = False
+
+    # Toggle the repeat mode
+    current_repeat = bot.repeat_mode[chat_id]
+    if current_repeat:
+        # If already repeating, disable it
+        bot.repeat_mode[chat_id] = False
+        bot.repeat_used[chat_id] = False
+        await callback_query.answer("Repeat mode disabled")
+    else:
+        # Enable repeat and mark as not used
+        bot.repeat_mode[chat_id] = True
+        bot.repeat_used[chat_id] = False
+        await callback_query.answer("Will repeat current track once")
+
+    # Force update the control message to reflect new state
+    await bot.update_control_message(chat_id, force_update=True)
+
+
+async def playpause_callback(bot, callback_query: CallbackQuery):
+    """Handle play/pause button callback"""
+    chat_id = callback_query.message.chat.id
+
+    # Get the bot instance
+    bot_instance = bot
+
+    # Check if there's an active group call
+    is_active = await bot_instance.is_group_call_active(chat_id)
+    is_playing = bot_instance.is_playing.get(chat_id, False)
+
+    if is_active or bot_instance.active_calls.get(chat_id, False):
+        if is_playing:
+            # Call the pause method
+            await bot_instance.pause_stream(chat_id)
+            await callback_query.answer("Music paused")
         else:
-            await callback_query.answer("Nothing is playing")
-
-    
-    @bot.app.on_callback_query(filters.regex(f"^{STOP_CB}"))
-    async def stop_callback(client, callback_query: CallbackQuery):
-        """Handle stop button callback"""
-        chat_id = callback_query.message.chat.id
-        
-        # Get the bot instance
-        bot_instance = bot
-        
+            # Call the resume method
+            await bot_instance.resume_stream(chat_id)
+            await callback_query.answer("Music resumed")
+
+        # Update the keyboard (seek buttons removed)
+        has_queue = chat_id in bot_instance.queue and len(bot_instance.queue[chat_id]) > 0
+        new_keyboard = get_music_control_keyboard(is_playing=not is_playing, has_queue=has_queue)
+
         try:
-            # Send a wait message
-            wait_message = await callback_query.message.reply("⏹️ Stopping music... Please wait.")
-            
-            # First try to pause the stream
-            try:
-                await bot_instance.call_manager.pause_stream(chat_id)
-            except Exception as e:
-                print(f"Error pausing stream: {str(e)}")
+            await callback_query.message.edit_reply_markup(new_keyboard)
+        except Exception as e:
+            print(f"Error updating keyboard: {str(e)}")
+    else:
+        await callback_query.answer("Nothing is playing")
 
-            # Call the stop method
-            success = await bot_instance.stop_streaming(chat_id)
-            
-            # Try to delete the control message first
+
+async def stop_callback(bot, callback_query: CallbackQuery):
+    """Handle stop button callback"""
+    chat_id = callback_query.message.chat.id
+
+    # Get the bot instance
+    bot_instance = bot
+
+    try:
+        # Send a wait message
+        wait_message = await callback_query.message.reply("⏹️ Stopping music... Please wait.")
+
+        # First try to pause the stream
+        try:
+            await bot_instance.call_manager.pause_stream(chat_id)
+        except Exception as e:
+            print(f"Error pausing stream: {str(e)}")
+
+        # Call the stop method
+        success = await bot_instance.stop_streaming(chat_id)
+
+        # Try to delete the control message first
+        try:
+            if chat_id in bot_instance.control_messages:
+                await bot_instance.control_messages[chat_id].delete()
+                del bot_instance.control_messages[chat_id]
+        except Exception as e:
+            print(f"Error deleting control message: {str(e)}")
+
+        # Delete wait message
+        try:
+            await wait_message.delete()
+        except Exception as e:
+            print(f"Error deleting wait message: {str(e)}")
+
+        if success:
+            # Try to delete the current message
             try:
-                if chat_id in bot_instance.control_messages:
-                    await bot_instance.control_messages[chat_id].delete()
-                    del bot_instance.control_messages[chat_id]
+                await callback_query.message.delete()
             except Exception as e:
-                print(f"Error deleting control message: {str(e)}")
+                print(f"Error deleting callback message: {str(e)}")
 
-            # Delete wait message
+            await callback_query.answer("Music stopped successfully")
+        else:
+            # Even if stop_streaming returns False, try one last time to stop the stream
             try:
-                await wait_message.delete()
+                await bot_instance.call_manager.stop_stream(chat_id)
+                await bot_instance.call_manager.leave_group_call(chat_id)
+                await callback_query.answer("Music stopped (fallback method)")
             except Exception as e:
-                print(f"Error deleting wait message: {str(e)}")
-            
-            if success:
-                # Try to delete the current message
-                try:
-                    await callback_query.message.delete()
-                except Exception as e:
-                    print(f"Error deleting callback message: {str(e)}")
-                
-                await callback_query.answer("Music stopped successfully")
-            else:
-                # Even if stop_streaming returns False, try one last time to stop the stream
-                try:
-                    await bot_instance.call_manager.stop_stream(chat_id)
-                    await bot_instance.call_manager.leave_group_call(chat_id)
-                    await callback_query.answer("Music stopped (fallback method)")
-                except Exception as e:
-                    print(f"Error in fallback stop: {str(e)}")
-                    await callback_query.answer("Failed to stop music")
-        except Exception as e:
-            print(f"Error in stop callback: {str(e)}")
-            await callback_query.answer("Error occurred while stopping music")
+                print(f"Error in fallback stop: {str(e)}")
+                await callback_query.answer("Failed to stop music")
+    except Exception as e:
+        print(f"Error in stop callback: {str(e)}")
+        await callback_query.answer("Error occurred while stopping music")
 
-    @bot.app.on_callback_query(filters.regex(f"^{NEXT_CB}"))
-    async def next_callback(client, callback_query: CallbackQuery):
-        """Handle next button callback"""
-        chat_id = callback_query.message.chat.id
-        bot_instance = bot  # Use the bot instance
+async def next_callback(bot, callback_query: CallbackQuery):
+    """Handle next button callback"""
+    chat_id = callback_query.message.chat.id
+    bot_instance = bot  # Use the bot instance
 
-        # Check if there are songs in the queue
-        has_queue = chat_id in bot_instance.queue and len(bot_instance.queue[chat_id]) > 0
+    # Check if there are songs in the queue
+    has_queue = chat_id in bot_instance.queue and len(bot_instance.queue[chat_id]) > 0
 
-        if has_queue:
-            wait_message = await callback_query.message.reply("⏭️ Skipping to next track... Please wait.")
-            try:
-                await bot_instance.skip_track(callback_query.message)
-                await callback_query.answer("Skipping to next track")
-            except Exception as e:
-                print(f"Error in next callback: {str(e)}")
-                await wait_message.delete()
-                await callback_query.answer("Error skipping track")
+    if has_queue:
+        # Answer right away, presses in quick succession are applied as one skip
+        count = bot_instance.request_skip(callback_query.message)
+        if count > 1:
+            await callback_query.answer(f"Skipping {count} tracks")
         else:
-            await callback_query.answer("No songs in the queue", show_alert=True)
-    
-    @bot.app.on_callback_query(filters.regex(f"^{CLOSE_CB}"))
-    async def close_callback(client, callback_query: CallbackQuery):
-        """Handle close button callback"""
-        chat_id = callback_query.message.chat.id
-        user_id = callback_query.from_user.id
-        
-        # Delete the message with the controls
-        try:
-            await callback_query.message.delete()
-            await callback_query.answer("Player controls closed")
-        except Exception as e:
-            print(f"Error deleting message: {str(e)}")
-            await callback_query.answer("Failed to close player controls")
+            await callback_query.answer("Skipping to next track")
+    else:
+        await callback_query.answer("No songs in the queue", show_alert=True)
+
+async def close_callback(bot, callback_query: CallbackQuery):
+    """Handle close button callback"""
+    chat_id = callback_query.message.chat.id
+    user_id = callback_query.from_user.id
+
+    # Delete the message with the controls
+    try:
+        await callback_query.message.delete()
+        await callback_query.answer("Player controls closed")
+    except Exception as e:
+        print(f"Error deleting message: {str(e)}")
+        await callback_query.answer("Failed to close player controls")
+
+# Action of every callback payload, versioned payloads and the plain names
+# used by control messages sent before payloads were versioned
+CALLBACK_HANDLERS = {
+    REPEAT_CB: repeat_callback,
+    PLAYPAUSE_CB: playpause_callback,
+    STOP_CB: stop_callback,
+    NEXT_CB: next_callback,
+    CLOSE_CB: close_callback,
+    "repeat": repeat_callback,
+    "playpause": playpause_callback,
+    "stop": stop_callback,
+    "next": next_callback,
+    "close": close_callback,
+}
+
+def callback_handler(data):
+    """Handler of a callback payload, None for unknown payloads"""
+    if not data:
+        return None
+    version, sep, rest = data.partition(":")
+    if sep and version == CALLBACK_VERSION:
+        # Anything after the action is an argument for the handler
+        action = rest.partition(":")[0]
+        return CALLBACK_HANDLERS.get(f"{version}:{action}")
+    return CALLBACK_HANDLERS.get(data)
+
+def register_callbacks(bot):
+    """
+    Register the callback query router for the bot
+
+    A single handler dispatches every button press by a dict lookup on its
+    payload. Registering again is a no-op so the handler chain never grows.
+    """
+    if getattr(bot, "callbacks_registered", False):
+        return
+    bot.callbacks_registered = True
+
+    @bot.app.on_callback_query()
+    async def callback_router(client, callback_query: CallbackQuery):
+        if bot.shutting_down:
+            await callback_query.answer("The bot is restarting, please try again in a moment.")
+            return
+        handler = callback_handler(callback_query.data)
+        if handler is None:
+            await callback_query.answer("This button is no longer supported")
+            return
+        # Buttons count against the same limits as the commands they stand for
+        scope, wait = bot.rate_limiter.check('control', callback_query.from_user.id, callback_query.message.chat.id)
+        if scope:
+            await callback_query.answer(f"Slow down, try again in {max(int(wait), 1)}s")
+            return
+        await handler(bot, callback_query)
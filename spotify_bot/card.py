@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps
+
+from spotify_bot.config import Config
+from spotify_bot.helpers import format_duration
+
+CARD_SIZE = (960, 540)
+ART_BOX = (60, 110, 380, 430)  # cover art, left of the text
+TEXT_LEFT = 420
+BAR_BOX = (420, 380, 900, 392)  # progress bar track
+# Region the progress overlay covers: the bar and the time labels under it
+OVERLAY_BOX = (400, 360, 920, 440)
+
+
+def load_font(size, bold=False):
+    """A TrueType font at a size, Pillow's built-in font where none is installed"""
+    names = [Config.CARD_FONT] if Config.CARD_FONT else []
+    names += ["DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf", "Arial Bold.ttf" if bold else "Arial.ttf"]
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def wrap_text(draw, text, font, width, max_lines):
+    """Split text into lines that fit a width, the last line ellipsized"""
+    lines = []
+    words = text.split()
+    while words and len(lines) < max_lines:
+        line = words.pop(0)
+        while words and draw.textlength(f"{line} {words[0]}", font=font) <= width:
+            line = f"{line} {words.pop(0)}"
+        lines.append(line)
+    if words and lines:
+        last = lines[-1]
+        while last and draw.textlength(f"{last}…", font=font) > width:
+            last = last[:-1]
+        lines[-1] = f"{last.rstrip()}…"
+    return lines
+
+
+class CardRenderer:
+    """
+    Renders now-playing cards: blurred background, cover art, title and a progress bar.
+
+    Everything but the progress is rendered once per track and kept in memory,
+    a refresh only draws the progress overlay onto a copy of that layer. Meant
+    to run in an executor, rendering is CPU bound. Renders of several chats
+    can run at once in the executor's threads, lock guards the layer cache
+    and the stats.
+    """
+
+    def __init__(self, directory="thumbnails/cards", max_cached=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.max_cached = max_cached or Config.CARD_CACHE_SIZE
+        self.static_layers = OrderedDict()  # video ID -> (static layer, clean overlay region)
+        self.lock = threading.Lock()
+        self.title_font = load_font(44, bold=True)
+        self.subtitle_font = load_font(28)
+        self.time_font = load_font(24)
+        self.stats = {'static': [0, 0.0], 'refresh': [0, 0.0, 0.0]}  # count, total, (max) seconds
+
+    def static_layer(self, video_id, thumbnail_path, title, subtitle):
+        """The parts of a track's card that don't change while it plays"""
+        with self.lock:
+            cached = self.static_layers.get(video_id)
+            if cached:
+                self.static_layers.move_to_end(video_id)
+                return cached
+
+        started = time.perf_counter()
+        with Image.open(thumbnail_path) as thumbnail:
+            thumbnail = thumbnail.convert("RGB")
+            background = ImageOps.fit(thumbnail, CARD_SIZE, method=Image.LANCZOS)
+            background = background.resize((CARD_SIZE[0] // 8, CARD_SIZE[1] // 8)).filter(ImageFilter.GaussianBlur(3))
+            background = background.resize(CARD_SIZE, Image.BILINEAR)
+            background = ImageEnhance.Brightness(background).enhance(0.45)
+
+            art_size = (ART_BOX[2] - ART_BOX[0], ART_BOX[3] - ART_BOX[1])
+            art = ImageOps.fit(thumbnail, art_size, method=Image.LANCZOS)
+
+        mask = Image.new("L", art_size, 0)
+        ImageDraw.Draw(mask).rounded_rectangle((0, 0, *art_size), radius=24, fill=255)
+        background.paste(art, ART_BOX[:2], mask)
+
+        draw = ImageDraw.Draw(background)
+        text_width = CARD_SIZE[0] - TEXT_LEFT - 60
+        y = 130
+        for line in wrap_text(draw, title, self.title_font, text_width, 3):
+            draw.text((TEXT_LEFT, y), line, font=self.title_font, fill=(255, 255, 255))
+            y += 54
+        if subtitle:
+            for line in wrap_text(draw, subtitle, self.subtitle_font, text_width, 1):
+                draw.text((TEXT_LEFT, y + 10), line, font=self.subtitle_font, fill=(200, 200, 200))
+
+        layer = (background, background.crop(OVERLAY_BOX))
+        elapsed = time.perf_counter() - started
+        # Rendered outside the lock, two chats starting the same track may both render it
+        with self.lock:
+            self.static_layers[video_id] = layer
+            self.static_layers.move_to_end(video_id)
+            while len(self.static_layers) > self.max_cached:
+                self.static_layers.popitem(last=False)
+
+            stats = self.stats['static']
+            stats[0] += 1
+            stats[1] += elapsed
+        return layer
+
+    def render(self, name, video_id, thumbnail_path, title, subtitle, position, duration):
+        """
+        Render a card with the progress at a position
+
+        Args:
+            name: File name of the card, one per chat so chats don't overwrite each other
+            position: Seconds played
+            duration: Track length in seconds, None for no progress bar
+
+        Returns:
+            str: Path of the JPEG card
+        """
+        background, clean_overlay = self.static_layer(video_id, thumbnail_path, title, subtitle)
+
+        started = time.perf_counter()
+        # Only the overlay region is redrawn, starting from its clean copy
+        overlay = clean_overlay.copy()
+        draw = ImageDraw.Draw(overlay)
+        left, top = BAR_BOX[0] - OVERLAY_BOX[0], BAR_BOX[1] - OVERLAY_BOX[1]
+        right, bottom = BAR_BOX[2] - OVERLAY_BOX[0], BAR_BOX[3] - OVERLAY_BOX[1]
+
+        draw.rounded_rectangle((left, top, right, bottom), radius=6, fill=(90, 90, 90))
+        if duration:
+            progress = min(max(position / duration, 0.0), 1.0)
+            filled = left + int((right - left) * progress)
+            if filled > left:
+                draw.rounded_rectangle((left, top, max(filled, left + 12), bottom), radius=6, fill=(30, 215, 96))
+            draw.ellipse((filled - 10, top - 4, filled + 10, bottom + 4), fill=(255, 255, 255))
+
+            total = format_duration(int(duration))
+            draw.text((left, bottom + 14), format_duration(int(position)), font=self.time_font, fill=(220, 220, 220))
+            draw.text((right - draw.textlength(total, font=self.time_font), bottom + 14), total, font=self.time_font, fill=(220, 220, 220))
+
+        card = background.copy()
+        card.paste(overlay, OVERLAY_BOX[:2])
+
+        path = os.path.join(self.directory, f"{name}.jpg")
+        tmp_path = f"{path}.tmp"
+        card.save(tmp_path, "JPEG", quality=85)
+        os.replace(tmp_path, path)
+
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            stats = self.stats['refresh']
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+        return path
+
+    def render_stats(self):
+        """Average static layer and refresh render times in milliseconds"""
+        with self.lock:
+            static_count, static_total = self.stats['static']
+            count, total, maximum = self.stats['refresh']
+        return {
+            'static_renders': static_count,
+            'static_avg_ms': static_total / static_count * 1000 if static_count else 0.0,
+            'refreshes': count,
+            'refresh_avg_ms': total / count * 1000 if count else 0.0,
+            'refresh_max_ms': maximum * 1000,
+        }
@@ -8,15 +8,129 @@ class Config(object):
     USER_SESSION = os.environ.get("USER_SESSION", "BQBxIQMAjjIva6RLQ2kS7Ioesl9KoKtiaK8OcSwoPlbukpZMCU-OGvoktgKrkckQAU-HEfDrHoGtSknDxtQeM5KSZpHKM4ei-trWKLk4hfxS1MiEvang991RKMYS9QoDg93CTzvl3w8FpZ3qfdWTWRIp5N8WetCE0QzqPh47B-eyXZqgNXgafnRJwELUXtP7l1ta4g5O0O-t0LloTjdotk0TxY_5L0DL9JpPq95BtZ_lmOpVzxVi3db-TUZqDOeVXHS7YKtkNZllV2ckP4JWkhGEncOuUWbqEiMwywABhWGDstAJwyUUp6iC8a5Ar4GKAUsEgAAJdEk3vOn9YX7zHJyjW58ILgAAAAGpcEk8AA")
     ASSISTANT_ID = int(os.environ.get("ASSISTANT_ID", "7137675580"))
 
+    # Audio cache config
+    CACHE_MAX_MB = int(os.environ.get("CACHE_MAX_MB", "2048"))
+    CACHE_IDLE_TTL = int(os.environ.get("CACHE_IDLE_TTL", "1800"))
+
+    # Session snapshot config
+    SESSION_FILE = os.environ.get("SESSION_FILE", "sessions/playback.json")
+    SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", "30"))
+    RESTORE_STAGGER = float(os.environ.get("RESTORE_STAGGER", "3"))
+
+    # Audio analysis config
+    TARGET_LOUDNESS = float(os.environ.get("TARGET_LOUDNESS", "-14"))
+    MAX_GAIN_DB = float(os.environ.get("MAX_GAIN_DB", "10"))
+    SILENCE_THRESHOLD_DB = float(os.environ.get("SILENCE_THRESHOLD_DB", "-50"))
+    MIN_TRIM_SECONDS = float(os.environ.get("MIN_TRIM_SECONDS", "1"))
+
+    # Pre-decoded PCM staging of the next track
+    PCM_STAGING = os.environ.get("PCM_STAGING", "false").lower() == "true"
+    STAGING_LEAD_SECONDS = int(os.environ.get("STAGING_LEAD_SECONDS", "20"))
+    STAGING_HEAD_SECONDS = int(os.environ.get("STAGING_HEAD_SECONDS", "15"))
+
+    # Local index of resolved tracks
+    TRACK_INDEX_FILE = os.environ.get("TRACK_INDEX_FILE", "data/tracks.db")
+    LOCAL_MATCH_CONFIDENCE = float(os.environ.get("LOCAL_MATCH_CONFIDENCE", "0.6"))
+
+    # Adaptive audio quality, tiers are sample_rate:channels from best to lowest
+    QUALITY_TIERS = os.environ.get("QUALITY_TIERS", "48000:2,48000:1,24000:1")
+    QUALITY_CPU_HIGH = float(os.environ.get("QUALITY_CPU_HIGH", "0.85"))
+    QUALITY_CPU_LOW = float(os.environ.get("QUALITY_CPU_LOW", "0.5"))
+    QUALITY_CALLS_HIGH = int(os.environ.get("QUALITY_CALLS_HIGH", "30"))
+    QUALITY_CALLS_LOW = int(os.environ.get("QUALITY_CALLS_LOW", "15"))
+    QUALITY_COOLDOWN = int(os.environ.get("QUALITY_COOLDOWN", "30"))
+    QUALITY_SAMPLE_INTERVAL = int(os.environ.get("QUALITY_SAMPLE_INTERVAL", "15"))
+
+    # Media job budgets: concurrent ffmpeg jobs and concurrent downloads
+    MEDIA_CPU_JOBS = int(os.environ.get("MEDIA_CPU_JOBS", "4"))
+    MEDIA_NET_JOBS = int(os.environ.get("MEDIA_NET_JOBS", "3"))
+
+    # Segmented downloads
+    DOWNLOAD_SEGMENTS = int(os.environ.get("DOWNLOAD_SEGMENTS", "4"))
+    DOWNLOAD_MIN_SEGMENT_MB = int(os.environ.get("DOWNLOAD_MIN_SEGMENT_MB", "1"))
+    DOWNLOAD_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", "5"))
+
+    # Seconds Next presses are collected for before they're applied as one skip
+    SKIP_DEBOUNCE = float(os.environ.get("SKIP_DEBOUNCE", "0.7"))
+
+    # Broadcasts, one decode fed to every subscribed chat
+    BROADCAST_LEAD_SECONDS = float(os.environ.get("BROADCAST_LEAD_SECONDS", "3"))
+    BROADCAST_DRIFT = float(os.environ.get("BROADCAST_DRIFT", "3"))
+    BROADCAST_SYNC_INTERVAL = float(os.environ.get("BROADCAST_SYNC_INTERVAL", "1"))
+
+    # Operator introspection, /debug is limited to ADMIN_IDS, the local endpoint is off when DEBUG_PORT is 0
+    ADMIN_IDS = [int(user_id) for user_id in os.environ.get("ADMIN_IDS", "").split(",") if user_id.strip()]
+    DEBUG_PORT = int(os.environ.get("DEBUG_PORT", "0"))
+    TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "10"))
+
+    # Event loop lag monitor, blocks longer than LAG_THRESHOLD_MS are recorded with their stack
+    LAG_INTERVAL = float(os.environ.get("LAG_INTERVAL", "0.1"))
+    LAG_THRESHOLD_MS = int(os.environ.get("LAG_THRESHOLD_MS", "200"))
+    LAG_EVENTS = int(os.environ.get("LAG_EVENTS", "50"))
+
+    # Process lifecycle, uvloop is used when enabled and installed
+    USE_UVLOOP = os.environ.get("USE_UVLOOP", "true").lower() == "true"
+    SHUTDOWN_TIMEOUT = int(os.environ.get("SHUTDOWN_TIMEOUT", "20"))
+
+    # Bulk /play: tracks per request, concurrent resolutions and tracks downloaded ahead
+    BULK_PLAY_MAX = int(os.environ.get("BULK_PLAY_MAX", "25"))
+    BULK_RESOLVE_CONCURRENCY = int(os.environ.get("BULK_RESOLVE_CONCURRENCY", "4"))
+    BULK_PREFETCH = int(os.environ.get("BULK_PREFETCH", "3"))
+
+    # Inline search: results shown, per-user debounce, Telegram cache time and search cache lifetime
+    INLINE_RESULTS = int(os.environ.get("INLINE_RESULTS", "8"))
+    INLINE_DEBOUNCE = float(os.environ.get("INLINE_DEBOUNCE", "0.4"))
+    INLINE_CACHE_TIME = int(os.environ.get("INLINE_CACHE_TIME", "3600"))
+    SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", "21600"))
+
+    # Spotify links, client credentials of a Spotify app enable them
+    SPOTIFY_CLIENT_ID = os.environ.get("SPOTIFY_CLIENT_ID", "")
+    SPOTIFY_CLIENT_SECRET = os.environ.get("SPOTIFY_CLIENT_SECRET", "")
+    SPOTIFY_MAX_TRACKS = int(os.environ.get("SPOTIFY_MAX_TRACKS", "50"))
+    SPOTIFY_MATCH_CONCURRENCY = int(os.environ.get("SPOTIFY_MATCH_CONCURRENCY", "4"))
+    SPOTIFY_CANDIDATES = int(os.environ.get("SPOTIFY_CANDIDATES", "5"))
+    SPOTIFY_MIN_SCORE = float(os.environ.get("SPOTIFY_MIN_SCORE", "0.55"))
+
+    # Seconds to stay in the voice chat after the queue ran out, 0 leaves right away
+    IDLE_HOLD_SECONDS = int(os.environ.get("IDLE_HOLD_SECONDS", "120"))
+
+    # Dropped call recovery
+    CALL_RECOVERY_ATTEMPTS = int(os.environ.get("CALL_RECOVERY_ATTEMPTS", "5"))
+    CALL_WATCHDOG_INTERVAL = int(os.environ.get("CALL_WATCHDOG_INTERVAL", "20"))
+
+    # Rendered now-playing cards instead of the plain thumbnail, needs Pillow
+    NOW_PLAYING_CARD = os.environ.get("NOW_PLAYING_CARD", "true").lower() == "true"
+    CARD_REFRESH_SECONDS = int(os.environ.get("CARD_REFRESH_SECONDS", "20"))
+    CARD_CACHE_SIZE = int(os.environ.get("CARD_CACHE_SIZE", "16"))
+    CARD_FONT = os.environ.get("CARD_FONT", "")
+
+    # Rate limits per command class as class:burst/seconds, for each user and each chat
+    RATE_LIMIT_USER = os.environ.get("RATE_LIMIT_USER", "play:4/30,seek:4/20,control:8/20,broadcast:3/60,inline:20/10")
+    RATE_LIMIT_CHAT = os.environ.get("RATE_LIMIT_CHAT", "play:12/60,seek:8/20,control:20/20,broadcast:5/60")
+
+    # Admission control: calls joined at once (0 for no cap), how long a chat waits in line,
+    # and how long a call has to be paused before its slot can be reclaimed
+    MAX_ACTIVE_CALLS = int(os.environ.get("MAX_ACTIVE_CALLS", "20"))
+    ADMISSION_TIMEOUT = int(os.environ.get("ADMISSION_TIMEOUT", "600"))
+    ADMISSION_PAUSED_GRACE = int(os.environ.get("ADMISSION_PAUSED_GRACE", "300"))
+
+    # Resolved media URL cache, seconds before the signed expiry an entry is dropped
+    MEDIA_URL_MARGIN = int(os.environ.get("MEDIA_URL_MARGIN", "300"))
+    MEDIA_URL_DEFAULT_TTL = int(os.environ.get("MEDIA_URL_DEFAULT_TTL", "1800"))
+
 class Txt(object):
     START_TXT = """👋 Welcome to the Music Bot!\n\n
 Use these commands to control the bot:\n
-/play <song name> - Play a song or add it to the queue\n
+/play <song name> - Play a song or add it to the queue, Spotify track, album and playlist links work too\n
 /pause - Pause the current song\n
 /resume - Resume the paused song\n
 /skip - Skip to the next song in the queue\n
 /stop - Stop playing and leave the voice chat\n
 /queue - Show the current queue\n
 /refresh - Recreate the control message with current playback status\n
-/seek <seconds> - Skip forward by the specified number of seconds from current position\n\n
+/seek <seconds> - Skip forward by the specified number of seconds from current position\n
+/broadcast - Let other chats tune in to this chat's playback (again to stop)\n
+/subscribe <chat id> - Tune this chat's voice chat in to a broadcast\n
+/unsubscribe - Stop listening to the broadcast\n\n
+Type @ and the bot's username followed by a song name in any chat to pick the exact track to play.\n\n
 You can also use the buttons below the music thumbnail to control playback."""
@@ -0,0 +1,201 @@
+import os
+import json
+import random
+import asyncio
+import aiohttp
+
+from spotify_bot.config import Config
+from spotify_bot.scheduler import background_command
+
+CHUNK_SIZE = 64 * 1024
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 15
+
+
+class DownloadError(Exception):
+    pass
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter for the nth retry"""
+    delay = min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def probe_size(session, url, headers=None):
+    """
+    Total size of a remote file if the server supports byte ranges
+
+    Returns:
+        int: Size in bytes, or None if ranges aren't supported
+    """
+    request_headers = dict(headers or {})
+    request_headers['Range'] = 'bytes=0-0'
+    async with session.get(url, headers=request_headers) as response:
+        if response.status != 206:
+            return None
+        # Content-Range: bytes 0-0/<total>
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+
+
+def plan_segments(size, segments):
+    """Split a file into byte ranges, never smaller than DOWNLOAD_MIN_SEGMENT_MB"""
+    min_size = Config.DOWNLOAD_MIN_SEGMENT_MB * 1024 * 1024
+    count = max(1, min(segments, size // max(min_size, 1)))
+    step = size // count
+    ranges = []
+    for index in range(count):
+        start = index * step
+        end = size - 1 if index == count - 1 else start + step - 1
+        ranges.append([start, end])
+    return ranges
+
+
+async def fetch_range(session, url, headers, part_file, start, end, retries):
+    """
+    Download one byte range into its part file, resuming from what's on disk
+
+    A dropped connection or a server error is retried with backoff, the retry
+    count starts over whenever a request made progress.
+    """
+    attempt = 0
+    while True:
+        have = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        if start + have > end:
+            return
+
+        request_headers = dict(headers or {})
+        request_headers['Range'] = f"bytes={start + have}-{end}"
+        try:
+            async with session.get(url, headers=request_headers) as response:
+                if response.status != 206:
+                    raise DownloadError(f"Unexpected HTTP status {response.status} for range {start + have}-{end}")
+                with open(part_file, "ab") as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        f.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+            error = e
+        else:
+            error = None
+
+        if os.path.exists(part_file) and os.path.getsize(part_file) > have:
+            attempt = 0
+            continue
+
+        attempt += 1
+        if attempt > retries:
+            raise DownloadError(f"Range {start}-{end} failed after {retries} retries: {error}")
+        delay = backoff_delay(attempt)
+        print(f"Retrying range {start + have}-{end} in {delay:.1f}s: {error}")
+        await asyncio.sleep(delay)
+
+
+def join_parts(part_files, output_file):
+    """Concatenate the downloaded parts into the output file"""
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, "wb") as out:
+        for part_file in part_files:
+            with open(part_file, "rb") as part:
+                while True:
+                    chunk = part.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+    os.replace(tmp_file, output_file)
+
+
+async def download_segmented(url, output_file, headers=None, size=None, segments=None, retries=None):
+    """
+    Download a file in concurrent byte-range segments
+
+    Every segment is written to <output_file>.part<N> and the segment plan to
+    <output_file>.parts.json, so an interrupted download resumes from what's
+    already on disk instead of starting over.
+
+    Args:
+        url: Direct media URL, the server must support byte ranges
+        output_file: Where to write the complete file
+        headers: HTTP headers to send with every request
+        size: Total size if known, probed otherwise
+        segments: Number of concurrent segments
+        retries: Retries per segment without progress
+
+    Raises:
+        DownloadError: If the server doesn't support ranges or a segment keeps failing
+    """
+    segments = segments or Config.DOWNLOAD_SEGMENTS
+    retries = retries if retries is not None else Config.DOWNLOAD_RETRIES
+    state_file = f"{output_file}.parts.json"
+
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=30)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        if not size:
+            size = await probe_size(session, url, headers)
+            if not size:
+                raise DownloadError("Server doesn't support byte ranges")
+
+        # Reuse the plan of an interrupted download of the same file
+        ranges = None
+        if os.path.exists(state_file):
+            try:
+                with open(state_file) as f:
+                    state = json.load(f)
+                if state.get('size') == size:
+                    ranges = state['ranges']
+                    print(f"Resuming download of {output_file}")
+            except (OSError, ValueError, KeyError):
+                ranges = None
+
+        resuming = ranges is not None
+        if not resuming:
+            ranges = plan_segments(size, segments)
+
+        part_files = [f"{output_file}.part{index}" for index in range(len(ranges))]
+        if not resuming:
+            # Parts of a different file, or of a download without a plan
+            for part_file in part_files:
+                if os.path.exists(part_file):
+                    os.remove(part_file)
+            with open(state_file, "w") as f:
+                json.dump({'size': size, 'ranges': ranges}, f)
+
+        await asyncio.gather(*[
+            fetch_range(session, url, headers, part_file, start, end, retries)
+            for part_file, (start, end) in zip(part_files, ranges)
+        ])
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, join_parts, part_files, output_file)
+
+    for part_file in part_files:
+        os.remove(part_file)
+    os.remove(state_file)
+
+
+async def convert_to_mp3(source_file, output_file, bitrate="192k", background=False):
+    """Transcode a downloaded source file to the mp3 files the player uses, niced for background work"""
+    tmp_file = f"{output_file}.tmp"
+    command = [
+        'ffmpeg', '-v', 'error', '-y',
+        '-i', source_file,
+        '-vn',
+        '-codec:a', 'libmp3lame',
+        '-b:a', bitrate,
+        '-f', 'mp3',
+        tmp_file,
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *(background_command(command) if background else command),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    _, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise DownloadError(f"ffmpeg failed to convert {source_file}: {stderr.decode()[-200:]}")
+
+    os.replace(tmp_file, output_file)
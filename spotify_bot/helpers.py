@@ -1,12 +1,35 @@
 import os
 import aiohttp
 import asyncio
-from PIL import Image
-from io import BytesIO
 import time
 import re
+import importlib
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+# yt-dlp and the search library are slow to import, they are loaded on first use
+# or warmed in the background at startup
+_lazy_modules = {}
+
+def _import_lazy(name):
+    module = _lazy_modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        _lazy_modules[name] = module
+        print(f"Imported {name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return module
+
+def get_yt_dlp():
+    return _import_lazy("yt_dlp")
+
+def get_videos_search():
+    return _import_lazy("youtubesearchpython.__future__").VideosSearch
+
+def warm_imports():
+    """Import the lazily loaded libraries, meant to run in a worker thread"""
+    get_yt_dlp()
+    get_videos_search()
+
 # Function to download thumbnail from YouTube
 async def download_thumbnail(video_id):
     thumbnail_url = f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg"
@@ -63,12 +86,28 @@ def format_duration(duration_str):
 
     return str(duration_str)
 
+def parse_duration(duration_str):
+    """Convert a duration like "3:45" or "1:02:03" to seconds, None if it can't be parsed"""
+    if isinstance(duration_str, (int, float)):
+        return int(duration_str)
+
+    if isinstance(duration_str, str) and ":" in duration_str:
+        try:
+            seconds = 0
+            for part in duration_str.split(":"):
+                seconds = seconds * 60 + int(part)
+            return seconds
+        except ValueError:
+            return None
+
+    return None
+
 def create_music_caption(track_info, queue=None, current_seconds=None):
     """
     Create a caption for the music control message
     
     Args:
-        track_info: Track information dictionary
+        track_info: Track, or a track information dictionary
         queue: Queue of tracks
         current_seconds: Current playback position in seconds
         
@@ -85,7 +124,7 @@ def create_music_caption(track_info, queue=None, current_seconds=None):
         caption += f"**Album:** {track_info.get('album', 'Unknown')}\n"
         
     if 'duration' in track_info and track_info['duration']:
-        caption += f"**Duration:** {track_info.get('duration', 'Unknown')}\n"
+        caption += f"**Duration:** {format_duration(track_info['duration'])}\n"
     
     # Add current position if available
     if current_seconds is not None:
@@ -103,16 +142,24 @@ def create_music_caption(track_info, queue=None, current_seconds=None):
     
     return caption 
 
+# Callback payloads are "<version>:<action>", bump the version when their format changes
+CALLBACK_VERSION = "1"
+PLAYPAUSE_CB = f"{CALLBACK_VERSION}:pp"
+NEXT_CB = f"{CALLBACK_VERSION}:nx"
+REPEAT_CB = f"{CALLBACK_VERSION}:rp"
+STOP_CB = f"{CALLBACK_VERSION}:st"
+CLOSE_CB = f"{CALLBACK_VERSION}:cl"
+
 def get_music_control_keyboard(is_playing=True, has_queue=False, is_repeating=False):
     # Create the keyboard
     keyboard = [
         [
-            InlineKeyboardButton("⏸️ Pause" if is_playing else "▶️ Resume", callback_data="playpause"),
-            InlineKeyboardButton("⏭️ Next", callback_data="next"),
-            InlineKeyboardButton("🔂" if is_repeating else "1️⃣", callback_data="repeat")
+            InlineKeyboardButton("⏸️ Pause" if is_playing else "▶️ Resume", callback_data=PLAYPAUSE_CB),
+            InlineKeyboardButton("⏭️ Next", callback_data=NEXT_CB),
+            InlineKeyboardButton("🔂" if is_repeating else "1️⃣", callback_data=REPEAT_CB)
         ],
         [
-            InlineKeyboardButton("⏹️ Stop", callback_data="stop")
+            InlineKeyboardButton("⏹️ Stop", callback_data=STOP_CB)
         ]
     ]
     return InlineKeyboardMarkup(keyboard)
@@ -0,0 +1,218 @@
+import os
+import asyncio
+import tracemalloc
+from collections import Counter
+
+from spotify_bot.config import Config
+
+# Snapshot the next diff is taken against
+_baseline = None
+
+
+def start_tracing(frames=None):
+    """Start tracing allocations, costs nothing until this is called"""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or Config.TRACEMALLOC_FRAMES)
+        _baseline = None
+
+
+def stop_tracing():
+    global _baseline
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _baseline = None
+
+
+def is_tracing():
+    return tracemalloc.is_tracing()
+
+
+def _take_snapshot():
+    # Allocations of tracemalloc itself aren't interesting
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def top_allocations(limit=10):
+    """
+    Allocation sites holding the most memory
+
+    Returns:
+        list: (site, size in bytes, block count), empty when tracing is off
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    stats = _take_snapshot().statistics('lineno')[:limit]
+    return [(str(stat.traceback[0]), stat.size, stat.count) for stat in stats]
+
+
+def snapshot_diff(limit=10):
+    """
+    Allocation sites that grew the most since the previous diff
+
+    The first call after tracing starts only records the baseline.
+
+    Returns:
+        list: (site, size change in bytes, block count change)
+    """
+    global _baseline
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = _take_snapshot()
+    baseline, _baseline = _baseline, snapshot
+    if baseline is None:
+        return []
+    stats = snapshot.compare_to(baseline, 'lineno')[:limit]
+    return [(str(stat.traceback[0]), stat.size_diff, stat.count_diff) for stat in stats]
+
+
+def task_summary():
+    """Live asyncio tasks grouped by coroutine, most common first"""
+    counts = Counter()
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        counts[getattr(coro, '__qualname__', type(coro).__name__)] += 1
+    return counts.most_common()
+
+
+def rss_bytes():
+    """Resident memory of the process, None where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def open_fds():
+    """Number of open file descriptors, None where /proc isn't available"""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def child_processes(name="ffmpeg"):
+    """
+    Running child processes of this process with a given command name
+
+    Returns:
+        list: PIDs, empty where /proc isn't available
+    """
+    pids = []
+    parent = os.getpid()
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return pids
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # pid (comm) state ppid ...
+        comm = stat[stat.find("(") + 1:stat.rfind(")")]
+        fields = stat[stat.rfind(")") + 2:].split()
+        if comm == name and fields and int(fields[1]) == parent:
+            pids.append(int(entry))
+    return pids
+
+
+def format_size(size):
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{sign}{size:.0f} {unit}"
+        size /= 1024
+    return f"{sign}{size:.1f} GB"
+
+
+def format_report(report):
+    """Plain text version of a debug report"""
+    lines = []
+    rss = report.get('rss')
+    lines.append(f"RSS: {format_size(rss) if rss is not None else 'n/a'}")
+    lines.append(f"Open fds: {report.get('open_fds', 'n/a')}")
+    lines.append(f"ffmpeg children: {len(report.get('ffmpeg', []))}")
+
+    tasks = report.get('tasks', [])
+    lines.append(f"\nTasks: {sum(count for _, count in tasks)}")
+    for name, count in tasks[:15]:
+        lines.append(f"  {count} x {name}")
+
+    lines.append("\nState sizes:")
+    for name, size in report.get('state', {}).items():
+        lines.append(f"  {name}: {size}")
+
+    scheduler = report.get('scheduler')
+    if scheduler:
+        lines.append("\nMedia jobs:")
+        for name, stats in scheduler.items():
+            lines.append(
+                f"  {name}: {stats['jobs']} jobs, {stats['waiting']} waiting, "
+                f"avg wait {stats['avg_wait']:.2f}s, max {stats['max_wait']:.2f}s"
+            )
+
+    holds = report.get('idle_holds')
+    if holds:
+        lines.append("\nIdle holds:")
+        for outcome, stats in holds.items():
+            lines.append(f"  {outcome}: {stats['count']}, avg {stats['avg_seconds']:.1f}s held")
+
+    recovery = report.get('call_recovery')
+    if recovery and (recovery['recovered'] or recovery['failed']):
+        lines.append(
+            f"\nCall recovery: {recovery['recovered']} recovered, {recovery['failed']} failed, "
+            f"avg {recovery['avg_seconds']:.1f}s, max {recovery['max_seconds']:.1f}s"
+        )
+
+    cards = report.get('cards')
+    if cards:
+        lines.append(
+            f"\nNow-playing cards: {cards['static_renders']} tracks rendered, avg {cards['static_avg_ms']:.1f} ms; "
+            f"{cards['refreshes']} refreshes, avg {cards['refresh_avg_ms']:.1f} ms, max {cards['refresh_max_ms']:.1f} ms"
+        )
+
+    admission = report.get('admission')
+    if admission:
+        lines.append(
+            f"\nCall slots: {admission['active']}/{admission['max_calls'] or 'unlimited'} used, {admission['waiting']} waiting; "
+            f"{admission['queued']} queued, {admission['timed_out']} timed out, {admission['reclaimed']} reclaimed, "
+            f"avg wait {admission['avg_wait']:.1f}s, max {admission['max_wait']:.1f}s"
+        )
+
+    limits = report.get('rate_limits')
+    if limits and limits['rejected']:
+        lines.append("\nRate limited: " + ", ".join(f"{name} {count}" for name, count in limits['rejected'].items()))
+
+    lag = report.get('lag')
+    if lag:
+        lines.append(
+            f"\nLoop lag: avg {lag['avg_ms']:.1f} ms, p50 {lag['p50_ms']} ms, "
+            f"p99 {lag['p99_ms']} ms, max {lag['max_ms']:.0f} ms over {lag['samples']} samples"
+        )
+        lines.append("  " + ", ".join(f"{bound}: {count}" for bound, count in lag['histogram'].items() if count))
+        if lag['events']:
+            event = lag['events'][-1]
+            lines.append(
+                f"  {len(lag['events'])} blocking event(s), last blocked "
+                f"{event['blocked'] * 1000:.0f} ms in {event['location']}"
+            )
+
+    lines.append(f"\nTracemalloc: {'on' if report.get('tracing') else 'off'}")
+    for title, key in (("Top allocations", 'allocations'), ("Growth since last diff", 'diff')):
+        entries = report.get(key)
+        if entries:
+            lines.append(f"{title}:")
+            for site, size, count in entries:
+                lines.append(f"  {format_size(size)} ({count:+d} blocks) {site}" if key == 'diff'
+                             else f"  {format_size(size)} ({count} blocks) {site}")
+    return "\n".join(lines)
@@ -0,0 +1,122 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+
+from spotify_bot.config import Config
+
+# Upper bounds of the lag histogram buckets in milliseconds, the last bucket is unbounded
+LAG_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LagMonitor:
+    """
+    Measures how late the event loop runs scheduled callbacks.
+
+    A heartbeat coroutine sleeps LAG_INTERVAL seconds at a time and records
+    how much later than that it woke up. A watchdog thread notices when the
+    heartbeat hasn't run for LAG_THRESHOLD_MS and captures the stack of the
+    loop thread while it's still blocked, so the blocking call shows up in
+    the recorded event instead of whatever runs after it.
+    """
+
+    def __init__(self, interval=None, threshold=None, max_events=None):
+        self.interval = interval or Config.LAG_INTERVAL
+        self.threshold = (threshold or Config.LAG_THRESHOLD_MS) / 1000
+        self.buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.events = deque(maxlen=max_events or Config.LAG_EVENTS)
+
+        self.last_beat = None
+        self.loop_thread_id = None
+        self.captured_beat = None  # the beat the current stall was captured for
+        self.running = False
+        self.task = None
+        self.thread = None
+
+    def start(self):
+        """Start the heartbeat and the watchdog, call from the event loop"""
+        if self.running:
+            return
+        self.running = True
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.task = asyncio.create_task(self._heartbeat())
+        self.thread = threading.Thread(target=self._watchdog, name="lag-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    async def _heartbeat(self):
+        while self.running:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.last_beat = now
+            self.record(max(now - expected, 0.0))
+
+    def record(self, lag):
+        """Add a lag sample in seconds to the histogram"""
+        lag_ms = lag * 1000
+        index = len(LAG_BUCKETS_MS)
+        for i, bound in enumerate(LAG_BUCKETS_MS):
+            if lag_ms <= bound:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.samples += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+
+    def _watchdog(self):
+        while self.running:
+            time.sleep(self.threshold / 2)
+            beat = self.last_beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or self.captured_beat == beat:
+                continue
+
+            # Still blocked, the loop thread's frame is the offending code
+            self.captured_beat = beat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = traceback.extract_stack(frame) if frame else []
+            location = f"{stack[-1].filename}:{stack[-1].lineno} ({stack[-1].name})" if stack else "unknown"
+            self.events.append({
+                'at': time.time(),
+                'blocked': blocked,
+                'location': location,
+                'stack': "".join(stack.format()) if stack else "",
+            })
+            print(f"Event loop blocked for {blocked * 1000:.0f} ms in {location}")
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding a percentile of the samples, in ms"""
+        if not self.samples:
+            return 0.0
+        wanted = fraction * self.samples
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return LAG_BUCKETS_MS[i] if i < len(LAG_BUCKETS_MS) else float('inf')
+        return float('inf')
+
+    def stats(self):
+        """Lag histogram and the recent blocking events"""
+        bounds = [f"<={bound}ms" for bound in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]}ms"]
+        return {
+            'samples': self.samples,
+            'avg_ms': self.total / self.samples * 1000 if self.samples else 0.0,
+            'max_ms': self.max * 1000,
+            'p50_ms': self.percentile(0.5),
+            'p99_ms': self.percentile(0.99),
+            'histogram': dict(zip(bounds, self.buckets)),
+            'events': list(self.events),
+        }
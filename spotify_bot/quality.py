@@ -0,0 +1,88 @@
+import os
+import time
+
+from spotify_bot.config import Config
+
+
+def parse_tiers(spec):
+    """Parse "48000:2,48000:1" into [(48000, 2), (48000, 1)], best quality first"""
+    tiers = []
+    for tier in spec.split(","):
+        rate, _, channels = tier.strip().partition(":")
+        tiers.append((int(rate), int(channels or 1)))
+    return tiers
+
+
+def cpu_load():
+    """System load per CPU over the last minute, None where it can't be measured"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+class QualityController:
+    """
+    Picks the audio quality tier of new streams.
+
+    Steps one tier down when the CPU load or the number of active calls is
+    over its high mark and one tier up when both are back under the low marks.
+    Steps are at least QUALITY_COOLDOWN seconds apart so the tier doesn't flap.
+    Also keeps a rough CPU per active call, the load average split over the
+    calls, for every tier that was in use. benchmark_quality.py measures the
+    CPU time of the ffmpeg pipelines per tier.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = tiers or parse_tiers(Config.QUALITY_TIERS)
+        self.level = 0
+        self.load = None
+        self.last_step = 0
+        self.cpu_per_call = {}  # tier index -> [samples, total CPU per call]
+
+    @property
+    def tier(self):
+        return self.tiers[self.level]
+
+    def sample(self, active_calls):
+        """Measure the CPU load, called periodically"""
+        self.load = cpu_load()
+        if self.load is not None and active_calls:
+            stats = self.cpu_per_call.setdefault(self.level, [0, 0.0])
+            stats[0] += 1
+            stats[1] += self.load * (os.cpu_count() or 1) / active_calls
+
+    def select(self, active_calls):
+        """
+        Choose the tier for a new stream
+
+        Returns:
+            tuple: Sample rate and channel count
+        """
+        now = time.time()
+        if now - self.last_step < Config.QUALITY_COOLDOWN:
+            return self.tier
+
+        load = self.load if self.load is not None else 0
+        under_pressure = load >= Config.QUALITY_CPU_HIGH or active_calls >= Config.QUALITY_CALLS_HIGH
+        relaxed = load <= Config.QUALITY_CPU_LOW and active_calls <= Config.QUALITY_CALLS_LOW
+
+        if under_pressure and self.level < len(self.tiers) - 1:
+            self.level += 1
+        elif relaxed and self.level > 0:
+            self.level -= 1
+        else:
+            return self.tier
+
+        self.last_step = now
+        rate, channels = self.tier
+        print(f"Audio quality tier changed to {rate} Hz, {channels} channel(s) (load {load:.2f}, {active_calls} calls)")
+        return self.tier
+
+    def stats(self):
+        """Average CPU cores used per active call, by tier"""
+        return {
+            self.tiers[level]: total / samples
+            for level, (samples, total) in self.cpu_per_call.items()
+            if samples
+        }
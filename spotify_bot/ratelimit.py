@@ -0,0 +1,148 @@
+import time
+from collections import Counter
+
+from spotify_bot.config import Config
+
+# Command to the class it's limited under, commands not listed aren't limited
+COMMAND_CLASSES = {
+    'play': 'play',
+    'seek': 'seek',
+    'pause': 'control',
+    'resume': 'control',
+    'skip': 'control',
+    'stop': 'control',
+    'refresh': 'control',
+    'queue': 'control',
+    'broadcast': 'broadcast',
+    'subscribe': 'broadcast',
+    'unsubscribe': 'broadcast',
+}
+
+SCOPES = ('user', 'chat')
+
+
+def parse_limits(spec):
+    """
+    Parse limits like "play:3/30,seek:5/30" into {'play': (3, 30.0), ...}
+
+    Each entry allows a burst of that many requests, refilled evenly over
+    the given number of seconds.
+    """
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        name, _, rate = entry.partition(":")
+        burst, _, period = rate.partition("/")
+        limits[name.strip()] = (int(burst), float(period))
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, capacity):
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, capacity, period, now):
+        """Take a token, returns 0 on success or the seconds until one is available"""
+        refill = capacity / period
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * refill)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / refill
+
+
+class RateLimiter:
+    """
+    Token bucket limits per user and per chat for each command class.
+
+    A request has to get a token from both its user's and its chat's bucket,
+    so one user can't flood a chat and a busy chat can't starve the node.
+    Checking is a few dict lookups, it runs before any search, download or
+    API call. Limits can be changed at runtime with set_limit.
+    """
+
+    def __init__(self, user_limits=None, chat_limits=None, max_buckets=10000):
+        self.limits = {
+            'user': parse_limits(user_limits if user_limits is not None else Config.RATE_LIMIT_USER),
+            'chat': parse_limits(chat_limits if chat_limits is not None else Config.RATE_LIMIT_CHAT),
+        }
+        self.max_buckets = max_buckets
+        self.buckets = {}  # (scope, ID, class) -> TokenBucket
+        self.allowed = Counter()  # class -> allowed requests
+        self.rejected = Counter()  # (class, scope) -> rejected requests
+        self.notices = {}  # (user ID, class) -> when the user was last told to slow down
+
+    def set_limit(self, scope, command_class, burst, period):
+        """Change a limit, a burst of 0 removes it"""
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope {scope}, expected one of {', '.join(SCOPES)}")
+        if burst <= 0:
+            self.limits[scope].pop(command_class, None)
+        else:
+            if period <= 0:
+                raise ValueError("The period has to be positive")
+            self.limits[scope][command_class] = (int(burst), float(period))
+        # Buckets refill against the limit in force when they're checked, dropping them resets the bursts
+        for key in [key for key in self.buckets if key[0] == scope and key[2] == command_class]:
+            del self.buckets[key]
+
+    def check(self, command_class, user_id, chat_id):
+        """
+        Take a token for a request from the user's and the chat's bucket
+
+        Returns:
+            tuple: (None, 0) when allowed, otherwise the scope that rejected it and seconds to wait
+        """
+        now = time.monotonic()
+        taken = []
+        for scope, key_id in (('user', user_id), ('chat', chat_id)):
+            limit = self.limits[scope].get(command_class)
+            if not limit or key_id is None:
+                continue
+            key = (scope, key_id, command_class)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_buckets:
+                    self.prune(now)
+                bucket = self.buckets[key] = TokenBucket(limit[0])
+            wait = bucket.take(limit[0], limit[1], now)
+            if wait:
+                # A rejected request doesn't count against the other scope
+                for other in taken:
+                    other.tokens += 1
+                self.rejected[(command_class, scope)] += 1
+                return scope, wait
+            taken.append(bucket)
+        self.allowed[command_class] += 1
+        return None, 0
+
+    def should_notify(self, user_id, command_class, wait):
+        """Whether to tell a user about a rejection, once per wait so rejections stay cheap"""
+        key = (user_id, command_class)
+        now = time.monotonic()
+        if now < self.notices.get(key, 0):
+            return False
+        self.notices[key] = now + wait
+        return True
+
+    def prune(self, now=None):
+        """Drop buckets that have refilled completely, they're the same as new ones"""
+        now = now or time.monotonic()
+        for key, bucket in list(self.buckets.items()):
+            limit = self.limits[key[0]].get(key[2])
+            if not limit or bucket.tokens + (now - bucket.updated) * limit[0] / limit[1] >= limit[0]:
+                del self.buckets[key]
+        self.notices = {key: until for key, until in self.notices.items() if until > now}
+
+    def stats(self):
+        return {
+            'limits': {scope: dict(limits) for scope, limits in self.limits.items()},
+            'allowed': dict(self.allowed),
+            'rejected': {f"{command_class}/{scope}": count for (command_class, scope), count in self.rejected.items()},
+            'buckets': len(self.buckets),
+        }
@@ -0,0 +1,107 @@
+import re
+import time
+from urllib.parse import urlparse, parse_qs
+
+from spotify_bot.config import Config
+
+YOUTUBE_ID_REGEX = re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([a-zA-Z0-9_-]+)')
+
+
+def video_id_from_url(url):
+    """YouTube video ID of a watch URL, None for anything else"""
+    match = YOUTUBE_ID_REGEX.search(url or "")
+    return match.group(1) if match else None
+
+
+def url_expiry(media_url):
+    """
+    Expiry time embedded in a signed media URL
+
+    Returns:
+        int: Unix timestamp, or None if the URL doesn't carry one
+    """
+    if not media_url:
+        return None
+
+    expire = parse_qs(urlparse(media_url).query).get('expire')
+    if expire and expire[0].isdigit():
+        return int(expire[0])
+
+    # Manifest URLs carry it as a path segment: /expire/<timestamp>/
+    match = re.search(r'/expire/(\d+)', media_url)
+    return int(match.group(1)) if match else None
+
+
+class MediaUrlCache:
+    """
+    Resolved direct media URLs and format metadata by video ID.
+
+    Entries live until the expiry signed into the media URL, minus a safety
+    margin so a download never starts on a URL that is about to expire.
+    """
+
+    def __init__(self, margin=None, default_ttl=None):
+        self.margin = margin if margin is not None else Config.MEDIA_URL_MARGIN
+        self.default_ttl = default_ttl if default_ttl is not None else Config.MEDIA_URL_DEFAULT_TTL
+        self.entries = {}  # video ID -> (expires at, info)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, video_id):
+        """
+        Still valid resolved info of a video
+
+        Returns:
+            dict: yt-dlp info of the selected format, or None
+        """
+        entry = self.entries.get(video_id)
+        if entry and time.time() < entry[0] - self.margin:
+            self.hits += 1
+            return entry[1]
+
+        if entry:
+            del self.entries[video_id]
+        self.misses += 1
+        return None
+
+    def put(self, video_id, info):
+        """Store the resolved info of a video, only if it has a direct media URL"""
+        if not video_id or not info or not info.get('url'):
+            return
+        expires_at = url_expiry(info['url']) or time.time() + self.default_ttl
+        self.entries[video_id] = (expires_at, info)
+        self.prune()
+
+    def invalidate(self, video_id):
+        self.entries.pop(video_id, None)
+
+    def prune(self):
+        """Drop expired entries"""
+        now = time.time()
+        for video_id in [video_id for video_id, (expires_at, _) in self.entries.items() if expires_at - self.margin <= now]:
+            del self.entries[video_id]
+
+
+class SearchCache:
+    """Search results by normalized query, kept for SEARCH_CACHE_TTL seconds"""
+
+    def __init__(self, ttl=None, max_entries=1000):
+        self.ttl = ttl if ttl is not None else Config.SEARCH_CACHE_TTL
+        self.max_entries = max_entries
+        self.entries = {}  # query -> (expires at, results)
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(query.lower().split())
+
+    def get(self, query):
+        entry = self.entries.get(self.normalize(query))
+        if entry and time.time() < entry[0]:
+            return entry[1]
+        return None
+
+    def put(self, query, results):
+        if len(self.entries) >= self.max_entries:
+            # Drop the entry closest to expiry
+            del self.entries[min(self.entries, key=lambda key: self.entries[key][0])]
+        self.entries[self.normalize(query)] = (time.time() + self.ttl, results)
@@ -0,0 +1,167 @@
+import time
+import heapq
+import shutil
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+# Priority classes, lower runs first
+NOW_PLAYING = 0
+SEEK = 1
+BACKGROUND = 2
+
+CLASS_NAMES = {
+    NOW_PLAYING: 'now_playing',
+    SEEK: 'seek',
+    BACKGROUND: 'background',
+}
+
+# Background subprocesses run at a lower OS priority where nice is available
+_NICE = shutil.which('nice')
+
+
+def background_command(command):
+    """Prefix a subprocess command so it yields the CPU to foreground work"""
+    if _NICE:
+        return [_NICE, '-n', '10', *command]
+    return list(command)
+
+
+class JobTicket:
+    """
+    Priority class of a piece of work that may span several jobs.
+
+    Work started for one caller can be raised to the class of a more urgent
+    caller that joins it later, see MediaScheduler.boost.
+    """
+
+    __slots__ = ('priority', 'entry', 'resource')
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.entry = None  # heap entry while waiting for a slot
+        self.resource = None
+
+
+class MediaScheduler:
+    """
+    Orders media jobs (downloads, ffmpeg work) by priority class.
+
+    Every job takes a slot from a budget: 'cpu' for decoding and encoding,
+    'net' for downloads. Waiting jobs are admitted by class first and arrival
+    second. Background jobs never take the last free slot of a budget, so a job
+    a user is waiting on doesn't queue behind a full set of background work.
+
+    A job can be given a JobTicket instead of a priority class, raising the
+    ticket's priority then also applies to a job that is queued already.
+    """
+
+    def __init__(self, budgets):
+        self.budgets = budgets  # resource -> number of concurrent jobs
+        self.running = {resource: 0 for resource in budgets}
+        self.waiters = {resource: [] for resource in budgets}  # heaps of (priority, seq, future)
+        self.seq = itertools.count()
+        self.wait_stats = {priority: {'count': 0, 'total': 0.0, 'max': 0.0} for priority in CLASS_NAMES}
+
+    @asynccontextmanager
+    async def job(self, priority, resource='cpu'):
+        """Run the body as a job of a priority class, or of a JobTicket's class, once a slot is free"""
+        ticket = priority if isinstance(priority, JobTicket) else JobTicket(priority)
+        queued = time.perf_counter()
+        await self._acquire(ticket, resource)
+
+        priority = ticket.priority
+        waited = time.perf_counter() - queued
+        stats = self.wait_stats[priority]
+        stats['count'] += 1
+        stats['total'] += waited
+        stats['max'] = max(stats['max'], waited)
+        if waited > 1:
+            print(f"{CLASS_NAMES[priority]} {resource} job waited {waited:.1f}s for a slot")
+
+        try:
+            yield
+        finally:
+            self._release(resource)
+
+    def _can_start(self, priority, resource):
+        limit = self.budgets[resource]
+        if priority == BACKGROUND:
+            # Keep a slot free for user-facing jobs
+            limit = max(limit - 1, 1)
+        return self.running[resource] < limit
+
+    async def _acquire(self, ticket, resource):
+        waiters = self.waiters[resource]
+        if not waiters and self._can_start(ticket.priority, resource):
+            self.running[resource] += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        # Entries are lists so boost can change the priority of a queued job
+        ticket.entry = [ticket.priority, next(self.seq), future]
+        ticket.resource = resource
+        heapq.heappush(waiters, ticket.entry)
+        # Entries left by cancelled waiters may be all that's queued
+        self._wake(resource)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Admitted just before being cancelled, give the slot back
+            if future.done() and not future.cancelled():
+                self._release(resource)
+            raise
+        finally:
+            ticket.entry = None
+
+    def boost(self, ticket, priority):
+        """
+        Raise the priority class of a ticket's work
+
+        A queued job moves up the line right away, later jobs of the ticket
+        are queued in the new class. Lowering the class is ignored.
+        """
+        if priority >= ticket.priority:
+            return
+        ticket.priority = priority
+        entry = ticket.entry
+        if entry is not None and not entry[2].done():
+            entry[0] = priority
+            heapq.heapify(self.waiters[ticket.resource])
+            self._wake(ticket.resource)
+
+    def _release(self, resource):
+        self.running[resource] -= 1
+        self._wake(resource)
+
+    def _wake(self, resource):
+        waiters = self.waiters[resource]
+        while waiters:
+            priority, _, future = waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(waiters)
+                continue
+            if not self._can_start(priority, resource):
+                break
+            heapq.heappop(waiters)
+            self.running[resource] += 1
+            future.set_result(None)
+
+    def stats(self):
+        """Queue wait times and waiting jobs by priority class"""
+        waiting = {priority: 0 for priority in CLASS_NAMES}
+        for waiters in self.waiters.values():
+            for priority, _, future in waiters:
+                if not future.done():
+                    waiting[priority] += 1
+
+        return {
+            CLASS_NAMES[priority]: {
+                'jobs': stats['count'],
+                'avg_wait': stats['total'] / stats['count'] if stats['count'] else 0.0,
+                'max_wait': stats['max'],
+                'waiting': waiting[priority],
+            }
+            for priority, stats in self.wait_stats.items()
+        }
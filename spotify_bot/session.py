@@ -0,0 +1,56 @@
+import os
+import json
+import time
+
+
+class SessionStore:
+    """
+    Local store for per-chat playback snapshots.
+
+    The whole state is kept in a single JSON file that is replaced atomically,
+    so a crash in the middle of a write never leaves a truncated snapshot.
+    Both methods do blocking file I/O and are meant to run in a worker thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, chats):
+        """
+        Write a snapshot of every chat
+
+        Args:
+            chats: Dictionary of chat ID -> playback state
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        snapshot = {
+            'saved_at': time.time(),
+            'chats': {str(chat_id): state for chat_id, state in chats.items()},
+        }
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """
+        Read the last snapshot
+
+        Returns:
+            dict: Chat ID -> playback state, empty if there is no usable snapshot
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading session snapshot: {str(e)}")
+            return {}
+
+        return {int(chat_id): state for chat_id, state in snapshot.get('chats', {}).items()}
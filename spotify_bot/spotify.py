@@ -0,0 +1,272 @@
+import os
+import re
+import time
+import asyncio
+import sqlite3
+import aiohttp
+
+from spotify_bot.config import Config
+from spotify_bot.track_index import tokenize, NOISE_WORDS
+
+SPOTIFY_URL_REGEX = re.compile(
+    r'(?:https?://open\.spotify\.com/(?:intl-[a-z]+/)?(track|album|playlist)/|spotify:(track|album|playlist):)([A-Za-z0-9]{22})'
+)
+
+API_URL = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+# Words that mark a different rendition than the studio track, unless the Spotify title has them too
+VARIANT_WORDS = {
+    'live', 'cover', 'karaoke', 'instrumental', 'remix', 'acoustic', 'nightcore',
+    'slowed', 'reverb', 'sped', '8d', 'bass', 'boosted', 'reaction', 'tutorial',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spotify_map (
+    spotify_id TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    title TEXT,
+    duration INTEGER,
+    score REAL,
+    matched_at REAL
+);
+"""
+
+
+class SpotifyError(Exception):
+    pass
+
+
+def parse_spotify_url(url):
+    """
+    Kind and ID of a Spotify track, album or playlist link
+
+    Returns:
+        tuple: ('track' | 'album' | 'playlist', Spotify ID), or None for anything else
+    """
+    match = SPOTIFY_URL_REGEX.search(url or "")
+    if not match:
+        return None
+    return match.group(1) or match.group(2), match.group(3)
+
+
+def track_from_api(item):
+    """Title, artists and duration of a track object of the Web API"""
+    return {
+        'spotify_id': item['id'],
+        'title': item['name'],
+        'artists': [artist['name'] for artist in item.get('artists', [])],
+        'duration': round(item.get('duration_ms', 0) / 1000) or None,
+    }
+
+
+async def http_json(method, url, headers=None, params=None, data=None, auth=None):
+    """Default transport of SpotifyClient"""
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.request(method, url, headers=headers, params=params, data=data, auth=auth) as response:
+            if response.status != 200:
+                raise SpotifyError(f"Spotify API returned HTTP {response.status} for {url}")
+            return await response.json()
+
+
+class SpotifyClient:
+    """
+    Minimal Spotify Web API client using the client credentials flow.
+
+    fetch is the transport, an async callable taking (method, url, headers=,
+    params=, data=, auth=) and returning the decoded JSON. Tests can pass one
+    that serves recorded responses.
+    """
+
+    def __init__(self, client_id=None, client_secret=None, fetch=None):
+        self.client_id = client_id or Config.SPOTIFY_CLIENT_ID
+        self.client_secret = client_secret or Config.SPOTIFY_CLIENT_SECRET
+        self.fetch = fetch or http_json
+        self.token = None
+        self.token_expires = 0
+
+    @property
+    def configured(self):
+        return bool(self.client_id and self.client_secret)
+
+    async def _token(self):
+        if self.token and time.time() < self.token_expires - 60:
+            return self.token
+        if not self.configured:
+            raise SpotifyError("Spotify credentials aren't configured")
+        response = await self.fetch(
+            "POST", TOKEN_URL,
+            data={'grant_type': 'client_credentials'},
+            auth=aiohttp.BasicAuth(self.client_id, self.client_secret)
+        )
+        self.token = response['access_token']
+        self.token_expires = time.time() + response.get('expires_in', 3600)
+        return self.token
+
+    async def get(self, url, params=None):
+        if not url.startswith("http"):
+            url = f"{API_URL}{url}"
+        headers = {'Authorization': f"Bearer {await self._token()}"}
+        return await self.fetch("GET", url, headers=headers, params=params)
+
+    async def _paged(self, url, params, limit):
+        """Items of a paged endpoint, following next links up to limit items"""
+        items = []
+        page = await self.get(url, params)
+        while True:
+            items += page.get('items', [])
+            if len(items) >= limit or not page.get('next'):
+                return items[:limit]
+            page = await self.get(page['next'])
+
+    async def track(self, spotify_id):
+        return track_from_api(await self.get(f"/tracks/{spotify_id}"))
+
+    async def album_tracks(self, spotify_id, limit=None):
+        items = await self._paged(f"/albums/{spotify_id}/tracks", {'limit': 50}, limit or Config.SPOTIFY_MAX_TRACKS)
+        return [track_from_api(item) for item in items if item.get('id')]
+
+    async def playlist_tracks(self, spotify_id, limit=None):
+        items = await self._paged(
+            f"/playlists/{spotify_id}/tracks",
+            {'limit': 100, 'fields': 'items(track(id,name,duration_ms,artists(name))),next'},
+            limit or Config.SPOTIFY_MAX_TRACKS
+        )
+        # Local files and removed tracks have no track object or ID
+        return [track_from_api(item['track']) for item in items if item.get('track') and item['track'].get('id')]
+
+    async def tracks(self, kind, spotify_id):
+        """Tracks behind a parsed Spotify link, in order"""
+        if kind == 'track':
+            return [await self.track(spotify_id)]
+        if kind == 'album':
+            return await self.album_tracks(spotify_id)
+        return await self.playlist_tracks(spotify_id)
+
+
+def score_candidate(track, candidate):
+    """
+    How likely a video is the given Spotify track, from 0 to 1
+
+    Half of the score is the share of title words found in the video title,
+    a fifth is whether an artist appears in the title or channel and the rest
+    is how close the durations are: full marks within 3 seconds, nothing from
+    30 seconds off. Covers, live versions, remixes and the like are penalized
+    unless the Spotify title says so too.
+    """
+    title_tokens = set(tokenize(track['title'])) - NOISE_WORDS
+    video_tokens = set(tokenize(candidate['title']))
+    channel_tokens = set(tokenize(candidate.get('channel')))
+
+    title_score = len(title_tokens & video_tokens) / len(title_tokens) if title_tokens else 0.0
+
+    artist_score = 0.0
+    for artist in track['artists']:
+        artist_tokens = set(tokenize(artist))
+        if artist_tokens and artist_tokens <= (video_tokens | channel_tokens):
+            artist_score = 1.0
+            break
+
+    if track.get('duration') and candidate.get('duration'):
+        difference = abs(track['duration'] - candidate['duration'])
+        duration_score = 1.0 if difference <= 3 else max(0.0, 1 - (difference - 3) / 27)
+    else:
+        # Unknown durations neither help nor rule a video out
+        duration_score = 0.5
+
+    score = 0.5 * title_score + 0.2 * artist_score + 0.3 * duration_score
+
+    variants = (video_tokens & VARIANT_WORDS) - set(tokenize(track['title']))
+    if variants:
+        score -= 0.3
+    return max(score, 0.0)
+
+
+class SpotifyMap:
+    """Persistent Spotify track ID to YouTube video ID matches"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def get(self, spotify_id):
+        row = self.db.execute(
+            "SELECT video_id, title, duration, score FROM spotify_map WHERE spotify_id = ?",
+            (spotify_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def put(self, spotify_id, video_id, title, duration, score):
+        with self.db:
+            self.db.execute(
+                """
+                INSERT OR REPLACE INTO spotify_map (spotify_id, video_id, title, duration, score, matched_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (spotify_id, video_id, title, duration, score, time.time())
+            )
+
+
+class SpotifyMatcher:
+    """
+    Matches Spotify tracks to YouTube videos.
+
+    search is the search backend, an async callable taking a query and
+    returning candidate dicts with video_id, title, channel and duration in
+    seconds, so a local stand-in can replace YouTube in tests. Matches above
+    SPOTIFY_MIN_SCORE are stored in the map and never searched again.
+    """
+
+    def __init__(self, spotify_map, search, concurrency=None, min_score=None):
+        self.map = spotify_map
+        self.search = search
+        self.concurrency = concurrency or Config.SPOTIFY_MATCH_CONCURRENCY
+        self.min_score = min_score if min_score is not None else Config.SPOTIFY_MIN_SCORE
+        self.hits = 0
+        self.searches = 0
+
+    async def match(self, track):
+        """
+        YouTube video of a Spotify track
+
+        Returns:
+            dict: video_id, title, duration and score, or None if nothing scored high enough
+        """
+        known = self.map.get(track['spotify_id'])
+        if known:
+            self.hits += 1
+            return known
+
+        self.searches += 1
+        query = " ".join(track['artists'][:1] + [track['title']])
+        candidates = await self.search(query)
+        if not candidates:
+            return None
+
+        best = max(candidates, key=lambda candidate: score_candidate(track, candidate))
+        score = score_candidate(track, best)
+        if score < self.min_score:
+            print(f"No good match for '{query}' (best {best['title']} scored {score:.2f})")
+            return None
+
+        self.map.put(track['spotify_id'], best['video_id'], best['title'], best.get('duration'), score)
+        return {'video_id': best['video_id'], 'title': best['title'], 'duration': best.get('duration'), 'score': score}
+
+    async def match_many(self, tracks):
+        """Match tracks concurrently, at most concurrency searches at a time, results in order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def match_one(track):
+            async with semaphore:
+                try:
+                    return await self.match(track)
+                except Exception as e:
+                    print(f"Error matching '{track['title']}': {str(e)}")
+                    return None
+
+        return await asyncio.gather(*[match_one(track) for track in tracks])
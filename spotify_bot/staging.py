@@ -0,0 +1,109 @@
+import os
+import asyncio
+
+from spotify_bot.scheduler import background_command
+
+# Size of the chunks read from the continuation decoder
+CHUNK_SIZE = 64 * 1024
+
+
+def decode_parameters(start=0, end=None, gain=0):
+    """ffmpeg input/filter options for decoding a track with its analysis applied"""
+    before_input = []
+    after_input = []
+    if start > 0:
+        before_input += ['-ss', f"{start:.2f}"]
+    if end is not None:
+        before_input += ['-to', f"{end:.2f}"]
+    if gain:
+        after_input += ['-af', f"volume={gain:.2f}dB"]
+    return before_input, after_input
+
+
+def pcm_parameters(rate, channels):
+    """ffmpeg output options for raw PCM in the format the call consumes"""
+    return ['-f', 's16le', '-ac', str(channels), '-ar', str(rate)]
+
+
+async def decode_head(audio_file, raw_file, seconds, rate, channels, start=0, end=None, gain=0):
+    """
+    Decode the first seconds of a track to a raw PCM file
+
+    Args:
+        audio_file: Cached audio of the track
+        raw_file: Raw PCM output
+        seconds: How much audio to decode
+        rate: Sample rate of the call
+        channels: Channel count of the call
+        start: Position in the track to start at (leading silence trim)
+        end: Position in the track to stop at (trailing silence trim)
+        gain: Volume change in dB
+
+    Returns:
+        bool: Whether the head was decoded
+    """
+    before_input, after_input = decode_parameters(start, end, gain)
+    process = await asyncio.create_subprocess_exec(
+        *background_command([
+            'ffmpeg', '-v', 'error', '-y',
+            *before_input,
+            '-i', audio_file,
+            '-t', str(seconds),
+            *after_input,
+            *pcm_parameters(rate, channels),
+            raw_file,
+        ]),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    _, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        print(f"Error decoding head of {audio_file}: {stderr.decode()[-200:]}")
+        return False
+    return True
+
+
+async def continue_decode(audio_file, raw_file, rate, channels, start=0, end=None, gain=0):
+    """
+    Decode the rest of a track after its staged head, appending to the raw file
+
+    The call is already reading the raw file while this runs, decoding is much
+    faster than real time so the writer stays ahead of the reader.
+
+    Args:
+        start: Position in the track where the staged head ends
+    """
+    before_input, after_input = decode_parameters(start, end, gain)
+    process = await asyncio.create_subprocess_exec(
+        'ffmpeg', '-v', 'error',
+        *before_input,
+        '-i', audio_file,
+        *after_input,
+        *pcm_parameters(rate, channels),
+        'pipe:1',
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+
+    try:
+        with open(raw_file, "ab") as f:
+            while True:
+                chunk = await process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                f.flush()
+        await process.wait()
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+
+
+def remove_raw_file(raw_file):
+    if raw_file and os.path.exists(raw_file):
+        try:
+            os.remove(raw_file)
+        except Exception as e:
+            print(f"Error deleting staged file {raw_file}: {str(e)}")
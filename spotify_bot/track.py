@@ -0,0 +1,83 @@
+import sys
+
+from spotify_bot.helpers import format_duration, parse_duration
+
+_intern = sys.intern
+
+
+def _interned(value):
+    return _intern(value) if isinstance(value, str) else value
+
+
+class Track:
+    """
+    A resolved track as kept in queues and as the current track of a chat.
+
+    Built once when a query is resolved. Duration is whole seconds (None
+    when unknown or live) and the strings are interned, so the same track
+    queued in several chats shares its strings. The cache files the bot
+    plays instead of the original audio, after a seek or a restore, live in
+    their own fields rather than being mixed into the metadata.
+
+    Tracks still read like the dicts they replaced, track['title'] and
+    track.get('channel') work, so formatting helpers take either.
+    """
+
+    __slots__ = (
+        'video_id', 'title', 'url', 'duration', 'thumbnail', 'channel',
+        # Cache linkage
+        'audio_file', 'original_audio', 'file_hash',
+    )
+
+    FIELDS = __slots__
+
+    def __init__(self, video_id, title, url, duration=None, thumbnail=None, channel=None,
+                 audio_file=None, original_audio=None, file_hash=None):
+        self.video_id = _interned(video_id)
+        self.title = _interned(title)
+        self.url = _interned(url)
+        self.duration = parse_duration(duration) or None
+        self.thumbnail = _interned(thumbnail)
+        self.channel = _interned(channel)
+        self.audio_file = audio_file
+        self.original_audio = original_audio
+        self.file_hash = file_hash
+
+    @classmethod
+    def from_dict(cls, data):
+        """Track from a session snapshot or a legacy track dict, unknown keys are dropped"""
+        return cls(**{field: data.get(field) for field in cls.FIELDS if field in data})
+
+    def to_dict(self):
+        """Plain dict for session snapshots, only set fields are kept"""
+        return {field: getattr(self, field) for field in self.FIELDS if getattr(self, field) is not None}
+
+    @property
+    def duration_text(self):
+        """Duration like "3:45", "Live" when unknown"""
+        return format_duration(self.duration) if self.duration else "Live"
+
+    def set_cached_audio(self, audio_file, original_audio=None, file_hash=None):
+        """Link the file played for this track, e.g. a seeked copy of the original audio"""
+        self.audio_file = audio_file
+        if original_audio is not None:
+            self.original_audio = original_audio
+        if file_hash is not None:
+            self.file_hash = file_hash
+
+    # Read access of the dicts tracks used to be
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        return default if value is None else value
+
+    def __repr__(self):
+        return f"Track({self.video_id!r}, {self.title!r}, {self.duration_text})"
@@ -0,0 +1,141 @@
+import os
+import re
+import time
+import sqlite3
+
+from spotify_bot.config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    channel TEXT,
+    duration TEXT,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_played REAL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, channel, content='tracks', content_rowid='rowid'
+);
+
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts(rowid, title, channel) VALUES (new.rowid, new.title, new.channel);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, channel) VALUES ('delete', old.rowid, old.title, old.channel);
+END;
+
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE OF title, channel ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, channel) VALUES ('delete', old.rowid, old.title, old.channel);
+    INSERT INTO tracks_fts(rowid, title, channel) VALUES (new.rowid, new.title, new.channel);
+END;
+"""
+
+# Words in video titles that users rarely type and that say nothing about the song
+NOISE_WORDS = {
+    'official', 'video', 'music', 'audio', 'lyrics', 'lyric', 'hd', 'hq', '4k',
+    'remastered', 'remaster', 'mv', 'ft', 'feat', 'visualizer', 'version', 'full',
+}
+
+
+def tokenize(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class TrackIndex:
+    """
+    Local full-text index of every track the bot has resolved.
+
+    Lets repeat queries be answered without a network search. Each match gets a
+    confidence: the share of the meaningful title words covered by the query,
+    every query word has to appear in the title or channel to match at all.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def record(self, video_id, title, channel=None, duration=None):
+        """Add a resolved track to the index or count another play of it"""
+        with self.db:
+            self.db.execute(
+                """
+                INSERT INTO tracks (video_id, title, channel, duration, play_count, last_played)
+                VALUES (?, ?, ?, ?, 1, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    title = excluded.title,
+                    channel = COALESCE(excluded.channel, channel),
+                    duration = COALESCE(excluded.duration, duration),
+                    play_count = play_count + 1,
+                    last_played = excluded.last_played
+                """,
+                (video_id, title, channel, duration, time.time())
+            )
+
+    def search(self, query, limit=5):
+        """
+        Find indexed tracks matching a query
+
+        Returns:
+            list: Track dictionaries with a confidence, best match first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # Every token has to match, quoted so user input can't inject FTS syntax
+        match = " ".join(f'"{token}"' for token in tokens)
+        rows = self.db.execute(
+            """
+            SELECT tracks.video_id, tracks.title, tracks.channel, tracks.duration, tracks.play_count
+            FROM tracks_fts JOIN tracks ON tracks.rowid = tracks_fts.rowid
+            WHERE tracks_fts MATCH ?
+            ORDER BY bm25(tracks_fts)
+            LIMIT ?
+            """,
+            (match, limit * 4)
+        ).fetchall()
+
+        query_tokens = set(tokens)
+        results = []
+        for row in rows:
+            title_tokens = set(tokenize(row['title'])) - NOISE_WORDS
+            covered = len(title_tokens & query_tokens)
+            confidence = covered / len(title_tokens) if title_tokens else 0.0
+            results.append({
+                'video_id': row['video_id'],
+                'title': row['title'],
+                'channel': row['channel'],
+                'duration': row['duration'],
+                'play_count': row['play_count'],
+                'confidence': confidence,
+            })
+
+        results.sort(key=lambda result: (result['confidence'], result['play_count']), reverse=True)
+        return results[:limit]
+
+    def lookup(self, query):
+        """
+        Best local match for a query if it is confident enough to skip a remote search
+
+        Returns:
+            dict: The matching track, or None
+        """
+        results = self.search(query, limit=1)
+        if results and results[0]['confidence'] >= Config.LOCAL_MATCH_CONFIDENCE:
+            return results[0]
+        return None
+
+    def popular(self, limit=10):
+        """Most played tracks, for suggestions before anything is typed"""
+        rows = self.db.execute(
+            "SELECT video_id, title, channel, duration, play_count FROM tracks ORDER BY play_count DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
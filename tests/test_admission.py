@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from spotify_bot.admission import CallAdmission
+
+
+def test_released_slot_goes_to_first_waiter():
+    async def scenario():
+        admission = CallAdmission(max_calls=1, timeout=5)
+        assert await admission.acquire(1)
+
+        positions = []
+        waiter = asyncio.create_task(admission.acquire(2, notify=positions.append))
+        await asyncio.sleep(0)
+        assert admission.position(2) == 1
+
+        admission.release(1)
+        assert await waiter
+        assert admission.admitted == {2}
+        assert positions == [1]
+
+    asyncio.run(scenario())
+
+
+def test_waiter_times_out():
+    async def scenario():
+        admission = CallAdmission(max_calls=1, timeout=0.05)
+        assert await admission.acquire(1)
+        assert not await admission.acquire(2)
+        assert not admission.waiting
+        assert admission.report()['timed_out'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gets_no_slot():
+    async def scenario():
+        admission = CallAdmission(max_calls=1, timeout=5)
+        assert await admission.acquire(1)
+        cancelled = asyncio.create_task(admission.acquire(2))
+        waiter = asyncio.create_task(admission.acquire(3))
+        await asyncio.sleep(0)
+        assert admission.position(3) == 2
+
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert admission.position(2) is None
+        assert admission.position(3) == 1
+
+        admission.release(1)
+        assert await waiter
+        assert admission.admitted == {3}
+
+    asyncio.run(scenario())
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    async def scenario():
+        admission = CallAdmission(max_calls=1, timeout=5)
+        assert await admission.acquire(1)
+        cancelled = asyncio.create_task(admission.acquire(2))
+        waiter = asyncio.create_task(admission.acquire(3))
+        await asyncio.sleep(0)
+
+        # The slot goes to chat 2 before its task gets to run again
+        admission.release(1)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+
+        assert await waiter
+        assert admission.admitted == {3}
+
+    asyncio.run(scenario())
+
+
+def test_dropped_idle_hold_releases_its_slot():
+    pytest.importorskip("pyrogram")
+    pytest.importorskip("pytgcalls")
+    from spotify_bot.bot import MusicBot
+
+    async def scenario():
+        # Only the state handle_call_drop touches, no clients
+        bot = object.__new__(MusicBot)
+        bot.shutting_down = False
+        bot.leaving_calls = set()
+        bot.recovering_calls = set()
+        bot.active_calls = {1: True}
+        bot.group_calls = {1: object()}
+        bot.broadcast_subscriptions = {}
+        bot.current_track = {1: None}
+        bot.idle_hold_stats = {}
+        bot.call_admission = CallAdmission(max_calls=2)
+        await bot.call_admission.acquire(1)
+
+        bot.idle_holds = {}
+        timer = asyncio.create_task(asyncio.sleep(60))
+        bot.idle_holds[1] = {'since': 0.0, 'task': timer}
+
+        await bot.handle_call_drop(1, "voice chat closed")
+
+        assert len(bot.call_admission.admitted) == 0
+        assert 1 not in bot.idle_holds
+        await asyncio.sleep(0)
+        assert timer.cancelled()
+
+    asyncio.run(scenario())
+
+
+def waiting_bot():
+    from spotify_bot.bot import MusicBot
+
+    # Only the state the admission wait touches, no clients
+    bot = object.__new__(MusicBot)
+    bot.call_admission = CallAdmission(max_calls=1, timeout=5)
+    bot.admission_waits = {}
+    bot.idle_holds = {}
+    bot.paused_since = {}
+    bot.current_track = {}
+    return bot
+
+
+def test_chat_waits_for_a_slot_outside_the_handler():
+    pytest.importorskip("pyrogram")
+    pytest.importorskip("pytgcalls")
+
+    async def scenario():
+        bot = waiting_bot()
+        assert await bot.call_admission.acquire(1)
+        joined = []
+
+        async def join():
+            joined.append(2)
+
+        # Returns without waiting, the chat is in line
+        bot.wait_for_call(2, None, join)
+        await asyncio.sleep(0)
+        assert bot.call_admission.position(2) == 1
+
+        bot.call_admission.release(1)
+        await bot.admission_waits[2]['task']
+        assert joined == [2]
+        assert bot.call_admission.admitted == {2}
+        assert not bot.admission_waits
+
+    asyncio.run(scenario())
+
+
+def test_stopping_a_waiting_chat_cancels_its_wait():
+    pytest.importorskip("pyrogram")
+    pytest.importorskip("pytgcalls")
+
+    async def scenario():
+        bot = waiting_bot()
+        assert await bot.call_admission.acquire(1)
+        joined = []
+
+        async def join():
+            joined.append(2)
+
+        bot.wait_for_call(2, None, join)
+        await asyncio.sleep(0)
+        task = bot.admission_waits[2]['task']
+
+        bot.cancel_call_wait(2)
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+
+        bot.call_admission.release(1)
+        assert joined == []
+        assert not bot.call_admission.admitted
+        assert not bot.call_admission.waiting
+
+    asyncio.run(scenario())
@@ -0,0 +1,34 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pyrogram = pytest.importorskip("pyrogram")
+
+from spotify_bot.callbacks import register_callbacks, callback_handler, next_callback
+from spotify_bot.helpers import NEXT_CB
+
+
+def test_router_is_registered_once(tmp_path):
+    async def scenario():
+        # Never started, only its dispatcher is used
+        app = pyrogram.Client("callbacks_test", api_id=1, api_hash="0" * 32, in_memory=True, workdir=str(tmp_path))
+        bot = SimpleNamespace(app=app, shutting_down=False)
+
+        register_callbacks(bot)
+        await asyncio.sleep(0.01)
+        assert bot.callbacks_registered
+        count = sum(len(handlers) for handlers in app.dispatcher.groups.values())
+
+        register_callbacks(bot)
+        register_callbacks(bot)
+        await asyncio.sleep(0.01)
+        assert sum(len(handlers) for handlers in app.dispatcher.groups.values()) == count == 1
+
+    asyncio.run(scenario())
+
+
+def test_versioned_and_legacy_payloads_dispatch_alike():
+    assert callback_handler(NEXT_CB) is next_callback
+    assert callback_handler("next") is next_callback
+    assert callback_handler("9:unknown") is None
@@ -0,0 +1,79 @@
+import os
+import random
+import asyncio
+
+from aiohttp import web
+
+from spotify_bot import downloader
+from spotify_bot.config import Config
+from spotify_bot.downloader import download_segmented
+
+
+def make_app(data, faults):
+    """
+    Range server that throttles and injects faults
+
+    Every segment (requests share their range end) first gets a 503, then a
+    response that drops the connection halfway through, then its resumed
+    requests are served in slow chunks.
+    """
+    seen = {}
+
+    async def media(request):
+        start, _, end = request.headers['Range'].removeprefix("bytes=").partition("-")
+        start, end = int(start), int(end)
+        attempt = seen[end] = seen.get(end, 0) + 1
+
+        if attempt == 1:
+            faults['503'] += 1
+            return web.Response(status=503)
+
+        body = data[start:end + 1]
+        response = web.StreamResponse(status=206, headers={
+            'Content-Range': f"bytes {start}-{end}/{len(data)}",
+            'Content-Length': str(len(body)),
+        })
+        await response.prepare(request)
+
+        if attempt == 2 and len(body) > 1:
+            faults['dropped'] += 1
+            await response.write(body[:len(body) // 2])
+            request.transport.close()
+            return response
+
+        for offset in range(0, len(body), 8192):
+            await response.write(body[offset:offset + 8192])
+            await asyncio.sleep(0.001)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get('/media', media)
+    return app
+
+
+def test_segmented_download_survives_faults(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloader, 'BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(Config, 'DOWNLOAD_MIN_SEGMENT_MB', 0)
+    data = random.Random(34).randbytes(300 * 1024 + 7)
+    faults = {'503': 0, 'dropped': 0}
+    output_file = str(tmp_path / "audio.webm")
+
+    async def scenario():
+        runner = web.AppRunner(make_app(data, faults))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            await download_segmented(f"http://127.0.0.1:{port}/media", output_file, size=len(data), segments=4, retries=5)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+    with open(output_file, "rb") as f:
+        assert f.read() == data
+    assert faults == {'503': 4, 'dropped': 4}
+    # Parts and the segment plan are cleaned up
+    assert os.listdir(tmp_path) == ["audio.webm"]
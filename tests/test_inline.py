@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from spotify_bot.config import Config
+from spotify_bot.ratelimit import RateLimiter
+
+
+def test_only_the_latest_inline_query_is_answered(monkeypatch):
+    pytest.importorskip("pyrogram")
+    pytest.importorskip("pytgcalls")
+    from spotify_bot.bot import MusicBot
+
+    monkeypatch.setattr(Config, "INLINE_DEBOUNCE", 0.05)
+
+    async def scenario():
+        # Only the state inline searches touch, no clients
+        bot = object.__new__(MusicBot)
+        bot.inline_queries = {}
+        bot.rate_limiter = RateLimiter(user_limits="", chat_limits="")
+        searched = []
+        answered = []
+
+        async def search_candidates(query):
+            searched.append(query)
+            return []
+
+        bot.search_candidates = search_candidates
+
+        def inline_query(text):
+            async def answer(results, cache_time=None):
+                answered.append(text)
+            return SimpleNamespace(from_user=SimpleNamespace(id=7), query=text, answer=answer)
+
+        # Keystrokes return right away instead of waiting out the debounce
+        for text in ("da", "daft", "daft punk"):
+            started = asyncio.get_running_loop().time()
+            await bot.inline_search(None, inline_query(text))
+            assert asyncio.get_running_loop().time() - started < Config.INLINE_DEBOUNCE
+
+        await bot.inline_queries[7]
+        assert searched == ["daft punk"]
+        assert answered == ["daft punk"]
+        assert not bot.inline_queries
+
+    asyncio.run(scenario())
@@ -0,0 +1,55 @@
+import asyncio
+
+from spotify_bot.scheduler import MediaScheduler, JobTicket, NOW_PLAYING, BACKGROUND
+
+
+async def hold(scheduler, priority, started, release):
+    async with scheduler.job(priority, 'net'):
+        started.append(priority.priority if isinstance(priority, JobTicket) else priority)
+        await release.wait()
+
+
+def test_background_job_keeps_last_slot_free():
+    async def scenario():
+        scheduler = MediaScheduler({'net': 2})
+        release = asyncio.Event()
+        started = []
+        tasks = [asyncio.create_task(hold(scheduler, BACKGROUND, started, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert started == [BACKGROUND]
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_boosted_job_takes_the_slot_kept_for_foreground_work():
+    async def scenario():
+        scheduler = MediaScheduler({'net': 2})
+        release = asyncio.Event()
+        started = []
+        running = asyncio.create_task(hold(scheduler, BACKGROUND, started, release))
+        ticket = JobTicket(BACKGROUND)
+        queued = asyncio.create_task(hold(scheduler, ticket, started, release))
+        await asyncio.sleep(0)
+        assert started == [BACKGROUND]
+        assert scheduler.stats()['background']['waiting'] == 1
+
+        # A user starts waiting on the prefetch
+        scheduler.boost(ticket, NOW_PLAYING)
+        await asyncio.sleep(0)
+        assert started == [BACKGROUND, NOW_PLAYING]
+        assert scheduler.stats()['background']['waiting'] == 0
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert scheduler.running['net'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_boost_never_lowers_priority():
+    ticket = JobTicket(NOW_PLAYING)
+    MediaScheduler({'net': 1}).boost(ticket, BACKGROUND)
+    assert ticket.priority == NOW_PLAYING
@@ -0,0 +1,144 @@
+import os
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from spotify_bot.cache import AudioCache, url_hash
+
+from spotify_bot.spotify import SpotifyClient, SpotifyMap, SpotifyMatcher, API_URL, TOKEN_URL
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "spotify")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+def recorded_api():
+    """Transport of SpotifyClient serving the recorded Web API responses"""
+    responses = {
+        TOKEN_URL: {'access_token': "recorded-token", 'token_type': "Bearer", 'expires_in': 3600},
+        f"{API_URL}/playlists/37i9dQZF1DXcBWIGoYBM5M/tracks": load_fixture("playlist_tracks.json"),
+    }
+
+    async def fetch(method, url, headers=None, params=None, data=None, auth=None):
+        return responses[url]
+
+    return fetch
+
+
+class RecordedSearch:
+    """Stand-in for the YouTube search backend, answers from recorded results"""
+
+    def __init__(self):
+        self.results = load_fixture("search_results.json")
+        self.queries = []
+
+    async def __call__(self, query):
+        self.queries.append(query)
+        return self.results.get(query, [])
+
+
+def playlist_tracks():
+    client = SpotifyClient("id", "secret", fetch=recorded_api())
+    return asyncio.run(client.tracks('playlist', "37i9dQZF1DXcBWIGoYBM5M"))
+
+
+def test_matcher_picks_the_studio_upload(tmp_path):
+    tracks = playlist_tracks()
+    # The local file in the playlist has no Spotify ID
+    assert [track['title'] for track in tracks] == ["Blinding Lights", "Bohemian Rhapsody - Remastered 2011", "Quiet Harbour"]
+
+    search = RecordedSearch()
+    matcher = SpotifyMatcher(SpotifyMap(str(tmp_path / "spotify.db")), search, min_score=0.55)
+    matches = asyncio.run(matcher.match_many(tracks))
+
+    # Official audio over the longer music video and the live cut, the video over the karaoke version
+    assert matches[0]['video_id'] == "fHI8X4OXluQ"
+    assert matches[1]['video_id'] == "fJ9rUzIMcZQ"
+    # Nothing close enough for the obscure track
+    assert matches[2] is None
+
+    assert matcher.map.get(tracks[0]['spotify_id'])['video_id'] == "fHI8X4OXluQ"
+    assert matcher.map.get(tracks[2]['spotify_id']) is None
+
+    # Stored matches aren't searched again, the rejected track is
+    asyncio.run(matcher.match_many(tracks))
+    assert len(search.queries) == 4
+    assert search.queries[-1] == "Lantern Fields Quiet Harbour"
+    assert matcher.hits == 2
+
+
+def test_matcher_rejects_best_candidate_below_min_score(tmp_path):
+    tracks = playlist_tracks()
+    matcher = SpotifyMatcher(SpotifyMap(str(tmp_path / "spotify.db")), RecordedSearch(), min_score=0.9)
+    matches = asyncio.run(matcher.match_many(tracks[:2]))
+
+    # The remastered video scores about 0.81, "2011" from the Spotify title isn't in it
+    assert matches[0]['video_id'] == "fHI8X4OXluQ"
+    assert matches[1] is None
+    assert matcher.map.get(tracks[1]['spotify_id']) is None
+
+
+def test_spotify_playlist_play_queues_matches_with_prefetch_references(tmp_path):
+    pytest.importorskip("pyrogram")
+    pytest.importorskip("pytgcalls")
+    from spotify_bot.bot import MusicBot
+
+    async def scenario():
+        # Only the state process_spotify_play and enqueue_tracks touch, no clients
+        bot = object.__new__(MusicBot)
+        bot.spotify = SpotifyClient("id", "secret", fetch=recorded_api())
+        bot.spotify_matcher = SpotifyMatcher(SpotifyMap(str(tmp_path / "spotify.db")), RecordedSearch(), min_score=0.55)
+        bot.track_index = SimpleNamespace(record=lambda *args, **kwargs: None)
+        bot.audio_cache = AudioCache(str(tmp_path))
+        bot.queue, bot.current_track, bot.is_playing = {}, {}, {}
+        downloads = []
+        playing = []
+
+        async def ensure_assistant(message, wait_message=None):
+            return True
+
+        async def download_audio(url, priority=None):
+            downloads.append(url)
+            return str(tmp_path / f"audio_{url_hash(url)}.mp3")
+
+        async def play_now(message, video_info, wait_message=None):
+            bot.current_track[message.chat.id] = video_info
+            bot.audio_cache.acquire(video_info['url'])
+            playing.append(video_info)
+            return True
+
+        async def update_queue_display(chat_id):
+            pass
+
+        bot.ensure_assistant = ensure_assistant
+        bot.download_audio = download_audio
+        bot.play_now = play_now
+        bot.update_queue_display = update_queue_display
+        bot.request_snapshot = lambda: None
+
+        replies = []
+
+        async def reply(text, **kwargs):
+            replies.append(text)
+
+        message = SimpleNamespace(chat=SimpleNamespace(id=1), reply=reply)
+        await bot.process_spotify_play(message, 'playlist', "37i9dQZF1DXcBWIGoYBM5M")
+        await asyncio.sleep(0)
+
+        assert [track.video_id for track in playing] == ["fHI8X4OXluQ"]
+        assert [track.video_id for track in bot.queue[1]] == ["fJ9rUzIMcZQ"]
+        assert len(downloads) == 2
+        assert "Lantern Fields - Quiet Harbour" in replies[0]
+
+        # One reference each, the queue took over the prefetch's and the extra one of the playing track is gone
+        assert bot.audio_cache.refs == {
+            url_hash(playing[0].url): 1,
+            url_hash(bot.queue[1][0].url): 1,
+        }
+
+    asyncio.run(scenario())